@@ -30,12 +30,26 @@ def main():
     ap.add_argument("--features", nargs="+", default=["ret_1m","rv_1m","z_vol_1m","trade_rate_1s","imbalance_1s","liq_stress"])
     ap.add_argument("--lags", nargs="+", type=int, default=[-180,-120,-90,-60,-30])
     ap.add_argument("--q", type=float, default=0.10, help="FDR threshold within subset")
+    ap.add_argument("--config", default=None, help="read the latest run from event_study.result_store instead of the CSV")
+    ap.add_argument("--flips", default="pooled", help="flip subset to analyze from the result store (pooled/up/down)")
     args = ap.parse_args()
 
     os.makedirs(args.out_dir, exist_ok=True)
-    df = pd.read_csv(args.results_csv)
-    # Filter to pre-registered family
-    sub = df[df["feature"].isin(args.features) & df["lag_min"].isin(args.lags)].copy()
+    source = args.results_csv
+    sub = None
+    if args.config:
+        from src.stats.result_store import ResultStore
+        cfg = yaml.safe_load(open(args.config, "r", encoding="utf-8"))
+        store = ResultStore.from_config(cfg)
+        if store.enabled:
+            # only the pre-registered family is read
+            sub = store.query(subsets=[args.flips], features=args.features, lags=args.lags)
+            sub = sub.drop(columns="subset").dropna(axis=1, how="all") if len(sub) else None
+            source = f"{store.path} [{args.flips}]"
+    if sub is None:
+        df = pd.read_csv(args.results_csv)
+        # Filter to pre-registered family
+        sub = df[df["feature"].isin(args.features) & df["lag_min"].isin(args.lags)].copy()
     if sub.empty:
         raise SystemExit("No rows matched the pre-registered family. Check features/lags or results path.")
 
@@ -65,6 +79,7 @@ def main():
         "features": list(args.features),
         "lags": [int(x) for x in args.lags],
         "results_csv": args.results_csv,
+        "results_source": source,
         "subset_csv": sub_out,
         "winners_csv": winners_out,
         "whitelist_yaml": yaml_out,
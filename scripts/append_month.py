@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+import os, sys
+# Ensure repository root is on path when run from scripts/
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse, yaml, traceback, pandas as pd
+from src.io import load_ticks_1s
+from src.incremental import AppendState
+from src.cli import info, ok, warn, error
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Extend persisted bars/regimes/features with a newly landed month of ticks.")
+    ap.add_argument("--config", required=True)
+    ap.add_argument("--glob", nargs="+", help="Tick CSVs of the new month (default: read data.tick_store from --start)")
+    ap.add_argument("--start", help="Start of the new data when reading the tick store (default: after the stored state)")
+    ap.add_argument("--end", help="Exclusive end of the new data")
+    ap.add_argument("--init", action="store_true", help="(Re)build the state from all configured data")
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(args.config, "r", encoding="utf-8"))
+
+    d = cfg["data"]
+    state_dir = (cfg.get("append") or {}).get("state_dir") or os.path.join(d.get("cache_dir") or "data/cache", "append_state")
+    try:
+        if args.init:
+            info("Building append state from all configured data...")
+            sec = load_ticks_1s(d.get("ticks_glob"), show_progress=True, store=d.get("tick_store"), symbol=d.get("symbol"),
+                                start=d.get("start"), end=d.get("end"), cache_dir=d.get("cache_dir"), n_jobs=d.get("n_jobs"))
+            if sec is None:
+                error("No ticks found for the configured data.")
+                raise SystemExit(1)
+            st = AppendState.build(sec, cfg)
+        else:
+            st = AppendState.load(state_dir, cfg)
+            # seconds already folded into the state must not be read again
+            start = args.start or st.sec_tail.index[-1] + pd.Timedelta(seconds=1)
+            info(f"Loaded state up to {st.bars.index[-1]}; reading new ticks from {start} ...")
+            if args.glob:
+                sec = load_ticks_1s(args.glob, show_progress=True, start=start, end=args.end, n_jobs=d.get("n_jobs"))
+            else:
+                sec = load_ticks_1s(None, show_progress=True, store=d.get("tick_store"), symbol=d.get("symbol"),
+                                    start=start, end=args.end, n_jobs=d.get("n_jobs"))
+            if sec is None:
+                warn("No new ticks found; state unchanged.")
+                return
+            st.append(sec)
+        st.save(state_dir)
+        ok(f"State saved to {state_dir}: {len(st.bars):,} bars, {len(st.feats):,} feature rows "
+           f"up to {st.bars.index[-1]}")
+    except SystemExit:
+        raise
+    except Exception as e:
+        error(f"Append failed: {e.__class__.__name__}: {e}")
+        traceback.print_exc()
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+import os, sys
+# Ensure repository root is on path when run from scripts/
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse, time, numpy as np, pandas as pd
+from src.features.micro_features import _rolling_autocorr
+from src.cli import info, ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark rolling autocorrelation: rolling apply vs rolling sums.")
+    ap.add_argument("--minutes", type=int, default=43_200, help="1m returns to benchmark on (default: 30 days)")
+    ap.add_argument("--lags", type=int, nargs="+", default=[1, 5, 10])
+    ap.add_argument("--window", type=int, default=128)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    idx = pd.date_range("2025-01-01", periods=args.minutes, freq="1min", tz="UTC")
+    ret = pd.Series(rng.normal(0, 1e-3, args.minutes), index=idx)
+
+    t0 = time.perf_counter()
+    ref = {k: ret.rolling(args.window, min_periods=args.window).apply(lambda s: s.autocorr(k), raw=False)
+           for k in args.lags}
+    t_apply = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = {k: _rolling_autocorr(ret, k, args.window) for k in args.lags}
+    t_fast = time.perf_counter() - t0
+
+    err = max(float((got[k] - ref[k]).abs().max()) for k in args.lags)
+    info(f"{args.minutes:,} minutes, lags {args.lags}, window {args.window}")
+    info(f"rolling apply : {t_apply:8.3f}s")
+    info(f"rolling sums  : {t_fast:8.3f}s")
+    ok(f"speedup x{t_apply / max(t_fast, 1e-9):,.0f}; max abs diff {err:.2e}")
+
+
+if __name__ == "__main__":
+    main()
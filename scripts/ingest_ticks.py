@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+import os, sys
+# Ensure repository root is on path when run from scripts/
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse, yaml, traceback
+from src.tick_store import ingest_ticks
+from src.cli import info, ok, warn, error
+
+
+def main():
+    ap = argparse.ArgumentParser(description="One-time ingest of tick CSVs into the columnar tick store.")
+    ap.add_argument("--config", required=True)
+    ap.add_argument("--glob", nargs="+", help="Override data.ticks_glob (e.g. only a newly landed month)")
+    ap.add_argument("--chunksize", type=int, default=2_000_000, help="CSV rows parsed per chunk")
+    ap.add_argument("--n_jobs", type=int, help="Files ingested in parallel (default: data.n_jobs)")
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(args.config, "r", encoding="utf-8"))
+
+    data = cfg["data"]
+    store = data.get("tick_store")
+    if not store:
+        error("data.tick_store is not set in the config.")
+        raise SystemExit(1)
+    globs = args.glob or data.get("ticks_glob", [])
+    try:
+        info(f"Ingesting {data['symbol']} ticks into {store} ...")
+        n_jobs = args.n_jobs if args.n_jobs is not None else data.get("n_jobs")
+        n = ingest_ticks(globs, store, data["symbol"], show_progress=True, chunksize=args.chunksize, n_jobs=n_jobs)
+        if n == 0:
+            warn("No tick rows ingested (no files matched or no tick columns found).")
+        else:
+            ok(f"Ingested {n:,} ticks into {store}")
+    except Exception as e:
+        error(f"Ingest failed: {e.__class__.__name__}: {e}")
+        traceback.print_exc()
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
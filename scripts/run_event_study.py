@@ -3,13 +3,14 @@ import os, sys
 # Ensure repository root is on path when run from scripts/
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import argparse, yaml, traceback, pandas as pd, numpy as np
-from src.io import ensure_dirs, maybe_make_synthetic, load_ticks, load_bars_1m
-from src.ticks_to_bars import ticks_to_1m
-from src.regimes import build_macro_regime, find_flips
-from src.features.micro_features import build_micro_features
-from src.features.normalization import RollingRobustZ
-from src.stats.event_study import run_event_study as evt
+from src.io import ensure_dirs
+from src.regimes import find_flips
+from src.pipeline import FeaturePipeline
+from src.features.registry import expand_names, feature_fingerprint
+from src.cache import StageCache
+from src.stats.event_study import run_event_study_subsets, event_windows
 from src.stats.fdr import bh_fdr
+from src.stats.result_store import ResultStore, cached_event_study, context_key, times_fingerprint
 from src.utils import ensure_datetime_index
 from src.cli import ProgressBar, info, ok, warn, error
 
@@ -46,18 +47,13 @@ def main():
     try:
         # 0) Load or synthesize data
         info("Loading ticks and bars...")
-        ticks = load_ticks(cfg["data"]["ticks_glob"], show_progress=True)
-        if ticks is None:
-            info("No ticks found. Generating synthetic sample...")
-            ticks = maybe_make_synthetic()
-        bars_1m = load_bars_1m(cfg["data"]["bars_1m_glob"], show_progress=True)
-        if bars_1m is None:
-            bars_1m = ticks_to_1m(ticks)
+        pipe = FeaturePipeline(cfg, cache=StageCache.from_config(cfg))
+        bars_1m = pipe.bars()
         pb.advance()
 
         # 1) Macro regime & flips
         info("Building macro regime & finding flips...")
-        macro = build_macro_regime(bars_1m, cfg["regime"])
+        macro = pipe.macro()
         flips = find_flips(macro)
         # Robust UP/DOWN split from regime itself
         try:
@@ -78,36 +74,27 @@ def main():
 
         # 2) Micro features
         info("Computing micro features...")
-        feats = build_micro_features(bars_1m, ticks, cfg["features"])
-        # Add regime-aligned transform for imbalance (no lookahead)
-        try:
-            if "imbalance_1s" in feats.columns:
-                R = macro["trend_state"].map({"bull": 1, "bear": -1}).fillna(0).astype(float)
-                R_past = R.shift(1).reindex(feats.index, method="pad").fillna(0.0)
-                feats["imbalance_1s_against_regime"] = - R_past * feats["imbalance_1s"]
-        except Exception as _e:
-            warn(f"Failed to compute imbalance_1s_against_regime: {_e}")
+        feats = pipe.features()
         pb.advance()
 
         # 3) Rolling robust normalization (causal)
         info("Normalizing features (rolling robust z)...")
-        norm = RollingRobustZ(window_days=cfg["features"]["normalize"]["window_days"],
-                              per_hour_of_day=cfg["features"]["normalize"]["per_hour_of_day"],
-                              winsor_pct=cfg["features"]["normalize"]["winsor_pct"])
-        feats_z = norm.transform(feats)
+        feats_z = pipe.features_z()
         # Optional: restrict to configured feature subset or frozen selected list
         feat_cfg = cfg.get("features", {})
         selected = feat_cfg.get("selected")
         inc = feat_cfg.get("include")
+        params = feat_cfg.get("params", {})
         if selected:
-            sel_names = [str(it.get("name")) for it in selected if it and ("name" in it)]
+            # family names (e.g. "skew" with skew_win: [32, 64]) scan every window variant
+            sel_names = expand_names([str(it.get("name")) for it in selected if it and ("name" in it)], params)
             cols = [c for c in sel_names if c in feats_z.columns]
             if cols:
                 feats_z = feats_z[cols]
             else:
                 warn("Configured features.selected has no overlap with computed features; proceeding with available features.")
         elif inc:
-            cols = [c for c in inc if c in feats_z.columns]
+            cols = [c for c in expand_names(inc, params) if c in feats_z.columns]
             if cols:
                 feats_z = feats_z[cols]
             else:
@@ -137,14 +124,11 @@ def main():
             flips_dn_idx = _valid(flips_dn_idx, "down")
 
             # Per-(feature, lag) valid counts on pooled flips
-            rows = []
             feat_list = [c for c in X.columns if (not inc) or (c in inc)]
-            for f in feat_list:
-                for lag in lags:
-                    t_idx = flips + pd.Timedelta(minutes=int(lag))
-                    s = X.reindex(t_idx)[f]
-                    n = int(s.notna().sum())
-                    rows.append({"feature": f, "lag_min": int(lag), "valid_nonNaN": n})
+            W, _ = event_windows(flips, X[feat_list], [int(l) for l in lags])
+            n_valid = (~np.isnan(W)).sum(axis=0)    # (lags, features)
+            rows = [{"feature": f, "lag_min": int(lag), "valid_nonNaN": int(n_valid[i, j])}
+                    for j, f in enumerate(feat_list) for i, lag in enumerate(lags)]
             if rows:
                 import os as _os
                 dbg = pd.DataFrame(rows).sort_values(["feature", "lag_min"])  # type: ignore[name-defined]
@@ -216,37 +200,46 @@ def main():
             lags_cfg = sorted(set(int(it.get("lag_min")) for it in selected if (it and ("lag_min" in it))))
         else:
             lags_cfg = feat_cfg.get("lags", cfg.get("event_study", {}).get("lags"))
+        n_jobs = cfg.get("event_study", {}).get("n_jobs")
+        p_stop = cfg.get("event_study", {}).get("perm_p_stop")
+        exact_max_n = int(cfg.get("event_study", {}).get("exact_max_n", 20))
+        n_placebo = int(cfg.get("event_study", {}).get("placebo_sets", 0) or 0)
+        placebo_excl = cfg.get("event_study", {}).get("placebo_exclude_minutes")
         min_ev = int(cfg.get("event_study", {}).get("min_events_per_test", cfg.get("event_study", {}).get("min_samples", 20)))
-        res = evt(
-            flips,
-            feats_z,
-            pre_minutes=int(pre_m),
-            post_minutes=int(post_m),
-            n_perm=int(n_perm),
-            show_progress=True,
-            lags=lags_cfg,
-            min_events=min_ev,
-        )
-        # Directional subsets
-        res_up = evt(
-            flips_up_idx,
-            feats_z,
+        # pooled and directional subsets in one pass (shared windows and permutation draws)
+        subsets = {"pooled": flips, "up": flips_up_idx, "down": flips_dn_idx}
+        test_kw = dict(
             pre_minutes=int(pre_m),
             post_minutes=int(post_m),
             n_perm=int(n_perm),
             show_progress=True,
             lags=lags_cfg,
             min_events=min_ev,
+            n_jobs=n_jobs,
+            p_stop=p_stop,
+            exact_max_n=exact_max_n,
+            n_placebo=n_placebo,
+            vol_state=macro["vol_state"] if "vol_state" in macro.columns else None,
+            placebo_exclude=placebo_excl,
         )
-        res_dn = evt(
-            flips_dn_idx,
-            feats_z,
-            pre_minutes=int(pre_m),
-            post_minutes=int(post_m),
-            n_perm=int(n_perm),
-            show_progress=True,
-            lags=lags_cfg,
-            min_events=min_ev,
+        store = ResultStore.from_config(cfg)
+        if store.enabled:
+            # only (subset, feature, lag) cells not already in the store are computed
+            tests = {"n_perm": int(n_perm), "p_stop": p_stop, "exact_max_n": exact_max_n, "min_events": min_ev,
+                     "n_placebo": n_placebo}
+            if n_placebo:
+                # placebo events avoid every flip, and match on vol_state
+                tests.update(placebo_exclude=placebo_excl if placebo_excl is not None else int(pre_m) + int(post_m),
+                             all_flips=times_fingerprint(flips.append([flips_up_idx, flips_dn_idx])))
+            params = cfg.get("features", {}).get("params", {})
+            res_all = cached_event_study(store, context_key(pipe, tests, feats_z.index), subsets, feats_z,
+                                         feature_keys={c: feature_fingerprint(c, params) for c in feats_z.columns},
+                                         **test_kw)
+        else:
+            res_all = run_event_study_subsets(subsets, feats_z, **test_kw)
+        res, res_up, res_dn = (
+            res_all[res_all["subset"] == name].drop(columns="subset").reset_index(drop=True) if len(res_all) else None
+            for name in ("pooled", "up", "down")
         )
         pb.advance()
 
@@ -257,7 +250,7 @@ def main():
         out_csv_dn = os.path.join(out_dir, "event_study_results_down.csv")
         if res is None or len(res) == 0 or ("p_value" not in res.columns):
             warn("Event study produced no valid tests (insufficient samples for all lags). Writing empty results.")
-            empty = pd.DataFrame(columns=["feature","lag_min","stat","p_value","q_value"])
+            empty = pd.DataFrame(columns=["feature","lag_min","stat","p_value","n_perm_used","q_value"])
             empty.to_csv(out_csv, index=False)
             empty.to_csv(out_csv_up, index=False)
             empty.to_csv(out_csv_dn, index=False)
@@ -269,13 +262,22 @@ def main():
                 res_up["q_value"] = bh_fdr(res_up["p_value"].values, q=cfg["event_study"]["fdr_q"])
                 res_up.to_csv(out_csv_up, index=False)
             else:
-                pd.DataFrame(columns=["feature","lag_min","stat","p_value","q_value"]).to_csv(out_csv_up, index=False)
+                pd.DataFrame(columns=["feature","lag_min","stat","p_value","n_perm_used","q_value"]).to_csv(out_csv_up, index=False)
             if res_dn is not None and len(res_dn) > 0 and ("p_value" in res_dn.columns):
                 res_dn["q_value"] = bh_fdr(res_dn["p_value"].values, q=cfg["event_study"]["fdr_q"])
                 res_dn.to_csv(out_csv_dn, index=False)
             else:
-                pd.DataFrame(columns=["feature","lag_min","stat","p_value","q_value"]).to_csv(out_csv_dn, index=False)
+                pd.DataFrame(columns=["feature","lag_min","stat","p_value","n_perm_used","q_value"]).to_csv(out_csv_dn, index=False)
+        # Long table of every subset, q-values within each subset
+        if len(res_all):
+            res_all["q_value"] = res_all.groupby("subset", sort=False)["p_value"].transform(
+                lambda p: bh_fdr(p.values, q=cfg["event_study"]["fdr_q"]))
+        res_all.to_csv(os.path.join(out_dir, "event_study_results_subsets.csv"), index=False)
         pb.advance(); pb.finish()
+        st = pipe.cache.flush_stats()
+        if pipe.cache.enabled:
+            info(f"Stage cache: hits={st['hits']} misses={st['misses']} entries={st['entries']} "
+                 f"size={st['store_bytes'] / 1e6:.1f} MB")
         ok(f"Event study complete: {out_csv}")
     except Exception as e:
         try:
@@ -6,11 +6,12 @@ import argparse, yaml, traceback
 import json
 from joblib import dump
 import pandas as pd
-from src.io import ensure_dirs, maybe_make_synthetic, load_ticks, load_bars_1m
-from src.ticks_to_bars import ticks_to_1m
-from src.regimes import build_macro_regime, find_flips, make_flip_labels
-from src.features.micro_features import build_micro_features
+from src.io import ensure_dirs
+from src.regimes import find_flips, flip_label_matrix
+from src.pipeline import FeaturePipeline
+from src.features.registry import expand_names
 from src.features.normalization import RollingRobustZ
+from src.cache import StageCache
 from src.stats.cpcv import cpcv_split_by_months
 from src.models.hazard import train_hazard_logit
 from src.stats.metrics import evaluate_hazard, save_metrics
@@ -32,52 +33,39 @@ def main():
     try:
         # Load/synthesize
         info("Loading ticks and bars...")
-        ticks = load_ticks(cfg["data"]["ticks_glob"], show_progress=True)
-        if ticks is None:
-            info("No ticks found. Generating synthetic sample...")
-            ticks = maybe_make_synthetic()
-        bars_1m = load_bars_1m(cfg["data"]["bars_1m_glob"], show_progress=True)
-        if bars_1m is None:
-            bars_1m = ticks_to_1m(ticks)
+        pipe = FeaturePipeline(cfg, cache=StageCache.from_config(cfg))
+        bars_1m = pipe.bars()
         pb.advance()
 
         # Macro regimes & flips
         info("Building macro regime & finding flips...")
-        macro = build_macro_regime(bars_1m, cfg["regime"])
+        macro = pipe.macro()
         flips = find_flips(macro)
         pb.advance()
 
         # Labels for hazard task
         info("Constructing labels for hazard horizon...")
         H = cfg["hazard"]["flip_horizon_min"]
-        y, lead_time = make_flip_labels(macro, flips, horizon_min=H)
+        # labels for every configured horizon in one pass; the hazard model trains on H
+        horizons = sorted(set(cfg.get("labels", {}).get("flip_horizon_min") or []) | {H})
+        labels, leads = flip_label_matrix(macro, flips, horizons)
+        y, lead_time = labels[H].astype(int).rename(None), leads[H].rename(None)
+        info("Flip label rate by horizon: " + ", ".join(f"{h}m={labels[h].mean():.3f}" for h in horizons))
         pb.advance()
 
         # Micro features (causal) + regime-aligned transform (no lookahead) + normalization
         info("Computing micro features...")
-        feats = build_micro_features(bars_1m, ticks, cfg["features"])
-        # Add imbalance_1s_against_regime = - R.shift(1) * imbalance_1s
-        try:
-            if "imbalance_1s" in feats.columns:
-                R = macro["trend_state"].map({"bull": 1, "bear": -1}).fillna(0).astype(float)
-                R_past = R.shift(1).reindex(feats.index, method="pad").fillna(0.0)
-                feats["imbalance_1s_against_regime"] = - R_past * feats["imbalance_1s"]
-            else:
-                warn("imbalance_1s not available; cannot compute imbalance_1s_against_regime.")
-        except Exception as _e:
-            warn(f"Failed to compute imbalance_1s_against_regime: {_e}")
+        feats = pipe.features()
         pb.advance()
 
         info("Normalizing features (rolling robust z)...")
-        norm = RollingRobustZ(window_days=cfg["features"]["normalize"]["window_days"],
-                              per_hour_of_day=cfg["features"]["normalize"]["per_hour_of_day"],
-                              winsor_pct=cfg["features"]["normalize"]["winsor_pct"])
-        X = norm.transform(feats)
+        X = pipe.features_z()
         feat_cfg = cfg.get("features", {})
         selected_cfg = feat_cfg.get("selected")
         include_cfg = feat_cfg.get("include")
         # keep only the columns you intend to model
         selected_names = [d["name"] for d in selected_cfg] if selected_cfg else include_cfg
+        selected_names = expand_names(selected_names, feat_cfg.get("params", {}))
         if selected_names:
             cols = [c for c in X.columns if c in selected_names]
             if cols:
@@ -188,8 +176,10 @@ def main():
         pd.Series(feat_spec).to_json(os.path.join(out_dir, "feature_spec.json"))
 
         # Normalization config so BT/live use same rolling robust-z settings
-        norm_spec = cfg["features"]["normalize"]
-        pd.Series(norm_spec).to_json(os.path.join(out_dir, "norm_config.json"))
+        norm = RollingRobustZ.from_config(cfg["features"]["normalize"])
+        pd.Series(norm.config()).to_json(os.path.join(out_dir, "norm_config.json"))
+        # ...and the fitted trailing windows, so live can start with RollingRobustZ.load + update
+        norm.fit(feats[X.columns]).save(os.path.join(out_dir, "norm_state.joblib"))
 
         # 3) Save gate params (operating point) and emit alerts now for parity
         gate_cfg = cfg["hazard"]
@@ -214,6 +204,11 @@ def main():
         print(f"[ok] saved alerts: {os.path.join(out_dir, 'hazard_alerts.csv')}")
         print(f"[ok] saved model: {os.path.join(out_dir, 'model.joblib')}")
 
+        st = pipe.cache.flush_stats()
+        if pipe.cache.enabled:
+            info(f"Stage cache: hits={st['hits']} misses={st['misses']} entries={st['entries']} "
+                 f"size={st['store_bytes'] / 1e6:.1f} MB")
+
         pb.advance(); pb.finish()
     except Exception as e:
         try:
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+import os, sys
+# Ensure repository root is on path when run from scripts/
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse, yaml, traceback, time, pandas as pd
+from src.io import ensure_dirs
+from src.regimes import regime_grid
+from src.pipeline import FeaturePipeline
+from src.cache import StageCache
+from src.cli import info, ok, error
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Flip counts/rates for a grid of regime detector configs.")
+    ap.add_argument("--config", required=True)
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(args.config, "r", encoding="utf-8"))
+
+    out_dir = os.path.join(cfg["project"]["out_dir"], "regime")
+    ensure_dirs([out_dir])
+    try:
+        info("Loading ticks and bars...")
+        bars_1m = FeaturePipeline(cfg, cache=StageCache.from_config(cfg)).bars()
+
+        grid = cfg.get("regime_sweep") or {}
+        t0 = time.perf_counter()
+        table, flips = regime_grid(bars_1m, cfg["regime"], grid)
+        info(f"{len(table)} detector configs in {time.perf_counter() - t0:.2f}s")
+
+        table.index.name = "config"
+        out_csv = os.path.join(out_dir, "regime_sweep.csv")
+        table.to_csv(out_csv)
+        pd.DataFrame([(i, t) for i, fl in enumerate(flips) for t in fl], columns=["config", "flip_ts"]) \
+          .to_csv(os.path.join(out_dir, "regime_sweep_flips.csv"), index=False)
+        ok(f"Regime sweep complete: {out_csv}")
+    except Exception as e:
+        error(f"Regime sweep failed: {e.__class__.__name__}: {e}")
+        traceback.print_exc()
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os, json, time, hashlib
+import pandas as pd
+
+_SRC_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def stable_hash(obj) -> str:
+    """Short content hash of a JSON-serialisable object (dict keys sorted)."""
+    payload = json.dumps(obj, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def code_fingerprint(*modules) -> str:
+    """Hash of the source of ``src`` modules given as paths relative to ``src`` (e.g. "regimes.py")."""
+    h = hashlib.blake2b(digest_size=16)
+    for m in sorted(modules):
+        h.update(m.encode())
+        with open(os.path.join(_SRC_ROOT, m), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class StageCache:
+    """Content-addressed, size-bounded store for pipeline stage outputs.
+
+    Artifacts are pickled under ``<root>/<stage>-<key>.pkl``; the key is a hash of
+    whatever determines the output (upstream keys, config subsection, code
+    fingerprint), so a changed input or module simply misses. When the store grows
+    past ``max_bytes`` the least recently used artifacts are evicted. Hit/miss counts
+    accumulate in ``<root>/stats.json``.
+    """
+    def __init__(self, root: str, max_bytes=None, enabled: bool = True):
+        self.root = root
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.enabled = bool(enabled and root)
+        self.session = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "bytes_read": 0, "bytes_written": 0}
+        if self.enabled:
+            os.makedirs(root, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, cfg: dict):
+        c = cfg.get("cache", {}) or {}
+        max_gb = c.get("max_gb")
+        return cls(c.get("dir"), max_bytes=float(max_gb) * 1e9 if max_gb else None, enabled=c.get("enabled", False))
+
+    # -- index -------------------------------------------------------------
+    def _index_fp(self):
+        return os.path.join(self.root, "index.json")
+
+    def _load_index(self) -> dict:
+        try:
+            return json.load(open(self._index_fp(), "r", encoding="utf-8"))
+        except Exception:
+            return {}
+
+    def _save_index(self, index: dict):
+        tmp = self._index_fp() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp, self._index_fp())
+
+    def _path(self, name):
+        return os.path.join(self.root, f"{name}.pkl")
+
+    # -- public API --------------------------------------------------------
+    def get(self, stage: str, key: str):
+        if not self.enabled:
+            return None
+        name = f"{stage}-{key}"
+        fp = self._path(name)
+        if not os.path.exists(fp):
+            self.session["misses"] += 1
+            return None
+        try:
+            obj = pd.read_pickle(fp)
+        except Exception:
+            self.session["misses"] += 1
+            return None
+        index = self._load_index()
+        entry = index.setdefault(name, {"stage": stage, "bytes": os.path.getsize(fp)})
+        entry["last_access"] = time.time()
+        self._save_index(index)
+        self.session["hits"] += 1
+        self.session["bytes_read"] += entry["bytes"]
+        return obj
+
+    def put(self, stage: str, key: str, obj):
+        if not self.enabled:
+            return
+        name = f"{stage}-{key}"
+        fp = self._path(name)
+        tmp = fp + ".tmp"
+        pd.to_pickle(obj, tmp)
+        os.replace(tmp, fp)
+        size = os.path.getsize(fp)
+        index = self._load_index()
+        index[name] = {"stage": stage, "bytes": size, "last_access": time.time()}
+        self.session["writes"] += 1
+        self.session["bytes_written"] += size
+        self._evict(index, keep=name)
+        self._save_index(index)
+
+    def fetch(self, stage: str, key: str, compute):
+        """Return the cached artifact for (stage, key), computing and storing it on a miss."""
+        obj = self.get(stage, key)
+        if obj is None:
+            obj = compute()
+            if obj is not None:
+                self.put(stage, key, obj)
+        return obj
+
+    def _evict(self, index: dict, keep=None):
+        if not self.max_bytes:
+            return
+        total = sum(e.get("bytes", 0) for e in index.values())
+        for name in sorted(index, key=lambda n: index[n].get("last_access", 0.0)):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+            total -= index.pop(name).get("bytes", 0)
+            self.session["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Session counters plus current store size; also folded into ``stats.json``."""
+        index = self._load_index() if self.enabled else {}
+        out = dict(self.session)
+        out["entries"] = len(index)
+        out["store_bytes"] = int(sum(e.get("bytes", 0) for e in index.values()))
+        return out
+
+    def flush_stats(self) -> dict:
+        if not self.enabled:
+            return self.stats()
+        fp = os.path.join(self.root, "stats.json")
+        try:
+            total = json.load(open(fp, "r", encoding="utf-8"))
+        except Exception:
+            total = {}
+        for k, v in self.session.items():
+            total[k] = total.get(k, 0) + v
+        with open(fp, "w", encoding="utf-8") as f:
+            json.dump(total, f, indent=2)
+        out = self.stats()
+        for k in self.session:
+            self.session[k] = 0
+        return out
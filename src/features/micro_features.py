@@ -1,127 +1,262 @@
 import pandas as pd, numpy as np
+from functools import cached_property
 from ..utils import resample_ohlcv
+from ..ticks_to_bars import ticks_to_1s, is_second_bars
+from .registry import register, resolve, FEATURES
+from .rolling import PrefixMoments, SparseTable, rolling_std, rolling_skew, rolling_kurt
 
 def _rolling_mad(x):
     med = np.nanmedian(x)
     return np.nanmedian(np.abs(x - med)) + 1e-12
 
-def build_micro_features(bars_1m: pd.DataFrame, ticks: pd.DataFrame, cfg: dict) -> pd.DataFrame:
-    """Return a 1-minute indexed DataFrame of micro features (causal)."""
-    b = bars_1m.copy()
-    b["ret"] = np.log(b["close"]).diff()
-    p = b["close"]
+def _grid_seconds_per_minute(sec_index: pd.DatetimeIndex, minutes: pd.DatetimeIndex) -> pd.Series:
+    """Seconds of the first..last-trade second grid falling in each minute (60 except at the ends)."""
+    n = pd.Series(60.0, index=minutes)
+    if len(n):
+        n.iloc[0] -= sec_index[0].second
+        n.iloc[-1] -= 59 - sec_index[-1].second
+    return n
 
-    # Core features requested
-    # ret_1m (causal)
-    ret_1m = b["ret"].shift(1)
+def _rolling_autocorr(x: pd.Series, lag: int, window: int) -> pd.Series:
+    """``x.rolling(window).apply(lambda s: s.autocorr(lag))`` in O(n).
 
-    # rv_1m realized variance from 1s log-returns within each minute
-    rv_1m = None
+    The lag-``lag`` autocorrelation of a window is the correlation of its
+    ``window - lag`` pairs (x_t, x_{t-lag}), i.e. a rolling correlation of x with
+    its own shift, which pandas computes from rolling sums of products.
+    """
+    n = window - lag
+    if n < 2:
+        return pd.Series(np.nan, index=x.index)
+    return x.rolling(n, min_periods=n).corr(x.shift(lag))
+
+def windows(v) -> list:
+    """Window parameter as a list: a scalar is one window, a list asks for one variant per window."""
+    return [int(w) for w in v] if isinstance(v, (list, tuple)) else [int(v)]
+
+def window_columns(base: str, v) -> list:
+    """Output columns of a windowed family: ``base`` for a scalar window, ``base_w<N>`` per listed window."""
+    return [f"{base}_w{w}" for w in windows(v)] if isinstance(v, (list, tuple)) else [base]
+
+def warmup_minutes(cfg: dict) -> int:
+    """Bars of history a feature row depends on (longest rolling window plus the EWM settle time).
+
+    Recomputing the features of new minutes from this many preceding bars reproduces
+    a full recompute: rolling windows are covered exactly and the OFI/buy-maker EWMs
+    forget their starting value to below float precision.
+    """
+    p = cfg.get("params", {})
+    wins = [int(p.get("vol_z_win", 256)), 64, max(windows(p["bb_win"])), max(windows(p["donchian_win"])),
+            max(w + w // 2 for w in windows(p.get("vov_win", 32))), max(windows(p["skew_win"])),
+            max(windows(p["kurt_win"])), int(p.get("acf_win", 128))]
+    alpha = 2.0 / (p["ofi_win"] + 1.0)
+    settle = int(np.ceil(np.log(1e-17) / np.log(1.0 - alpha)))
+    return int(max(max(wins) + 2, settle))
+
+class _Inputs:
+    """Lazily derived inputs shared by the registered features (computed on first use)."""
+    def __init__(self, bars_1m: pd.DataFrame, ticks, macro=None, params=None):
+        self._bars, self._ticks, self.macro = bars_1m, ticks, macro
+        self.p = params or {}
+
+    @cached_property
+    def b(self) -> pd.DataFrame:
+        b = self._bars.copy()
+        b["ret"] = np.log(b["close"]).diff()
+        return b
+
+    # Prefix structures shared by every window of the windowed families
+    @cached_property
+    def ret_moments(self) -> PrefixMoments:
+        p = self.p
+        wins = windows(p.get("skew_win", 2)) + windows(p.get("kurt_win", 2)) + windows(p.get("vov_win", 32))
+        return PrefixMoments(self.b["ret"].to_numpy(), block=max(wins), order=4)
+
+    @cached_property
+    def ret_const(self) -> dict:
+        """Rolling max/min of ret (all-equal windows have skew 0 and kurt -3, as in pandas)."""
+        block = max(windows(self.p.get("skew_win", 2)) + windows(self.p.get("kurt_win", 2)))
+        r = self.b["ret"].to_numpy()
+        return {"max": SparseTable(r, np.fmax, block), "min": SparseTable(r, np.fmin, block)}
+
+    def is_const(self, w: int) -> np.ndarray:
+        return self.ret_const["max"].query(w) == self.ret_const["min"].query(w)
+
+    @cached_property
+    def close_moments(self) -> PrefixMoments:
+        return PrefixMoments(self.b["close"].to_numpy(), block=max(windows(self.p["bb_win"])), order=2)
+
+    @cached_property
+    def donchian_tables(self) -> dict:
+        w = max(windows(self.p["donchian_win"]))
+        return {"high": SparseTable(self.b["high"].to_numpy(), np.fmax, w),
+                "low": SparseTable(self.b["low"].to_numpy(), np.fmin, w)}
+
+    @cached_property
+    def sec(self) -> pd.DataFrame:
+        if self._ticks is None:
+            raise ValueError("Tick-derived features need ticks or per-second aggregates.")
+        return self._ticks if is_second_bars(self._ticks) else ticks_to_1s(self._ticks)
+
+    @cached_property
+    def trades_1m(self) -> pd.Series:
+        return self.sec["n_trades"].resample("1min").sum()
+
+    @cached_property
+    def n_secs(self) -> pd.Series:
+        return _grid_seconds_per_minute(self.sec.index, self.trades_1m.index)
+
+
+# -- registered features (registration order = output column order) ----------
+
+# Core features requested
+@register("ret_1m")
+def _ret_1m(x, p):
+    return x.b["ret"].shift(1)
+
+@register("rv_1m", inputs=("bars", "sec"))
+def _rv_1m(x, p):
+    # realized variance from 1s log-returns within each minute
     try:
-        p1s = ticks["price"].groupby(pd.Grouper(freq="1s")).last().dropna()
+        p1s = x.sec["price"].dropna()
         r1s = np.log(p1s).diff()
-        rv_1m = r1s.pow(2).resample("1min").sum().shift(1)
-    except Exception:
-        rv_1m = b["ret"].pow(2).shift(1)
-
-    # z_vol_1m: rolling z-score of volume at 1m
-    vol = b.get("volume")
-    z_vol_1m = None
-    if vol is not None:
-        w = int(cfg.get("params", {}).get("vol_z_win", 256))
-        mu = vol.rolling(w, min_periods=max(16, w//4)).mean()
-        sd = vol.rolling(w, min_periods=max(16, w//4)).std()
-        z_vol_1m = ((vol - mu) / (sd + 1e-12)).shift(1)
-
-    # trade_rate_1s: average trades per second over the minute
-    try:
-        trades_1s = ticks.groupby(pd.Grouper(freq="1s")).size()
-        trade_rate_1s = trades_1s.resample("1min").mean().shift(1)
+        return r1s.pow(2).resample("1min").sum().shift(1)
     except Exception:
-        trade_rate_1s = None
-
-    # imbalance_1s: per-second imbalance averaged over minute
-    imbalance_1s = None
-    if "is_buyer_maker" in ticks.columns:
-        t = ticks.copy()
-        sign = np.where(t["is_buyer_maker"] > 0, 1, -1)
-        t["signed_qty"] = sign * t["qty"]
-        sq = t["signed_qty"].groupby(pd.Grouper(freq="1s")).sum()
-        vq = t["qty"].groupby(pd.Grouper(freq="1s")).sum()
-        imb_1s = (sq / (vq + 1e-12)).clip(-1, 1)
-        imbalance_1s = imb_1s.resample("1min").mean().shift(1)
-
-    # Liquidity stress proxy (already present)
-    vol_ret = b["ret"].rolling(64, min_periods=64).std()
-    liq_stress = (b["ret"].abs() / (vol_ret**0.5 + 1e-12)).shift(1)
-
-    # Legacy features (kept for completeness, still causal)
-    # Compression: BB width pct & Donchian width pct
-    w_bb = cfg["params"]["bb_win"]
-    mu = p.rolling(w_bb, min_periods=w_bb).mean()
-    sd = p.rolling(w_bb, min_periods=w_bb).std()
-    bb_width = (mu + 2*sd) - (mu - 2*sd)
-    bb_width_pct = (bb_width / p).shift(1)
-    w_don = cfg["params"]["donchian_win"]
-    don_h = b["high"].rolling(w_don, min_periods=w_don).max()
-    don_l = b["low"].rolling(w_don, min_periods=w_don).min()
-    don_width_pct = ((don_h - don_l)/p).shift(1)
-
-    # Vol-of-vol
-    rv = b["ret"].rolling(32, min_periods=32).std()
-    vov = rv.rolling(16, min_periods=16).std().shift(1)
-
-    # OFI / buy-maker share if available in ticks
-    ofi = None; bm_share = None
-    if "is_buyer_maker" in ticks.columns:
-        t = ticks.copy()
-        sign = np.where(t["is_buyer_maker"]>0, 1, -1)
-        t["signed_qty"] = sign * t["qty"]
-        ofi_1s = t["signed_qty"].groupby(pd.Grouper(freq="1s")).sum()
-        ofi_1m = ofi_1s.resample("1min").sum().fillna(0.0)
-        ofi = ofi_1m.ewm(span=cfg["params"]["ofi_win"], adjust=False).mean().shift(1)
-        buys_1s = (t["is_buyer_maker"]>0).astype(int).groupby(pd.Grouper(freq="1s")).sum()
-        trades_1s = t["is_buyer_maker"].groupby(pd.Grouper(freq="1s")).size()
-        share_1m = (buys_1s.resample("1min").sum() / trades_1s.resample("1min").sum()).fillna(0.5)
-        bm_share = share_1m.ewm(span=cfg["params"]["ofi_win"], adjust=False).mean().shift(1)
-
-    # Skew/Kurt (rolling, causal)
-    skew = b["ret"].rolling(cfg["params"]["skew_win"]).skew().shift(1)
-    kurt = b["ret"].rolling(cfg["params"]["kurt_win"]).kurt().shift(1)
-
-    # ACF approximations
-    acf1 = b["ret"].rolling(128, min_periods=128).apply(lambda s: s.autocorr(1), raw=False).shift(1)
-    acf5 = b["ret"].rolling(128, min_periods=128).apply(lambda s: s.autocorr(5), raw=False).shift(1)
-    acf10= b["ret"].rolling(128, min_periods=128).apply(lambda s: s.autocorr(10), raw=False).shift(1)
-
-    # Seasonality
-    hod = b.index.hour + b.index.minute/60.0
-    sin = np.sin(2*np.pi*hod/24.0); cos = np.cos(2*np.pi*hod/24.0)
-
-    out = pd.DataFrame({
-        # Core set
-        "ret_1m": ret_1m,
-        "rv_1m": rv_1m,
-        "z_vol_1m": z_vol_1m,
-        "trade_rate_1s": trade_rate_1s,
-        "imbalance_1s": imbalance_1s,
-        "liq_stress": liq_stress,
-        # Legacy
-        "bb_width_pct": bb_width_pct,
-        "don_width_pct": don_width_pct,
-        "vov": vov,
-        "skew": skew,
-        "kurt": kurt,
-        "acf1": acf1,
-        "acf5": acf5,
-        "acf10": acf10,
-        "season_sin": sin,
-        "season_cos": cos
-    }, index=b.index)
-
-    if ofi is not None:
-        out["ofi_ewm"] = ofi.reindex(out.index)
-    if bm_share is not None:
-        out["bm_share_ewm"] = bm_share.reindex(out.index)
-
-    return out.dropna()
+        return x.b["ret"].pow(2).shift(1)
+
+@register("z_vol_1m", params=("vol_z_win",))
+def _z_vol_1m(x, p):
+    # rolling z-score of volume at 1m
+    vol = x.b.get("volume")
+    if vol is None:
+        return None
+    w = int(p.get("vol_z_win", 256))
+    mu = vol.rolling(w, min_periods=max(16, w//4)).mean()
+    sd = vol.rolling(w, min_periods=max(16, w//4)).std()
+    return ((vol - mu) / (sd + 1e-12)).shift(1)
+
+@register("trade_rate_1s", inputs=("sec",))
+def _trade_rate_1s(x, p):
+    # average trades per second over the minute
+    if not len(x.sec):
+        return None
+    return (x.trades_1m / x.n_secs).shift(1)
+
+@register("imbalance_1s", inputs=("sec",))
+def _imbalance_1s(x, p):
+    # per-second imbalance averaged over minute
+    if "signed_qty" not in x.sec.columns or not len(x.sec):
+        return None
+    imb_1s = (x.sec["signed_qty"] / (x.sec["qty"] + 1e-12)).clip(-1, 1)
+    return (imb_1s.resample("1min").sum() / x.n_secs).shift(1)
+
+@register("liq_stress")
+def _liq_stress(x, p):
+    # Liquidity stress proxy
+    vol_ret = x.b["ret"].rolling(64, min_periods=64).std()
+    return (x.b["ret"].abs() / (vol_ret**0.5 + 1e-12)).shift(1)
+
+# Legacy features (kept for completeness, still causal)
+# Windowed families: a list of windows in params gives one ``<name>_w<N>`` column per
+# window, all computed from prefix structures shared across windows (see rolling.py)
+def _windowed(x, base, v, fn):
+    out = {}
+    for col, w in zip(window_columns(base, v), windows(v)):
+        out[col] = pd.Series(fn(w), index=x.b.index).shift(1)
+    return out
+
+@register("bb_width_pct", params=("bb_win",), columns=lambda p: window_columns("bb_width_pct", p["bb_win"]))
+def _bb_width_pct(x, p):
+    # Compression: Bollinger band width pct, (mu + 2sd) - (mu - 2sd) = 4sd
+    c = x.b["close"].to_numpy()
+    return _windowed(x, "bb_width_pct", p["bb_win"], lambda w: 4 * rolling_std(x.close_moments, w) / c)
+
+@register("don_width_pct", params=("donchian_win",),
+          columns=lambda p: window_columns("don_width_pct", p["donchian_win"]))
+def _don_width_pct(x, p):
+    # Compression: Donchian width pct
+    t, c = x.donchian_tables, x.b["close"].to_numpy()
+    return _windowed(x, "don_width_pct", p["donchian_win"], lambda w: (t["high"].query(w) - t["low"].query(w)) / c)
+
+@register("vov", params=("vov_win",), columns=lambda p: window_columns("vov", p.get("vov_win", 32)))
+def _vov(x, p):
+    # Vol-of-vol: std over w // 2 minutes of the w-minute return std
+    def _one(w):
+        rv = rolling_std(x.ret_moments, w)
+        return rolling_std(PrefixMoments(rv, block=w // 2, order=2), w // 2)
+    return _windowed(x, "vov", p.get("vov_win", 32), _one)
+
+@register("skew", params=("skew_win",), columns=lambda p: window_columns("skew", p["skew_win"]))
+def _skew(x, p):
+    return _windowed(x, "skew", p["skew_win"], lambda w: rolling_skew(x.ret_moments, w, x.is_const(w)))
+
+@register("kurt", params=("kurt_win",), columns=lambda p: window_columns("kurt", p["kurt_win"]))
+def _kurt(x, p):
+    return _windowed(x, "kurt", p["kurt_win"], lambda w: rolling_kurt(x.ret_moments, w, x.is_const(w)))
+
+def _acf_columns(p):
+    return [f"acf{int(k)}" for k in p.get("acf_lags", [1, 5, 10])]
+
+@register("acf", params=("acf_lags", "acf_win"), columns=_acf_columns)
+def _acf(x, p):
+    # ACF approximations, one column per lag
+    w = int(p.get("acf_win", 128))
+    return {f"acf{int(k)}": _rolling_autocorr(x.b["ret"], int(k), w).shift(1) for k in p.get("acf_lags", [1, 5, 10])}
+
+@register("season", columns=lambda p: ["season_sin", "season_cos"])
+def _season(x, p):
+    hod = x.b.index.hour + x.b.index.minute/60.0
+    return {"season_sin": np.sin(2*np.pi*hod/24.0), "season_cos": np.cos(2*np.pi*hod/24.0)}
+
+# OFI / buy-maker share if available in ticks
+@register("ofi_ewm", inputs=("sec",), params=("ofi_win",))
+def _ofi_ewm(x, p):
+    if "signed_qty" not in x.sec.columns:
+        return None
+    ofi_1m = x.sec["signed_qty"].resample("1min").sum().fillna(0.0)
+    return ofi_1m.ewm(span=p["ofi_win"], adjust=False).mean().shift(1)
+
+@register("bm_share_ewm", inputs=("sec",), params=("ofi_win",))
+def _bm_share_ewm(x, p):
+    if "n_buyer_maker" not in x.sec.columns:
+        return None
+    share_1m = (x.sec["n_buyer_maker"].resample("1min").sum() / x.trades_1m).fillna(0.5)
+    return share_1m.ewm(span=p["ofi_win"], adjust=False).mean().shift(1)
+
+# Derived: regime-aligned imbalance (no lookahead)
+@register("imbalance_1s_against_regime", inputs=("macro",), deps=("imbalance_1s",))
+def _imbalance_against_regime(x, p, imbalance_1s=None):
+    """- R.shift(1) * imbalance_1s, R = +1 bull / -1 bear / 0 range of the macro bars."""
+    if x.macro is None or imbalance_1s is None:
+        return None
+    R = x.macro["trend_state"].map({"bull": 1, "bear": -1}).fillna(0).astype(float)
+    R_past = R.shift(1).reindex(imbalance_1s.index, method="pad").fillna(0.0)
+    return - R_past * imbalance_1s
+
+
+def build_micro_features(bars_1m: pd.DataFrame, ticks, cfg: dict, features=None, macro=None) -> pd.DataFrame:
+    """Return a 1-minute indexed DataFrame of micro features (causal).
+
+    ``features`` lists the output columns wanted (None = every registered feature);
+    only those and their dependencies are computed, and ``ticks`` is not touched
+    unless one of them needs per-second data (it may then be None). ``ticks`` may be
+    raw ticks or their per-second aggregates (``ticks_to_1s``); every tick-derived
+    feature is computed from the per-second rows, so pass those to skip the tick pass.
+    Per-second means are taken over every second of the grid, idle seconds counting
+    as zero, as with a 1s resample of the ticks. Features needing ``macro`` are
+    skipped when it is not given. The index is that of ``bars_1m`` whatever is
+    requested: NaNs (warm-up, missing inputs) stay in their own column, so a column's
+    values and rows do not depend on which other features are built.
+    """
+    params = cfg.get("params", {})
+    x = _Inputs(bars_1m, ticks, macro, params)
+    cols = {}
+    for name in resolve(features, params):
+        f = FEATURES[name]
+        if "macro" in f.inputs and macro is None:
+            continue
+        deps = {d: cols.get(d) for d in f.deps}
+        res = f.fn(x, params, **deps)
+        if res is None:
+            continue
+        cols.update(res if isinstance(res, dict) else {name: res})
+    return pd.DataFrame(cols, index=x.b.index)
@@ -1,35 +1,176 @@
 import pandas as pd, numpy as np
+from ..utils import resolve_workers
+from .rolling import rolling_median_mad, rolling_quantiles, SortedWindow
+
+WINSOR_MODES = ("full_sample", "causal")
 
 class RollingRobustZ:
-    """Median/MAD rolling z-score, optionally per hour-of-day; strictly causal; winsorize tails."""
-    def __init__(self, window_days=5, per_hour_of_day=True, winsor_pct=0.01):
+    """Median/MAD rolling z-score, optionally per hour-of-day; strictly causal; winsorize tails.
+
+    ``winsor_mode="full_sample"`` clips at quantiles of the whole sample (research
+    runs, as before); ``"causal"`` clips each z at the quantiles of the z values in
+    the same trailing window, so live and batch outputs agree. ``fit`` + ``update``
+    is the incremental form of ``transform`` for live use; its state serializes
+    with ``save``/``load``. Hour buckets and columns are normalized ``n_jobs`` at a time
+    (sklearn-style: None/1 serial, -1 all cores).
+    """
+    def __init__(self, window_days=5, per_hour_of_day=True, winsor_pct=0.01, winsor_mode="full_sample",
+                 n_jobs=None):
+        if winsor_mode not in WINSOR_MODES:
+            raise ValueError(f"winsor_mode must be one of {WINSOR_MODES}, not {winsor_mode!r}")
         self.window_days = window_days
         self.per_hod = per_hour_of_day
         self.winsor = winsor_pct
+        self.winsor_mode = winsor_mode
+        self.n_jobs = n_jobs
+        self._windows = None
+        self._columns = None
+
+    @classmethod
+    def from_config(cls, n: dict) -> "RollingRobustZ":
+        """From a ``features.normalize`` config section (or a release ``norm_config.json``)."""
+        return cls(window_days=n["window_days"], per_hour_of_day=n["per_hour_of_day"],
+                   winsor_pct=n["winsor_pct"], winsor_mode=n.get("winsor_mode", "full_sample"),
+                   n_jobs=n.get("n_jobs"))
+
+    def config(self) -> dict:
+        return {"method": "rolling_robust_z", "window_days": self.window_days, "per_hour_of_day": self.per_hod,
+                "winsor_pct": self.winsor, "winsor_mode": self.winsor_mode}
+
+    @property
+    def _window_ns(self) -> int:
+        return pd.Timedelta(days=self.window_days).value
 
     def _winsor(self, s, p):
         lo, hi = s.quantile(p), s.quantile(1-p)
         return s.clip(lo, hi)
 
-    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
-        x = df.copy()
-        if self.per_hod:
-            # group by hour-of-day
-            x["_hod"] = x.index.hour
-            outs = []
-            for h, g in x.groupby("_hod"):
-                g2 = g.drop(columns=["_hod"])
-                w = f"{self.window_days}D"
-                med = g2.rolling(w, closed="left").median()
-                mad = g2.rolling(w, closed="left").apply(lambda s: np.nanmedian(np.abs(s - np.nanmedian(s)))+1e-9, raw=False)
-                z = (g2 - med) / mad
-                z = z.apply(self._winsor, p=self.winsor)
-                outs.append(z)
-            out = pd.concat(outs).sort_index()
+    def _groups(self, index: pd.DatetimeIndex) -> list:
+        # row positions of each hour-of-day bucket (one bucket of all rows if per_hod is off)
+        if not self.per_hod:
+            return [np.arange(len(index))]
+        hod = np.asarray(index.hour)
+        return [np.flatnonzero(hod == h) for h in np.unique(hod)]
+
+    def _map_columns(self, fn, df: pd.DataFrame) -> pd.DataFrame:
+        """``fn(x, t)`` on every (hour bucket, column) slice, written into one preallocated frame.
+
+        The slices are independent, so they run ``n_jobs`` at a time in a thread pool
+        (the numba kernels release the GIL).
+        """
+        t = df.index.as_unit("ns").asi8
+        vals = df.to_numpy(dtype=float)
+        out = np.full(vals.shape, np.nan)
+        tasks = [(rows, j) for rows in self._groups(df.index) for j in range(vals.shape[1])]
+
+        def _run(task):
+            rows, j = task
+            out[rows, j] = fn(vals[rows, j], t[rows])
+        workers = resolve_workers(self.n_jobs, len(tasks))
+        if workers == 1:
+            for task in tasks:
+                _run(task)
         else:
-            w = f"{self.window_days}D"
-            med = x.rolling(w, closed="left").median()
-            mad = x.rolling(w, closed="left").apply(lambda s: np.nanmedian(np.abs(s - np.nanmedian(s)))+1e-9, raw=False)
-            out = (x - med)/mad
-            out = out.apply(self._winsor, p=self.winsor)
-        return out.dropna()
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                list(ex.map(_run, tasks))
+        return pd.DataFrame(out, index=df.index, columns=df.columns)
+
+    def _z(self, x, t):
+        # same as rolling(f"{window_days}D", closed="left") median and
+        # .apply(nanmedian(|s - nanmedian(s)|)), without a Python call per row
+        med, mad = rolling_median_mad(x, t, self._window_ns, closed="left")
+        return (x - med) / (mad + 1e-9)
+
+    def _winsor_causal(self, z, t):
+        # clip at the winsor quantiles of the z values in [t - window, t)
+        q = rolling_quantiles(z, t, self._window_ns, [self.winsor, 1 - self.winsor], closed="left")
+        return np.clip(z, np.nan_to_num(q[:, 0], nan=-np.inf), np.nan_to_num(q[:, 1], nan=np.inf))
+
+    def zscore(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Rolling robust z before winsorization; row ``t`` only sees the window before ``t``."""
+        return self._map_columns(self._z, df.sort_index())
+
+    def winsorize(self, z: pd.DataFrame) -> pd.DataFrame:
+        """Clip each column (per hour-of-day group if enabled) at its winsor_pct quantiles."""
+        if self.winsor_mode == "causal":
+            return self._map_columns(self._winsor_causal, z.sort_index())
+        if self.per_hod:
+            return z.groupby(z.index.hour, group_keys=False).apply(lambda g: g.apply(self._winsor, p=self.winsor))
+        return z.apply(self._winsor, p=self.winsor)
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Winsorized rolling z of every column; NaNs stay per column (rows are not dropped)."""
+        return self.winsorize(self.zscore(df))
+
+    # -- incremental (live) mode ------------------------------------------
+    def _bucket(self, ts: pd.Timestamp) -> int:
+        return int(ts.hour) if self.per_hod else 0
+
+    def fit(self, df: pd.DataFrame) -> "RollingRobustZ":
+        """Warm the trailing windows (values and raw z, per column and hour bucket) from history."""
+        z = self.zscore(df)
+        edge = df.index[-1].value - self._window_ns
+        t = df.index.as_unit("ns").asi8
+        keep = t >= edge
+        buckets = df.index.hour if self.per_hod else np.zeros(len(df), dtype=int)
+        self._windows = {}
+        for b in np.unique(buckets[keep]):
+            m = keep & (buckets == b)
+            self._windows[int(b)] = {c: {"x": SortedWindow(t[m], df[c].to_numpy(dtype=float)[m]),
+                                         "z": SortedWindow(t[m], z[c].to_numpy(dtype=float)[m])}
+                                     for c in df.columns}
+        self._columns = list(df.columns)
+        return self
+
+    def update(self, ts, row) -> pd.Series:
+        """Robust z of one new row (time ``ts``, values by column), winsorized causally.
+
+        Matches ``transform`` with ``winsor_mode="causal"`` on the history plus this row.
+        O(w) per column for the sorted-window update, O(log w) for the reads.
+        """
+        if self._windows is None:
+            raise RuntimeError("RollingRobustZ.update needs fit() or load() first.")
+        ts = pd.Timestamp(ts)
+        t = ts.value
+        edge = t - self._window_ns
+        wins = self._windows.setdefault(self._bucket(ts), {c: {"x": SortedWindow(), "z": SortedWindow()}
+                                                             for c in self._columns})
+        out = {}
+        for c in self._columns:
+            x = float(row[c])
+            wx, wz = wins[c]["x"], wins[c]["z"]
+            wx.evict(edge)
+            med = wx.median()
+            z = (x - med) / (wx.mad(med) + 1e-9) if len(wx) else np.nan
+            wx.push(t, x)
+            wz.evict(edge)
+            zc = z
+            if len(wz) and z == z:
+                zc = min(max(z, wz.quantile(self.winsor)), wz.quantile(1 - self.winsor))
+            wz.push(t, z)
+            out[c] = zc
+        return pd.Series(out, name=ts)
+
+    def state_dict(self) -> dict:
+        return {"config": self.config(), "columns": self._columns,
+                "windows": {b: {c: {k: w.state() for k, w in cw.items()} for c, cw in bw.items()}
+                            for b, bw in (self._windows or {}).items()}}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "RollingRobustZ":
+        norm = cls.from_config(state["config"])
+        norm._columns = list(state["columns"])
+        norm._windows = {b: {c: {k: SortedWindow(s["t"], s["x"]) for k, s in cw.items()} for c, cw in bw.items()}
+                         for b, bw in state["windows"].items()}
+        return norm
+
+    def save(self, path: str):
+        """Write the fitted state (e.g. ``norm_state.joblib`` next to ``norm_config.json`` in a release)."""
+        from joblib import dump
+        dump(self.state_dict(), path)
+
+    @classmethod
+    def load(cls, path: str) -> "RollingRobustZ":
+        from joblib import load
+        return cls.from_state(load(path))
@@ -0,0 +1,394 @@
+import copy
+from collections import deque
+import pandas as pd, numpy as np
+from .micro_features import windows, window_columns
+from .registry import resolve, FEATURES, expand_names
+
+_NS_PER_MIN = 60 * 10**9
+_TREND = {"bull": 1.0, "bear": -1.0}
+
+
+class _Ring:
+    """Fixed-capacity history; every value is written twice so the last ``w`` are one contiguous view."""
+    def __init__(self, cap: int):
+        self.cap = int(cap)
+        self.buf = np.full(2 * self.cap, np.nan)
+        self.i = 0
+        self.n = 0
+
+    def push(self, v: float):
+        self.buf[self.i] = v
+        self.buf[self.i + self.cap] = v
+        self.i = (self.i + 1) % self.cap
+        self.n += 1
+
+    def last(self, w: int) -> np.ndarray:
+        end = self.i + self.cap
+        return self.buf[end - w:end]
+
+
+class _Window:
+    """Running count and power sums of the finite values among the last ``w`` pushed to a ring.
+
+    ``update`` adds the value just pushed and drops the one that left the window,
+    O(1). The sums are of ``x - ref`` and are rebuilt from the ring every ``w``
+    pushes (``ref`` reset to the window mean), which bounds rounding drift and
+    cancellation at an amortized O(1) per push. The ring needs room for ``w + 1``.
+    """
+    def __init__(self, w: int, order: int = 2):
+        self.w, self.order = int(w), int(order)
+        self.s = [0.0] * (self.order + 1)
+        self.bad, self.ref, self.k = 0, 0.0, 0
+
+    def _add(self, x, sign):
+        if not np.isfinite(x):
+            self.bad += sign
+            return
+        d, t = x - self.ref, 1.0
+        for j in range(self.order + 1):
+            self.s[j] += sign * t
+            t *= d
+
+    def update(self, ring: _Ring):
+        self._add(ring.last(1)[0], 1)
+        if ring.n > self.w:
+            self._add(ring.last(self.w + 1)[0], -1)
+        self.k += 1
+        if self.k >= self.w:
+            x = ring.last(min(ring.n, self.w))
+            fin = x[np.isfinite(x)]
+            self.bad = len(x) - len(fin)
+            self.ref = float(fin.mean()) if len(fin) else 0.0
+            d = fin - self.ref
+            self.s = [float((d ** j).sum()) for j in range(self.order + 1)]
+            self.k = 0
+
+    def full(self, ring: _Ring) -> bool:
+        """``w`` values pushed and all finite."""
+        return ring.n >= self.w and self.bad == 0
+
+    def moments(self):
+        """Count, mean and central moments m2..m<order> (divided by n) of the finite values."""
+        S = self.s
+        n = S[0]
+        if n <= 0:
+            return (0.0, np.nan) + (np.nan,) * (self.order - 1)
+        mu = S[1] / n
+        out = [n, mu + self.ref]
+        if self.order >= 2:
+            out.append((S[2] - mu * S[1]) / n)
+        if self.order >= 3:
+            out.append((S[3] - 3 * mu * S[2] + 3 * mu**2 * S[1] - n * mu**3) / n)
+        if self.order >= 4:
+            out.append((S[4] - 4 * mu * S[3] + 6 * mu**2 * S[2] - 4 * mu**3 * S[1] + n * mu**4) / n)
+        return tuple(out)
+
+    def std(self, ring: _Ring) -> float:
+        """Sample std of a full window, else NaN."""
+        if not self.full(ring):
+            return np.nan
+        n, _, m2 = self.moments()[:3]
+        return float(np.sqrt(max(m2, 0.0) * n / (n - 1.0)))
+
+
+class _Extreme:
+    """Max (``sign=1``) or min (``sign=-1``) of the last ``w`` values: a monotonic deque, amortized O(1)."""
+    def __init__(self, w: int, sign: int):
+        self.w, self.sign = int(w), sign
+        self.q = deque()    # (position, value), sign * value decreasing
+        self.i = 0
+        self.clean = 0      # finite values in a row up to the newest
+
+    def push(self, v: float):
+        if np.isfinite(v):
+            while self.q and self.sign * self.q[-1][1] <= self.sign * v:
+                self.q.pop()
+            self.q.append((self.i, v))
+            self.clean += 1
+        else:
+            self.clean = 0
+        while self.q and self.q[0][0] <= self.i - self.w:
+            self.q.popleft()
+        self.i += 1
+
+    def value(self) -> float:
+        """Extreme of the window if ``w`` values were pushed and all are finite, else NaN."""
+        return self.q[0][1] if self.clean >= self.w else np.nan
+
+
+class _Pairs:
+    """Running sums over the pairs (x_t, x_{t-lag}) inside the last ``w`` values of a ring.
+
+    Their correlation is the lag autocorrelation of the window (as in batch
+    ``_rolling_autocorr``). Same update and rebuild scheme as ``_Window``.
+    """
+    def __init__(self, w: int, lag: int):
+        self.w, self.lag = int(w), int(lag)
+        self.s = [0.0] * 6  # n, a, b, aa, bb, ab
+        self.ref, self.k = 0.0, 0
+
+    def _add(self, a, b, sign):
+        if not (np.isfinite(a) and np.isfinite(b)):
+            return
+        a, b = a - self.ref, b - self.ref
+        for j, t in enumerate((1.0, a, b, a * a, b * b, a * b)):
+            self.s[j] += sign * t
+
+    def update(self, ring: _Ring):
+        if ring.n > self.lag:
+            x = ring.last(self.lag + 1)
+            self._add(x[-1], x[0], 1)
+        if ring.n > self.w:
+            x = ring.last(self.w + 1)
+            self._add(x[self.lag], x[0], -1)
+        self.k += 1
+        if self.k >= self.w:
+            x = ring.last(min(ring.n, self.w))
+            a, b = x[self.lag:], x[:len(x) - self.lag]
+            ok = np.isfinite(a) & np.isfinite(b)
+            self.ref = float(a[ok].mean()) if ok.any() else 0.0
+            a, b = a[ok] - self.ref, b[ok] - self.ref
+            self.s = [float(ok.sum()), a.sum(), b.sum(), (a * a).sum(), (b * b).sum(), (a * b).sum()]
+            self.k = 0
+
+    def corr(self) -> float:
+        n, a, b, aa, bb, ab = self.s
+        if n < 2:
+            return np.nan
+        den = np.sqrt((aa - a * a / n) * (bb - b * b / n))
+        return float((ab - a * b / n) / den) if den > 0 else np.nan
+
+
+def _skew_kurt(win: _Window, hi: _Extreme, lo: _Extreme):
+    """pandas' rolling skew and kurt of a full window (same small-variance and all-equal rules)."""
+    if hi.value() == lo.value():
+        return 0.0, -3.0
+    n, _, B, C, D = win.moments()
+    if B <= 1e-14:
+        return np.nan, np.nan
+    skew = np.sqrt(n * (n - 1.0)) * C / ((n - 2.0) * B ** 1.5) if n >= 3 else np.nan
+    kurt = ((n * n - 1.0) * D / (B * B) - 3.0 * (n - 1.0) ** 2) / ((n - 2.0) * (n - 3.0)) if n >= 4 else np.nan
+    return skew, kurt
+
+
+class OnlineMicroFeatures:
+    """Minute-by-minute ``build_micro_features`` for live use.
+
+    Feed per-second aggregates (rows of ``ticks_to_1s``) in time order with
+    ``update``; when the first second of a new minute arrives, the previous minute
+    is closed and the feature row of the new minute is returned. That row matches
+    the batch row of that minute: bar features use the bars before it, tick
+    features use the calendar minute before it (idle minutes counting as zero).
+    Closed 1m bars (open/high/low/close/volume) can be fed instead; the
+    tick-derived features are then left out.
+
+    State is bounded: ring buffers of the longest window, running window sums and
+    max/min deques (O(1) per bar), per-minute accumulators and EWM values. ``snapshot``/``restore`` copy it, e.g. to resume after a restart.
+    ``imbalance_1s_against_regime`` uses the trend state passed to ``set_regime``
+    (the last closed macro bar), when given.
+    """
+    def __init__(self, cfg: dict, features=None):
+        p = cfg.get("params", {})
+        self.p = p
+        self.vol_w = int(p.get("vol_z_win", 256))
+        self.bb_w, self.don_w = windows(p["bb_win"]), windows(p["donchian_win"])
+        self.vov_w, self.skew_w = windows(p.get("vov_win", 32)), windows(p["skew_win"])
+        self.kurt_w = windows(p["kurt_win"])
+        self.acf_lags, self.acf_w = [int(k) for k in p.get("acf_lags", [1, 5, 10])], int(p.get("acf_win", 128))
+        self.alpha = 2.0 / (p["ofi_win"] + 1.0)
+        self.columns = [c for n in resolve(None, p) for c in FEATURES[n].columns(p)]
+        if features is not None:
+            keep = set(expand_names(features, p))
+            self.columns = [c for c in self.columns if c in keep]
+        ret_w = sorted(set([64, self.acf_w] + self.vov_w + self.skew_w + self.kurt_w))
+        shape_w = set(self.skew_w + self.kurt_w)
+        self.state = {
+            # rings hold one value more than the longest window: the one leaving it
+            "close": _Ring(max(self.bb_w) + 1), "volume": _Ring(self.vol_w + 1), "ret": _Ring(max(ret_w) + 1),
+            "close_win": {w: _Window(w) for w in self.bb_w}, "volume_win": _Window(self.vol_w),
+            "ret_win": {w: _Window(w, 4 if w in shape_w else 2) for w in ret_w},
+            "ret_max": {w: _Extreme(w, 1) for w in shape_w}, "ret_min": {w: _Extreme(w, -1) for w in shape_w},
+            "high": {w: _Extreme(w, 1) for w in self.don_w}, "low": {w: _Extreme(w, -1) for w in self.don_w},
+            "rv": {w: _Ring(max(w // 2, 1) + 1) for w in self.vov_w},
+            "rv_win": {w: _Window(max(w // 2, 1)) for w in self.vov_w},
+            "acf": {k: _Pairs(self.acf_w, k) for k in self.acf_lags},
+            "bar": None,        # features of the last closed bar (feed the next bar's row)
+            "minute": None,     # minute (ns // 60s) being accumulated
+            "acc": None,        # per-second accumulators of that minute
+            "closed": None,     # tick stats of the last closed calendar minute
+            "first_minute": None, "last_price": np.nan, "ofi": None, "bm": None,
+            "regime": None,
+        }
+
+    # -- state -------------------------------------------------------------
+    def snapshot(self) -> dict:
+        return copy.deepcopy(self.state)
+
+    def restore(self, state: dict) -> "OnlineMicroFeatures":
+        self.state = copy.deepcopy(state)
+        return self
+
+    def set_regime(self, trend_state):
+        """Trend state ("bull"/"bear"/"range") of the last closed macro bar."""
+        self.state["regime"] = _TREND.get(trend_state, 0.0)
+
+    # -- bar features ------------------------------------------------------
+    def _close_bar(self, o, h, l, c, v):
+        st = self.state
+        prev = st["close"].last(1)[0] if st["close"].n else np.nan
+        ret = np.log(c) - np.log(prev)
+        R = st["ret"]
+        for k, x in (("close", c), ("volume", v), ("ret", ret)):
+            st[k].push(x)
+        for win in st["close_win"].values():
+            win.update(st["close"])
+        st["volume_win"].update(st["volume"])
+        for win in st["ret_win"].values():
+            win.update(R)
+        for k in ("ret_max", "ret_min"):
+            for ext in st[k].values():
+                ext.push(ret)
+        for w in self.don_w:
+            st["high"][w].push(h)
+            st["low"][w].push(l)
+        for pairs in st["acf"].values():
+            pairs.update(R)
+        f = {"ret_1m": ret}
+
+        n_vol, mu_vol, m2_vol = st["volume_win"].moments()
+        f["z_vol_1m"] = (v - mu_vol) / (np.sqrt(max(m2_vol, 0.0) * n_vol / (n_vol - 1.0)) + 1e-12) \
+            if n_vol >= max(16, self.vol_w // 4) else np.nan
+        vol_ret = st["ret_win"][64].std(R)
+        f["liq_stress"] = abs(ret) / (vol_ret ** 0.5 + 1e-12)
+
+        for col, w in zip(window_columns("bb_width_pct", self.p["bb_win"]), self.bb_w):
+            f[col] = 4 * st["close_win"][w].std(st["close"]) / c
+        for col, w in zip(window_columns("don_width_pct", self.p["donchian_win"]), self.don_w):
+            f[col] = (st["high"][w].value() - st["low"][w].value()) / c
+        for col, w in zip(window_columns("vov", self.p.get("vov_win", 32)), self.vov_w):
+            st["rv"][w].push(st["ret_win"][w].std(R))
+            st["rv_win"][w].update(st["rv"][w])
+            f[col] = st["rv_win"][w].std(st["rv"][w])
+        shape = {}
+        for w in set(self.skew_w + self.kurt_w):
+            full = st["ret_win"][w].full(R)
+            shape[w] = _skew_kurt(st["ret_win"][w], st["ret_max"][w], st["ret_min"][w]) if full else (np.nan, np.nan)
+        for col, w in zip(window_columns("skew", self.p["skew_win"]), self.skew_w):
+            f[col] = shape[w][0]
+        for col, w in zip(window_columns("kurt", self.p["kurt_win"]), self.kurt_w):
+            f[col] = shape[w][1]
+        full = st["ret_win"][self.acf_w].full(R)
+        for k in self.acf_lags:
+            f[f"acf{k}"] = st["acf"][k].corr() if full else np.nan
+        st["bar"] = f
+
+    # -- tick features -----------------------------------------------------
+    def _ewm(self, prev, x):
+        return x if prev is None else (1.0 - self.alpha) * prev + self.alpha * x
+
+    def _step_idle(self, ofi, bm, k):
+        """EWM values after ``k`` idle minutes (zero flow, share 0.5)."""
+        if k <= 0 or ofi is None:
+            return ofi, bm
+        d = (1.0 - self.alpha) ** k
+        return ofi * d, bm * d + 0.5 * (1.0 - d)
+
+    def _close_minute(self):
+        st, a = self.state, self.state["acc"]
+        m = st["minute"]
+        if a["bar"] is not None:
+            self._close_bar(*a["bar"])
+        if a["n_trades"] is not None:
+            last = st["closed"]["minute"] if st["closed"] else None
+            if last is not None:
+                st["ofi"], st["bm"] = self._step_idle(st["ofi"], st["bm"], m - last - 1)
+            n_secs = 60.0 - a["first_second"] if m == st["first_minute"] else 60.0
+            share = a["n_bm"] / a["n_trades"] if a["n_trades"] > 0 else 0.5
+            st["ofi"] = self._ewm(st["ofi"], a["signed_qty"])
+            st["bm"] = self._ewm(st["bm"], share)
+            st["closed"] = {"minute": m, "trade_rate_1s": a["n_trades"] / n_secs,
+                            "imbalance_1s": a["imb"] / n_secs, "rv_1m": a["rv"]}
+        st["acc"] = None
+
+    def _row(self, m) -> dict:
+        """Features of minute ``m`` from the closed history."""
+        st = self.state
+        bar = st["bar"] or {}
+        row = dict(bar)
+        closed = st["closed"]
+        if closed is not None:
+            idle = closed["minute"] != m - 1
+            for k in ("trade_rate_1s", "imbalance_1s", "rv_1m"):
+                row[k] = 0.0 if idle else closed[k]
+            row["ofi_ewm"], row["bm_share_ewm"] = self._step_idle(st["ofi"], st["bm"], m - 1 - closed["minute"])
+            if st["regime"] is not None:
+                row["imbalance_1s_against_regime"] = - st["regime"] * row["imbalance_1s"]
+        hod = (m % (24 * 60)) / 60.0
+        row["season_sin"], row["season_cos"] = np.sin(2*np.pi*hod/24.0), np.cos(2*np.pi*hod/24.0)
+        return {c: row[c] for c in self.columns if c in row}
+
+    def _open(self, m):
+        """Start accumulating minute ``m``; returns its feature row."""
+        st = self.state
+        if st["minute"] is not None:
+            self._close_minute()
+        if st["first_minute"] is None:
+            st["first_minute"] = m
+        row = self._row(m)
+        st["minute"] = m
+        st["acc"] = {"bar": None, "n_trades": None}
+        return row
+
+    # -- public API --------------------------------------------------------
+    def update_second(self, ts, price, qty, signed_qty=np.nan, n_buyer_maker=np.nan, n_trades=1):
+        """Add one per-second aggregate; returns the row of a newly opened minute, else None."""
+        ns = pd.Timestamp(ts).value
+        m = ns // _NS_PER_MIN
+        st = self.state
+        row = self._open(m) if m != st["minute"] else None
+        a = st["acc"]
+        if a["n_trades"] is None:
+            a.update({"n_trades": 0.0, "signed_qty": 0.0, "n_bm": 0.0, "imb": 0.0, "rv": 0.0,
+                      "first_second": (ns // 10**9) % 60})
+        a["n_trades"] += n_trades
+        a["signed_qty"] += 0.0 if np.isnan(signed_qty) else signed_qty
+        a["n_bm"] += 0.0 if np.isnan(n_buyer_maker) else n_buyer_maker
+        a["imb"] += 0.0 if np.isnan(signed_qty) else min(max(signed_qty / (qty + 1e-12), -1.0), 1.0)
+        if np.isfinite(st["last_price"]):
+            a["rv"] += (np.log(price) - np.log(st["last_price"])) ** 2
+        st["last_price"] = price
+        b = a["bar"]
+        a["bar"] = (price, price, price, price, qty) if b is None else \
+            (b[0], max(b[1], price), min(b[2], price), price, b[4] + qty)
+        return row
+
+    def update_minute(self, ts, open, high, low, close, volume):
+        """Add a closed 1m bar (no tick-derived features); returns the row of the next minute."""
+        m = pd.Timestamp(ts).value // _NS_PER_MIN
+        self._open(m)
+        self.state["acc"]["bar"] = (open, high, low, close, volume)
+        self._close_minute()
+        self.state["minute"] = None
+        return self._row(m + 1)
+
+    def update(self, bar: pd.Series):
+        """Feed one row (name = timestamp): a per-second aggregate or, with OHLC fields, a closed 1m bar."""
+        if "open" in bar.index:
+            return self.update_minute(bar.name, bar["open"], bar["high"], bar["low"], bar["close"],
+                                      bar.get("volume", np.nan))
+        return self.update_second(bar.name, bar["price"], bar["qty"], bar.get("signed_qty", np.nan),
+                                  bar.get("n_buyer_maker", np.nan), bar.get("n_trades", 1))
+
+    def run(self, sec: pd.DataFrame) -> pd.DataFrame:
+        """Feed a frame of per-second aggregates; the emitted rows, all-NaN columns dropped (like the batch)."""
+        cols = {c: sec[c].to_numpy(dtype=float) if c in sec.columns else np.full(len(sec), np.nan)
+                for c in ("price", "qty", "signed_qty", "n_buyer_maker", "n_trades")}
+        rows, idx = [], []
+        for i, ts in enumerate(sec.index):
+            r = self.update_second(ts, cols["price"][i], cols["qty"][i], cols["signed_qty"][i],
+                                   cols["n_buyer_maker"][i], cols["n_trades"][i])
+            if r is not None:
+                rows.append(r)
+                idx.append(ts.floor("1min"))
+        out = pd.DataFrame(rows, index=pd.DatetimeIndex(idx), columns=self.columns)
+        return out.dropna(axis=1, how="all")
@@ -0,0 +1,133 @@
+import pandas as pd
+
+# Inputs a feature can declare:
+#   "bars"  - 1-minute OHLCV bars
+#   "sec"   - per-second aggregates (``ticks_to_1s``); needing them means a tick pass
+#   "macro" - macro regime bars (derived features added by the pipeline)
+INPUTS = ("bars", "sec", "macro")
+
+
+class Feature:
+    """A registered feature family: how to compute it and what it needs.
+
+    ``fn(ctx, params)`` returns a Series (single column named ``name``), a dict of
+    columns, or None when the inputs lack the fields it needs. ``columns(params)``
+    lists the columns it produces (``[name]`` unless the family is parameterized,
+    e.g. one ``acf<k>`` per lag). ``deps`` are other features it is derived from.
+    """
+    def __init__(self, name, fn, inputs=("bars",), params=(), deps=(), columns=None):
+        bad = set(inputs) - set(INPUTS)
+        if bad:
+            raise ValueError(f"Feature {name}: unknown inputs {sorted(bad)}")
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.params = tuple(params)
+        self.deps = tuple(deps)
+        self._columns = columns
+
+    def columns(self, params: dict) -> list:
+        return list(self._columns(params)) if self._columns else [self.name]
+
+    def __repr__(self):
+        return f"Feature({self.name!r}, inputs={self.inputs}, params={self.params}, deps={self.deps})"
+
+
+# name -> Feature, in registration (= output column) order
+FEATURES = {}
+
+
+def register(name, inputs=("bars",), params=(), deps=(), columns=None):
+    """Decorator adding ``fn(ctx, params)`` to the registry under ``name``."""
+    def deco(fn):
+        FEATURES[name] = Feature(name, fn, inputs=inputs, params=params, deps=deps, columns=columns)
+        return fn
+    return deco
+
+
+def _registry() -> dict:
+    from . import micro_features  # noqa: F401  (registers the built-in features)
+    return FEATURES
+
+
+def column_owner(params: dict) -> dict:
+    """Output column -> registered feature name (e.g. "acf5" -> "acf")."""
+    return {c: f.name for f in _registry().values() for c in f.columns(params)}
+
+
+def requested_features(feat_cfg: dict):
+    """Columns the run scripts keep: ``features.selected`` names, else ``features.include``, else None (all)."""
+    selected = feat_cfg.get("selected")
+    if selected:
+        return [str(it["name"]) for it in selected if it and "name" in it]
+    return list(feat_cfg.get("include") or []) or None
+
+
+def resolve(names, params: dict) -> list:
+    """Registered features needed for the output columns ``names`` (None = all), dependencies first.
+
+    Unknown names are skipped; if none of ``names`` is known every feature is computed,
+    like the run scripts falling back to all computed columns.
+    """
+    reg = _registry()
+    if names is None:
+        return list(reg)
+    owner = column_owner(params)
+    want = [owner.get(n, n) for n in names if owner.get(n, n) in reg]
+    if not want:
+        return list(reg)
+    need = set()
+
+    def _add(n):
+        if n not in need:
+            need.add(n)
+            for d in reg[n].deps:
+                _add(d)
+    for n in want:
+        _add(n)
+    return [n for n in reg if n in need]
+
+
+def required_inputs(names, params: dict) -> set:
+    """Union of the inputs of the features needed for ``names``."""
+    reg = _registry()
+    return {i for n in resolve(names, params) for i in reg[n].inputs}
+
+
+def expand_names(names, params: dict) -> list:
+    """Output columns for ``names``: a family name (e.g. "skew", "acf") stands for all its columns."""
+    reg = _registry()
+    out = []
+    for n in names or []:
+        for c in (reg[n].columns(params) if n in reg else [n]):
+            if c not in out:
+                out.append(c)
+    return out
+
+
+def _source(fn) -> str:
+    """Source of ``fn`` plus the module-level helpers it calls by name (one level)."""
+    import inspect
+    parts = [inspect.getsource(fn)]
+    for name in fn.__code__.co_names:
+        g = fn.__globals__.get(name)
+        if inspect.isfunction(g) and g.__module__ == fn.__module__ and g is not fn:
+            parts.append(inspect.getsource(g))
+    return "\n".join(parts)
+
+
+def feature_fingerprint(column: str, params: dict) -> str:
+    """Hash of what defines output column ``column``: its feature's code, inputs and params, and its deps'.
+
+    Code is the registered function and the module helpers it calls directly;
+    unregistered columns hash to their name alone.
+    """
+    from ..cache import stable_hash, code_fingerprint
+    reg = _registry()
+    owner = column_owner(params).get(column)
+    if owner is None:
+        return stable_hash({"column": column})
+    defn = {n: {"inputs": reg[n].inputs, "deps": reg[n].deps, "code": _source(reg[n].fn),
+                "params": {k: params.get(k) for k in reg[n].params}}
+            for n in resolve([column], params)}
+    return stable_hash({"column": column, "features": defn, "kernels": code_fingerprint("features/rolling.py")})
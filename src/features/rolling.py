@@ -0,0 +1,340 @@
+import numpy as np
+from math import comb
+from ..utils import njit
+
+
+class PrefixMoments:
+    """Rolling count/mean/central moments of a series for any window up to ``block``, O(n) per window.
+
+    Power sums of ``x - a_b`` are accumulated as prefix sums that restart every
+    ``block`` rows, each block ``b`` anchored at its own mean ``a_b``. A window then
+    spans at most two blocks; the older part is rebased onto the newer block's
+    anchor with the binomial expansion. Anchoring per block keeps the summed
+    magnitudes local (no cancellation across months of prices) while the prefix
+    sums are built once and shared by every window. NaNs are skipped and counted.
+    """
+    def __init__(self, x, block: int, order: int = 4):
+        x = np.asarray(x, dtype=float)
+        self.n, self.block, self.order = len(x), int(block), int(order)
+        nb = -(-self.n // self.block) if self.n else 0
+        pad = np.full(nb * self.block, np.nan)
+        pad[:self.n] = x
+        xb = pad.reshape(nb, self.block)
+        fin = np.isfinite(xb)
+        cnt = fin.sum(axis=1)
+        self.anchor = np.where(cnt > 0, np.where(fin, xb, 0.0).sum(axis=1) / np.maximum(cnt, 1), 0.0)
+        d = np.where(fin, xb - self.anchor[:, None], 0.0)
+        self.incl, self.excl, self.tot = [], [], []
+        term = fin.astype(float)
+        for _ in range(self.order + 1):
+            cs = np.cumsum(term, axis=1)
+            ex = np.zeros_like(cs)
+            ex[:, 1:] = cs[:, :-1]
+            self.incl.append(cs.ravel()[:self.n])
+            self.excl.append(ex.ravel()[:self.n])
+            self.tot.append(cs[:, -1] if nb else cs)
+            term = term * d
+
+    def sums(self, w: int):
+        """Window power sums S_0..S_order of ``x - anchor`` for windows ending at ``t >= w-1``, and those anchors."""
+        w = int(w)
+        if w > self.block:
+            raise ValueError(f"window {w} exceeds the prefix block {self.block}")
+        t = np.arange(w - 1, self.n)
+        s = t - w + 1
+        bt, bs = t // self.block, s // self.block
+        same = bs == bt
+        delta = self.anchor[bs] - self.anchor[bt]
+        head = [np.where(same, 0.0, self.tot[k][bs] - self.excl[k][s]) for k in range(self.order + 1)]
+        out = []
+        for k in range(self.order + 1):
+            tail = np.where(same, self.incl[k][t] - self.excl[k][s], self.incl[k][t])
+            for j in range(k + 1):
+                tail = tail + comb(k, j) * delta ** (k - j) * head[j]
+            out.append(tail)
+        return out, self.anchor[bt]
+
+    def moments(self, w: int) -> dict:
+        """Full-length arrays: ``n``, ``mean`` and central moments ``m2``..``m<order>`` (divided by n)."""
+        S, a = self.sums(w)
+        n = S[0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mu = S[1] / n
+            res = {"n": n, "mean": mu + a}
+            if self.order >= 2:
+                res["m2"] = (S[2] - mu * S[1]) / n
+            if self.order >= 3:
+                res["m3"] = (S[3] - 3 * mu * S[2] + 3 * mu**2 * S[1] - n * mu**3) / n
+            if self.order >= 4:
+                res["m4"] = (S[4] - 4 * mu * S[3] + 6 * mu**2 * S[2] - 4 * mu**3 * S[1] + n * mu**4) / n
+        full = {}
+        for k, v in res.items():
+            f = np.full(self.n, np.nan)
+            f[w - 1:] = v
+            full[k] = f
+        return full
+
+
+class SparseTable:
+    """Rolling max or min for any window up to ``max_window`` from one O(n log w) table, O(1) per query."""
+    def __init__(self, x, op=np.fmax, max_window: int = 1):
+        self.op = op
+        self.levels = [np.asarray(x, dtype=float)]
+        span = 1
+        while 2 * span <= max_window:
+            prev = self.levels[-1]
+            self.levels.append(op(prev[:-span], prev[span:]) if len(prev) > span else prev[:0])
+            span *= 2
+
+    def query(self, w: int) -> np.ndarray:
+        w = int(w)
+        n = len(self.levels[0])
+        k = w.bit_length() - 1
+        if k >= len(self.levels):
+            raise ValueError(f"window {w} exceeds the table's max_window")
+        out = np.full(n, np.nan)
+        if n >= w:
+            lvl = self.levels[k]
+            t = np.arange(w - 1, n)
+            out[w - 1:] = self.op(lvl[t - w + 1], lvl[t - (1 << k) + 1])
+        return out
+
+
+def rolling_std(pm: PrefixMoments, w: int, ddof: int = 1) -> np.ndarray:
+    """Like ``Series.rolling(w).std(ddof)`` (NaN unless the window is full)."""
+    m = pm.moments(w)
+    n = m["n"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = np.maximum(m["m2"], 0.0) * n / (n - ddof)
+    return np.where(n == w, np.sqrt(var), np.nan)
+
+
+def rolling_skew(pm: PrefixMoments, w: int, const=None) -> np.ndarray:
+    """Like ``Series.rolling(w).skew()``; ``const`` flags windows whose values are all equal (skew 0)."""
+    m = pm.moments(w)
+    n, B = m["n"], m["m2"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.sqrt(n * (n - 1.0)) * m["m3"] / ((n - 2.0) * B**1.5)
+    out = np.where(B <= 1e-14, np.nan, out)
+    if const is not None:
+        out = np.where(const, 0.0, out)
+    return np.where((n == w) & (n >= 3), out, np.nan)
+
+
+def rolling_kurt(pm: PrefixMoments, w: int, const=None) -> np.ndarray:
+    """Like ``Series.rolling(w).kurt()`` (excess, bias-corrected); all-equal windows give -3."""
+    m = pm.moments(w)
+    n, B = m["n"], m["m2"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        K = (n * n - 1.0) * m["m4"] / (B * B) - 3.0 * (n - 1.0) ** 2
+        out = K / ((n - 2.0) * (n - 3.0))
+    out = np.where(B <= 1e-14, np.nan, out)
+    if const is not None:
+        out = np.where(const, -3.0, out)
+    return np.where((n == w) & (n >= 4), out, np.nan)
+
+
+@njit(cache=True)
+def _insert_sorted(buf, k, v):
+    # shift the tail up in place (back to front): O(k) moves, no temporary
+    i = np.searchsorted(buf[:k], v)
+    for j in range(k, i, -1):
+        buf[j] = buf[j - 1]
+    buf[i] = v
+
+
+@njit(cache=True)
+def _remove_sorted(buf, k, v):
+    i = np.searchsorted(buf[:k], v)
+    for j in range(i, k - 1):
+        buf[j] = buf[j + 1]
+
+
+@njit(cache=True)
+def _kth_deviation(buf, p, k, m, r):
+    """r-th smallest (0-based) |x - m| over sorted ``buf[:k]``, split at ``p`` (first x >= m).
+
+    The deviations form two sorted runs, A[i] = m - buf[p-1-i] and B[j] = buf[p+j] - m;
+    binary search over how many of the r+1 smallest come from A.
+    """
+    na, nb = p, k - p
+    lo, hi = max(0, r + 1 - nb), min(r + 1, na)
+    while lo < hi:
+        a = (lo + hi) // 2
+        b = r + 1 - a
+        if a < na and b > 0 and (m - buf[p - 1 - a]) < (buf[p + b - 1] - m):
+            lo = a + 1
+        else:
+            hi = a
+    a, b = lo, r + 1 - lo
+    out = -np.inf
+    if a > 0:
+        out = max(out, m - buf[p - a])
+    if b > 0:
+        out = max(out, buf[p + b - 1] - m)
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _median_mad_kernel(x, t, w, closed_left):
+    n = len(x)
+    med = np.full(n, np.nan)
+    mad = np.full(n, np.nan)
+    buf = np.empty(n)
+    k = 0
+    lo = 0
+    hi = 0
+    for i in range(n):
+        end = i if closed_left else i + 1
+        while hi < end:
+            if x[hi] == x[hi]:
+                _insert_sorted(buf, k, x[hi])
+                k += 1
+            hi += 1
+        edge = t[i] - w
+        while lo < hi and (t[lo] < edge if closed_left else t[lo] <= edge):
+            if x[lo] == x[lo]:
+                _remove_sorted(buf, k, x[lo])
+                k -= 1
+            lo += 1
+        if k == 0:
+            continue
+        if k % 2:
+            m = buf[k // 2]
+        else:
+            m = (buf[k // 2 - 1] + buf[k // 2]) / 2
+        med[i] = m
+        p = np.searchsorted(buf[:k], m)
+        if k % 2:
+            mad[i] = _kth_deviation(buf, p, k, m, k // 2)
+        else:
+            mad[i] = (_kth_deviation(buf, p, k, m, k // 2 - 1) + _kth_deviation(buf, p, k, m, k // 2)) / 2
+    return med, mad
+
+
+def rolling_median_mad(x, t, window, closed: str = "left"):
+    """Time-based rolling median and MAD (median absolute deviation from that median).
+
+    ``t`` are int64 timestamps (ns, sorted) and ``window`` a length in the same unit.
+    ``closed="left"`` uses the rows in [t - window, t), ``"right"`` those in
+    (t - window, t], matching pandas offset windows. NaNs are skipped; windows with
+    no finite value give NaN. The window is kept sorted, so the median is a lookup
+    and the MAD a selection over the two sorted runs of deviations, O(log w) each;
+    values enter and leave by binary search plus an in-place shift of the values
+    after them, O(w) per row (a memmove, cheap next to re-sorting). Same values as
+    ``nanmedian`` / ``nanmedian(|s - nanmedian(s)|)`` on each window.
+    """
+    if closed not in ("left", "right"):
+        raise ValueError(f"closed must be 'left' or 'right', not {closed!r}")
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    t = np.ascontiguousarray(t, dtype=np.int64)
+    return _median_mad_kernel(x, t, np.int64(window), closed == "left")
+
+
+@njit(cache=True)
+def _quantile_sorted(buf, k, q):
+    # linear interpolation between order statistics, as pandas' rolling quantile
+    pos = q * (k - 1)
+    lo = int(np.floor(pos))
+    hi = min(lo + 1, k - 1)
+    return buf[lo] + (buf[hi] - buf[lo]) * (pos - lo)
+
+
+@njit(cache=True, nogil=True)
+def _quantile_kernel(x, t, w, closed_left, qs):
+    n = len(x)
+    out = np.full((n, len(qs)), np.nan)
+    buf = np.empty(n)
+    k = 0
+    lo = 0
+    hi = 0
+    for i in range(n):
+        end = i if closed_left else i + 1
+        while hi < end:
+            if x[hi] == x[hi]:
+                _insert_sorted(buf, k, x[hi])
+                k += 1
+            hi += 1
+        edge = t[i] - w
+        while lo < hi and (t[lo] < edge if closed_left else t[lo] <= edge):
+            if x[lo] == x[lo]:
+                _remove_sorted(buf, k, x[lo])
+                k -= 1
+            lo += 1
+        if k == 0:
+            continue
+        for j in range(len(qs)):
+            out[i, j] = _quantile_sorted(buf, k, qs[j])
+    return out
+
+
+def rolling_quantiles(x, t, window, qs, closed: str = "left") -> np.ndarray:
+    """Time-based rolling quantiles (n x len(qs)), same windows and NaN rules as ``rolling_median_mad``."""
+    if closed not in ("left", "right"):
+        raise ValueError(f"closed must be 'left' or 'right', not {closed!r}")
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    t = np.ascontiguousarray(t, dtype=np.int64)
+    return _quantile_kernel(x, t, np.int64(window), closed == "left", np.asarray(qs, dtype=np.float64))
+
+
+class SortedWindow:
+    """Time window of values kept sorted, for one-row-at-a-time updates.
+
+    ``evict(edge)`` drops rows older than ``edge`` (the window is [edge, now)), ``push``
+    adds the current row afterwards, each O(w) (binary search plus an in-place
+    shift of the sorted buffer); median, MAD and quantiles are then read in
+    O(log w) with the same arithmetic as the batch kernels.
+    """
+    def __init__(self, times=(), values=()):
+        self.times = list(int(t) for t in times)
+        self.values = list(float(v) for v in values)
+        fin = np.sort(np.asarray([v for v in self.values if v == v], dtype=np.float64))
+        self.buf = np.empty(max(64, 2 * len(fin)))
+        self.buf[:len(fin)] = fin
+        self.k = len(fin)
+        self._head = 0  # index of the oldest live row in times/values
+
+    def __len__(self):
+        return self.k
+
+    def evict(self, edge: int):
+        while self._head < len(self.times) and self.times[self._head] < edge:
+            v = self.values[self._head]
+            if v == v:
+                _remove_sorted(self.buf, self.k, v)
+                self.k -= 1
+            self._head += 1
+        if self._head > 1024 and self._head * 2 > len(self.times):
+            self.times, self.values = self.times[self._head:], self.values[self._head:]
+            self._head = 0
+
+    def push(self, t: int, v: float):
+        self.times.append(int(t))
+        self.values.append(float(v))
+        if v == v:
+            if self.k == len(self.buf):
+                self.buf = np.concatenate([self.buf, np.empty(len(self.buf))])
+            _insert_sorted(self.buf, self.k, float(v))
+            self.k += 1
+
+    def median(self) -> float:
+        k = self.k
+        if k == 0:
+            return np.nan
+        return self.buf[k // 2] if k % 2 else (self.buf[k // 2 - 1] + self.buf[k // 2]) / 2
+
+    def mad(self, m: float) -> float:
+        k = self.k
+        if k == 0:
+            return np.nan
+        p = int(np.searchsorted(self.buf[:k], m))
+        if k % 2:
+            return _kth_deviation(self.buf, p, k, m, k // 2)
+        return (_kth_deviation(self.buf, p, k, m, k // 2 - 1) + _kth_deviation(self.buf, p, k, m, k // 2)) / 2
+
+    def quantile(self, q: float) -> float:
+        return _quantile_sorted(self.buf, self.k, q) if self.k else np.nan
+
+    def state(self) -> dict:
+        return {"t": np.asarray(self.times[self._head:], dtype=np.int64),
+                "x": np.asarray(self.values[self._head:], dtype=np.float64)}
@@ -0,0 +1,115 @@
+import os, json
+import pandas as pd
+from .io import _fold_second_bars
+from .ticks_to_bars import seconds_to_1m
+from .regimes import build_macro_regime
+from .features.micro_features import build_micro_features, warmup_minutes
+from .features.normalization import RollingRobustZ
+from .features.registry import requested_features
+from .cache import stable_hash, code_fingerprint
+
+_STATE_CODE = ("ticks_to_bars.py", "regimes.py", "features/micro_features.py", "features/registry.py",
+               "features/rolling.py", "features/normalization.py", "incremental.py")
+_FRAMES = ("sec_tail", "bars", "macro", "feats", "z_raw")
+
+
+def state_fingerprint(cfg: dict) -> str:
+    """Hash of everything that makes persisted state reusable: config subsections and code."""
+    # n_jobs changes how, not what, so it stays out of the key (as in FeaturePipeline.key)
+    norm = {k: v for k, v in cfg["features"]["normalize"].items() if k != "n_jobs"}
+    return stable_hash({"regime": cfg["regime"], "params": cfg["features"].get("params", {}),
+                        "features": requested_features(cfg["features"]),
+                        "normalize": norm, "code": code_fingerprint(*_STATE_CODE)})
+
+
+class AppendState:
+    """Persisted bars / regimes / features / robust-z that can be extended month by month.
+
+    ``append`` recomputes only the minutes from the first new second onwards, plus a
+    warm-up halo of preceding data: ``warmup_minutes`` bars (and their per-second
+    rows) for the features, and one normalization window of features for the rolling
+    median/MAD. The unwinsorized z is kept, so the full-sample winsorization is
+    re-applied cheaply and the outputs match a full recompute. Macro bars are rebuilt
+    from the stored 1m bars, which is cheap next to the tick and feature work.
+    """
+    def __init__(self, cfg: dict, sec_tail=None, bars=None, macro=None, feats=None, z_raw=None):
+        self.cfg = cfg
+        self.sec_tail, self.bars, self.macro, self.feats, self.z_raw = sec_tail, bars, macro, feats, z_raw
+
+    # -- build / extend ----------------------------------------------------
+    @classmethod
+    def build(cls, sec: pd.DataFrame, cfg: dict) -> "AppendState":
+        """Full computation from per-second aggregates (the starting point for appends)."""
+        st = cls(cfg)
+        st.bars = seconds_to_1m(sec)
+        st.macro = build_macro_regime(st.bars, cfg["regime"])
+        st.feats = st._features(st.bars, sec)
+        st.z_raw = RollingRobustZ.from_config(cfg["features"]["normalize"]).zscore(st.feats)
+        st._keep_tail(sec)
+        return st
+
+    def _features(self, bars, sec):
+        fc = self.cfg["features"]
+        return build_micro_features(bars, sec, fc, features=requested_features(fc), macro=self.macro)
+
+    def _keep_tail(self, sec: pd.DataFrame):
+        # one bar more than the halo: the next append may start inside the last minute
+        halo = warmup_minutes(self.cfg["features"]) + 1
+        start = self.bars.index[max(len(self.bars) - halo, 0)]
+        self.sec_tail = sec[sec.index >= start]
+
+    def append(self, new_sec: pd.DataFrame) -> "AppendState":
+        """Extend the state with per-second aggregates starting after its last stored second."""
+        if new_sec is None or not len(new_sec):
+            return self
+        if new_sec.index[0] <= self.sec_tail.index[-1]:
+            raise ValueError(f"New data starts at {new_sec.index[0]}, not after the last stored second "
+                             f"{self.sec_tail.index[-1]}; rebuild the state instead.")
+        cut = new_sec.index[0].floor("1min")
+        sec = _fold_second_bars([self.sec_tail, new_sec])
+
+        # 1m bars: the stored tail is re-aggregated together with the new seconds
+        bars_tail = seconds_to_1m(sec)
+        self.bars = pd.concat([self.bars[self.bars.index < bars_tail.index[0]], bars_tail])
+        self.macro = build_macro_regime(self.bars, self.cfg["regime"])
+
+        # features: new minutes plus the warm-up halo of bars before them
+        halo = warmup_minutes(self.cfg["features"])
+        pos = int(self.bars.index.searchsorted(cut))
+        bars_win = self.bars.iloc[max(pos - halo, 0):]
+        feats_new = self._features(bars_win, sec[sec.index >= bars_win.index[0]])
+        self.feats = pd.concat([self.feats[self.feats.index < cut], feats_new[feats_new.index >= cut]])
+
+        # robust z: one window of features before the first new minute
+        norm = RollingRobustZ.from_config(self.cfg["features"]["normalize"])
+        lookback = cut - pd.Timedelta(days=norm.window_days)
+        z_new = norm.zscore(self.feats[self.feats.index >= lookback])
+        self.z_raw = pd.concat([self.z_raw[self.z_raw.index < cut], z_new[z_new.index >= cut]])
+
+        self._keep_tail(sec)
+        return self
+
+    def features_z(self) -> pd.DataFrame:
+        """Normalized features, identical to ``RollingRobustZ.transform`` on the full history."""
+        norm = RollingRobustZ.from_config(self.cfg["features"]["normalize"])
+        return norm.winsorize(self.z_raw)
+
+    # -- persistence -------------------------------------------------------
+    def save(self, state_dir: str):
+        os.makedirs(state_dir, exist_ok=True)
+        for name in _FRAMES:
+            tmp = os.path.join(state_dir, f"{name}.pkl.tmp")
+            pd.to_pickle(getattr(self, name), tmp)
+            os.replace(tmp, os.path.join(state_dir, f"{name}.pkl"))
+        meta = {"fingerprint": state_fingerprint(self.cfg), "last_minute": str(self.bars.index[-1]),
+                "n_bars": int(len(self.bars)), "n_features": int(len(self.feats))}
+        with open(os.path.join(state_dir, "state.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, state_dir: str, cfg: dict) -> "AppendState":
+        meta = json.load(open(os.path.join(state_dir, "state.json"), "r", encoding="utf-8"))
+        if meta.get("fingerprint") != state_fingerprint(cfg):
+            raise ValueError(f"State in {state_dir} was built with a different config or code; rebuild it.")
+        frames = {name: pd.read_pickle(os.path.join(state_dir, f"{name}.pkl")) for name in _FRAMES}
+        return cls(cfg, **frames)
@@ -1,73 +1,273 @@
-import os, glob, pandas as pd, numpy as np
-from .utils import ensure_datetime_index
+import os, glob, json, hashlib, shutil, pandas as pd, numpy as np
+from .utils import ensure_datetime_index, to_utc_timestamp, resolve_workers
 
 def ensure_dirs(paths):
     for p in paths:
         os.makedirs(p, exist_ok=True)
 
-def load_ticks(globs, show_progress: bool = False):
-    if not globs:
-        return None
-    paths = []
-    for g in globs:
-        paths.extend(glob.glob(g))
-    if not paths:
+def _normalize_tick_frame(df: pd.DataFrame):
+    """Lowercase columns, parse timestamps and keep tick columns; None if not a tick frame."""
+    df.columns = [c.lower() for c in df.columns]
+    if "timestamp" not in df.columns or "price" not in df.columns or "qty" not in df.columns:
         return None
-    dfs = []
+    df = ensure_datetime_index(df)
+    cols = ["price", "qty"] + (["is_buyer_maker"] if "is_buyer_maker" in df.columns else [])
+    return df[cols]
+
+def _clip_range(df, start=None, end=None):
+    if start is not None:
+        df = df[df.index >= to_utc_timestamp(start)]
+    if end is not None:
+        df = df[df.index < to_utc_timestamp(end)]
+    return df
+
+def _map_files(fn, paths, n_jobs=None, show_progress: bool = False, prefix: str = "Load", **kwargs):
+    """Apply ``fn(path, **kwargs)`` to every path, in a process pool when ``n_jobs`` allows.
+
+    Results come back in ``paths`` order; the progress bar advances as each file finishes.
+    """
     pb = None
     if show_progress:
         try:
             from .cli import ProgressBar
-            pb = ProgressBar(total=len(paths), prefix="Load ticks")
+            pb = ProgressBar(total=len(paths), prefix=prefix)
         except Exception:
             pb = None
-    for i, p in enumerate(sorted(paths), start=1):
-        df = pd.read_csv(p)
-        # Normalize column names
-        df.columns = [c.lower() for c in df.columns]
-        if "timestamp" not in df.columns or "price" not in df.columns or "qty" not in df.columns:
-            if pb: pb.advance(1)
-            continue
-        df = ensure_datetime_index(df)
-        cols = ["price", "qty"] + (["is_buyer_maker"] if "is_buyer_maker" in df.columns else [])
-        dfs.append(df[cols])
-        if pb:
-            pb.update(i)
+    workers = resolve_workers(n_jobs, len(paths))
+    out = [None] * len(paths)
+    if workers == 1:
+        for i, p in enumerate(paths):
+            out[i] = fn(p, **kwargs)
+            if pb:
+                pb.advance(1)
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futs = {ex.submit(fn, p, **kwargs): i for i, p in enumerate(paths)}
+            for f in as_completed(futs):
+                out[futs[f]] = f.result()
+                if pb:
+                    pb.advance(1)
     if pb:
         pb.finish()
-    if not dfs:
-        return None
-    out = pd.concat(dfs).sort_index()
     return out
 
-def load_bars_1m(globs, show_progress: bool = False):
+def _concat_time_ordered(parts):
+    """Concatenate per-file frames in time order; only sort globally if their spans overlap."""
+    parts = [d for d in parts if d is not None and len(d)]
+    if not parts:
+        return None
+    parts = [d if d.index.is_monotonic_increasing else d.sort_index() for d in parts]
+    parts.sort(key=lambda d: d.index[0])
+    disjoint = all(a.index[-1] <= b.index[0] for a, b in zip(parts[:-1], parts[1:]))
+    out = pd.concat(parts)
+    return out if disjoint else out.sort_index()
+
+def _read_tick_csv(path, start=None, end=None):
+    df = _normalize_tick_frame(pd.read_csv(path))
+    return None if df is None else _clip_range(df, start, end)
+
+def load_ticks(globs, show_progress: bool = False, store=None, symbol=None, start=None, end=None, columns=None,
+               n_jobs=None):
+    """Load ticks as a UTC-indexed frame (price, qty[, is_buyer_maker]).
+
+    If ``store`` points at a tick store built by ``scripts/ingest_ticks.py`` and holds
+    ``symbol``, read it with column projection and the [start, end) range; otherwise
+    parse the CSVs matched by ``globs``, ``n_jobs`` files at a time in worker processes.
+    """
+    if store and symbol:
+        from .tick_store import has_symbol, read_ticks
+        if has_symbol(store, symbol):
+            return read_ticks(store, symbol, start=start, end=end, columns=columns)
     if not globs:
         return None
     paths = []
     for g in globs:
-        import glob as _glob
-        paths.extend(_glob.glob(g))
+        paths.extend(glob.glob(g))
     if not paths:
         return None
-    dfs = []
-    pb = None
-    if show_progress:
+    dfs = _map_files(_read_tick_csv, sorted(paths), n_jobs=n_jobs, show_progress=show_progress,
+                     prefix="Load ticks", start=start, end=end)
+    out = _concat_time_ordered(dfs)
+    if out is None:
+        return None
+    if columns:
+        out = out[[c for c in columns if c in out.columns]]
+    return out
+
+def _iter_csv_tick_chunks(paths, chunksize, start=None, end=None):
+    for p in paths:
+        for chunk in pd.read_csv(p, chunksize=chunksize):
+            df = _normalize_tick_frame(chunk)
+            if df is None:
+                break
+            df = _clip_range(df, start, end)
+            if len(df):
+                yield df
+
+def _fold_second_bars(aggs) -> pd.DataFrame:
+    """Concatenate time-ordered per-second aggregates, merging seconds that repeat at part edges."""
+    from .ticks_to_bars import merge_second_bars
+    parts, carry = [], None
+    for agg in aggs:
+        if agg is None or not len(agg):
+            continue
+        if carry is not None:
+            if carry.index[-1] < agg.index[0]:
+                parts.append(carry)
+            else:
+                agg = merge_second_bars([carry, agg])
+        parts.append(agg.iloc[:-1])
+        carry = agg.iloc[-1:]
+    if carry is not None:
+        parts.append(carry)
+    if not parts:
+        return None
+    out = pd.concat(parts)
+    if not out.index.is_monotonic_increasing or out.index.has_duplicates:
+        # parts were not time-ordered; fall back to a full merge
+        out = merge_second_bars([out])
+    return out
+
+def stream_ticks_1s(chunks) -> pd.DataFrame:
+    """Fold an iterable of time-ordered tick chunks into per-second aggregates.
+
+    Only one chunk of ticks is held at a time. The last second of every chunk is
+    carried into the next one, so trades of a second split across chunk or file
+    boundaries end up in a single row.
+    """
+    from .ticks_to_bars import ticks_to_1s
+    return _fold_second_bars(ticks_to_1s(c) for c in chunks)
+
+_SECOND_CACHE_VERSION = "sec1s-v1"
+
+def file_digest(path: str, memo: dict = None) -> str:
+    """Content hash of a file; ``memo`` maps (path, size, mtime) to known digests to skip rehashing."""
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    if memo is not None and key in memo:
+        return memo[key]
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 23), b""):
+            h.update(block)
+    out = h.hexdigest()
+    if memo is not None:
+        memo[key] = out
+    return out
+
+def sources_key(paths, memo_dir=None, **extra) -> str:
+    """Hash of the contents of ``paths`` plus ``extra`` settings; digests are memoised in ``memo_dir``."""
+    memo = {}
+    memo_fp = os.path.join(memo_dir, "file_digests.json") if memo_dir else None
+    if memo_fp:
         try:
-            from .cli import ProgressBar
-            pb = ProgressBar(total=len(paths), prefix="Load 1m bars")
+            memo = json.load(open(memo_fp, "r", encoding="utf-8"))
         except Exception:
-            pb = None
-    for i, p in enumerate(sorted(paths), start=1):
-        df = pd.read_csv(p, parse_dates=["timestamp"]).set_index("timestamp")
-        dfs.append(df)
-        if pb:
-            pb.update(i)
-    if pb:
-        pb.finish()
-    if not dfs:
+            memo = {}
+    digests = sorted(file_digest(p, memo) for p in paths)
+    if memo_fp:
+        os.makedirs(memo_dir, exist_ok=True)
+        with open(memo_fp, "w", encoding="utf-8") as f:
+            json.dump(memo, f)
+    payload = json.dumps({"v": _SECOND_CACHE_VERSION, "files": digests, **{k: str(v) for k, v in extra.items()}},
+                         sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def save_second_bars(sec: pd.DataFrame, path: str):
+    """Persist per-second aggregates as one .npy per column (memory-mappable) plus a manifest."""
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "timestamp.npy"), sec.index.as_unit("ns").asi8)
+    for c in sec.columns:
+        np.save(os.path.join(tmp, f"{c}.npy"), sec[c].to_numpy())
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": _SECOND_CACHE_VERSION, "columns": list(sec.columns), "rows": int(len(sec))}, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+def open_second_bars(path: str):
+    """Memory-map per-second aggregates written by ``save_second_bars``; None if absent."""
+    try:
+        man = json.load(open(os.path.join(path, "manifest.json"), "r", encoding="utf-8"))
+    except Exception:
         return None
-    out = pd.concat(dfs).sort_index()
-    return out
+    if man.get("version") != _SECOND_CACHE_VERSION:
+        return None
+    ts = np.load(os.path.join(path, "timestamp.npy"))
+    idx = pd.DatetimeIndex(pd.to_datetime(ts, unit="ns", utc=True), name="timestamp")
+    cols = {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r") for c in man["columns"]}
+    return pd.DataFrame(cols, index=idx, copy=False)
+
+def tick_source_paths(globs, store=None, symbol=None, start=None, end=None):
+    """Files the tick loaders would read: (tick store parts, True) if the store holds ``symbol``, else (CSVs, False)."""
+    if store and symbol:
+        from .tick_store import has_symbol, store_paths
+        if has_symbol(store, symbol):
+            return store_paths(store, symbol, start=start, end=end), True
+    paths = []
+    for g in globs or []:
+        paths.extend(glob.glob(g))
+    return sorted(paths), False
+
+def _stream_csv_1s(path, chunksize=1_000_000, start=None, end=None):
+    return stream_ticks_1s(_iter_csv_tick_chunks([path], chunksize, start, end))
+
+def load_ticks_1s(globs, show_progress: bool = False, store=None, symbol=None, start=None, end=None,
+                  chunksize: int = 1_000_000, cache_dir=None, n_jobs=None):
+    """Per-second aggregates (see ``ticks_to_1s``) streamed chunk by chunk.
+
+    Peak memory is set by ``chunksize`` (CSV rows) or one day partition of the tick
+    store, not by the size of the dataset. Files are expected to be time-ordered, as
+    the monthly dumps are. Files (or store days) are folded ``n_jobs`` at a time in
+    worker processes, each holding one chunk.
+
+    With ``cache_dir`` the result is persisted under a key made of the source file
+    hashes and the time range, and later calls memory-map it without touching ticks.
+    """
+    paths, use_store = tick_source_paths(globs, store=store, symbol=symbol, start=start, end=end)
+    if not paths:
+        return None
+    cache_path = None
+    if cache_dir:
+        key = sources_key(paths, cache_dir, start=start, end=end)
+        cache_path = os.path.join(cache_dir, f"sec1s-{key}")
+        sec = open_second_bars(cache_path)
+        if sec is not None:
+            return sec
+
+    if use_store:
+        from .tick_store import store_days, read_day_1s
+        parts = _map_files(read_day_1s, store_days(store, symbol, start, end), n_jobs=n_jobs,
+                           show_progress=show_progress, prefix="Stream ticks",
+                           root=store, symbol=symbol, start=start, end=end)
+        sec = _fold_second_bars(parts)
+    else:
+        parts = _map_files(_stream_csv_1s, paths, n_jobs=n_jobs, show_progress=show_progress,
+                           prefix="Stream ticks", chunksize=chunksize, start=start, end=end)
+        # each file is folded on its own; seconds straddling two files are merged here
+        parts = sorted((x for x in parts if x is not None), key=lambda x: x.index[0])
+        sec = _fold_second_bars(parts)
+    if sec is not None and cache_path:
+        save_second_bars(sec, cache_path)
+        sec = open_second_bars(cache_path)
+    return sec
+
+def _read_bars_csv(path):
+    return pd.read_csv(path, parse_dates=["timestamp"]).set_index("timestamp")
+
+def load_bars_1m(globs, show_progress: bool = False, n_jobs=None):
+    if not globs:
+        return None
+    paths = []
+    for g in globs:
+        paths.extend(glob.glob(g))
+    if not paths:
+        return None
+    dfs = _map_files(_read_bars_csv, sorted(paths), n_jobs=n_jobs, show_progress=show_progress,
+                     prefix="Load 1m bars")
+    return _concat_time_ordered(dfs)
 
 def maybe_make_synthetic(n_minutes=5000, seed=42):
     rng = np.random.default_rng(seed)
@@ -0,0 +1,110 @@
+import glob
+import pandas as pd
+from .io import maybe_make_synthetic, load_ticks_1s, load_bars_1m, tick_source_paths, sources_key
+from .ticks_to_bars import ticks_to_1s, seconds_to_1m
+from .regimes import build_macro_regime
+from .features.micro_features import build_micro_features
+from .features.registry import requested_features, required_inputs
+from .features.normalization import RollingRobustZ
+from .cache import StageCache, stable_hash, code_fingerprint
+from .cli import info
+
+# Source modules whose code determines each stage's output (relative to src/)
+_STAGE_CODE = {
+    "bars": ("io.py", "tick_store.py", "ticks_to_bars.py", "utils.py"),
+    "macro": ("regimes.py",),
+    "features": ("features/micro_features.py", "features/registry.py", "features/rolling.py"),
+    "features_z": ("features/normalization.py", "features/rolling.py"),
+}
+
+
+class FeaturePipeline:
+    """Bars -> macro regime -> micro features -> rolling robust z, shared by the run scripts.
+
+    Every stage is memoised on the instance and, given a ``StageCache``, persisted
+    under a key chained from its upstream key, its config subsection and the code
+    of the modules that produce it. An event study and a hazard run on the same
+    config therefore share bars, regimes and (normalized) features.
+    """
+    def __init__(self, cfg: dict, cache: StageCache = None, show_progress: bool = True):
+        self.cfg = cfg
+        self.cache = cache or StageCache(None, enabled=False)
+        self.show_progress = show_progress
+        self._memo = {}
+        self._keys = {}
+
+    # -- keys --------------------------------------------------------------
+    def _data_key(self) -> str:
+        if "data" not in self._keys:
+            d = self.cfg["data"]
+            paths, _ = tick_source_paths(d.get("ticks_glob"), store=d.get("tick_store"), symbol=d.get("symbol"),
+                                         start=d.get("start"), end=d.get("end"))
+            bar_paths = sorted(p for g in (d.get("bars_1m_glob") or []) for p in glob.glob(g))
+            if not paths and not bar_paths:
+                self._keys["data"] = "synthetic-v1"
+            else:
+                self._keys["data"] = sources_key(paths + bar_paths, d.get("cache_dir") or self.cache.root,
+                                                 start=d.get("start"), end=d.get("end"))
+        return self._keys["data"]
+
+    def key(self, stage: str) -> str:
+        if stage not in self._keys:
+            upstream = {
+                "bars": lambda: {"data": self._data_key()},
+                "macro": lambda: {"bars": self.key("bars"), "regime": self.cfg["regime"]},
+                "features": lambda: {"bars": self.key("bars"), "macro": self.key("macro"),
+                                     "params": self.cfg["features"].get("params", {}),
+                                     "features": requested_features(self.cfg["features"])},
+                "features_z": lambda: {"features": self.key("features"),
+                                       # n_jobs changes how, not what, so it stays out of the key
+                                       "normalize": {k: v for k, v in self.cfg["features"]["normalize"].items()
+                                                     if k != "n_jobs"}},
+            }[stage]()
+            upstream["code"] = code_fingerprint(*_STAGE_CODE[stage])
+            self._keys[stage] = stable_hash(upstream)
+        return self._keys[stage]
+
+    def _stage(self, stage, compute):
+        if stage not in self._memo:
+            self._memo[stage] = self.cache.fetch(stage, self.key(stage), compute)
+        return self._memo[stage]
+
+    # -- stages ------------------------------------------------------------
+    def seconds(self) -> pd.DataFrame:
+        """Per-second aggregates (only loaded when a stage actually has to be computed)."""
+        if "seconds" not in self._memo:
+            d = self.cfg["data"]
+            sec = load_ticks_1s(d.get("ticks_glob"), show_progress=self.show_progress,
+                                store=d.get("tick_store"), symbol=d.get("symbol"),
+                                start=d.get("start"), end=d.get("end"),
+                                cache_dir=d.get("cache_dir"), n_jobs=d.get("n_jobs"))
+            if sec is None:
+                info("No ticks found. Generating synthetic sample...")
+                sec = ticks_to_1s(maybe_make_synthetic())
+            self._memo["seconds"] = sec
+        return self._memo["seconds"]
+
+    def bars(self) -> pd.DataFrame:
+        def _compute():
+            d = self.cfg["data"]
+            bars_1m = load_bars_1m(d.get("bars_1m_glob"), show_progress=self.show_progress, n_jobs=d.get("n_jobs"))
+            return bars_1m if bars_1m is not None else seconds_to_1m(self.seconds())
+        return self._stage("bars", _compute)
+
+    def macro(self) -> pd.DataFrame:
+        return self._stage("macro", lambda: build_macro_regime(self.bars(), self.cfg["regime"]))
+
+    def features(self) -> pd.DataFrame:
+        def _compute():
+            # only the features the run keeps (and their inputs) are computed
+            fc = self.cfg["features"]
+            names = requested_features(fc)
+            needs = required_inputs(names, fc.get("params", {}))
+            return build_micro_features(self.bars(), self.seconds() if "sec" in needs else None, fc,
+                                        features=names, macro=self.macro() if "macro" in needs else None)
+        return self._stage("features", _compute)
+
+    def features_z(self) -> pd.DataFrame:
+        def _compute():
+            return RollingRobustZ.from_config(self.cfg["features"]["normalize"]).transform(self.features())
+        return self._stage("features_z", _compute)
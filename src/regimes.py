@@ -1,7 +1,11 @@
+import bisect, itertools
+from collections import deque
 import pandas as pd, numpy as np
 from sklearn.linear_model import LinearRegression
+from .utils import njit
 
 def _ols_slope_r2(y: np.ndarray):
+    """Reference fit for one window (finite values at x = 0..n-1); see ``rolling_ols_slope_r2``."""
     y = np.asarray(y, dtype=float)
     mask = np.isfinite(y)
     n = int(mask.sum())
@@ -13,52 +17,110 @@ def _ols_slope_r2(y: np.ndarray):
     r2 = lr.score(x, y[mask])
     return slope, r2
 
+def rolling_ols_slope_r2(y, window: int):
+    """OLS slope and R² of ``y`` on 0..n-1 over the ``window`` values *before* each row.
+
+    Same as ``_ols_slope_r2(y[i-window:i])`` for every ``i >= window`` (NaN before):
+    non-finite values are dropped and the remaining ones take consecutive x, and
+    fewer than two give NaN. Closed form from prefix sums of y, y² and c·y, where c
+    counts the finite values before a row, so within a window x = c - c[start].
+    """
+    y = np.asarray(y, dtype=float)
+    n_all = len(y)
+    slope = np.full(n_all, np.nan)
+    r2 = np.full(n_all, np.nan)
+    w = int(window)
+    if n_all <= w:
+        return slope, r2
+    fin = np.isfinite(y)
+    yc = np.where(fin, y - (y[fin].mean() if fin.any() else 0.0), 0.0)   # centred: smaller prefix sums
+    c = np.concatenate([[0.0], np.cumsum(fin)])                          # finite values before each row
+
+    def _pre(v):
+        return np.concatenate([[0.0], np.cumsum(v)])
+    P0, P1, P2, P3 = _pre(fin.astype(float)), _pre(yc), _pre(yc * yc), _pre(c[:-1] * yc)
+    e = np.arange(w, n_all)          # window [e - w, e)
+    s = e - w
+    n = P0[e] - P0[s]
+    sy = P1[e] - P1[s]
+    syy = P2[e] - P2[s]
+    sxy = P3[e] - P3[s] - c[s] * sy
+    sx = n * (n - 1) / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        varx = n * (n * n - 1) / 12
+        cov = sxy - sx * sy / n
+        vary = syy - sy * sy / n
+        b = cov / varx
+        rr = cov * cov / (varx * vary)
+    # a constant window fits exactly (sklearn scores it 1.0); its vary is only rounding noise
+    ys = pd.Series(np.where(fin, y, np.nan))
+    span = (ys.rolling(w, min_periods=1).max() - ys.rolling(w, min_periods=1).min()).to_numpy()[e - 1]
+    const = span == 0
+    b = np.where(const, 0.0, b)
+    rr = np.where(const, 1.0, np.minimum(rr, 1.0))
+    ok = n >= 2
+    slope[e] = np.where(ok, b, np.nan)
+    r2[e] = np.where(ok, rr, np.nan)
+    return slope, r2
+
+def macro_bars(bars_1m: pd.DataFrame, bar: str) -> pd.DataFrame:
+    """OHLC macro bars of length ``bar`` (e.g. "4h") from 1m bars; bars without a close are dropped."""
+    agg = bars_1m.resample(bar).agg({"open":"first","high":"max","low":"min","close":"last"})
+    return agg.dropna(subset=["close"])  # ensure finite close
+
+_TREND_NAMES = np.array(["bear", "range", "bull"], dtype=object)   # by code + 1
+
+def _trend_codes(slope, r2, r2_min) -> np.ndarray:
+    """Trend state before hysteresis as int8: 1 bull, -1 bear, 0 range (incl. NaN fits)."""
+    strong = np.asarray(r2) >= r2_min
+    slope = np.asarray(slope)
+    return np.where(strong & (slope > 0), 1, np.where(strong & (slope < 0), -1, 0)).astype(np.int8)
+
+@njit(cache=True)
+def _hysteresis_kernel(states, h):
+    """Hysteresis of each row of ``states`` (configs x bars): a new state must persist ``h[row]`` bars.
+
+    Bars that differ from the held state count up (the count resets only on a bar
+    equal to it) and the state switches once the count reaches h; the first bar's
+    state is held from the start. ``RegimeTracker.update`` is the one-bar step.
+    """
+    n_cfg, n = states.shape
+    out = np.empty_like(states)
+    for c in range(n_cfg):
+        if n == 0:
+            continue
+        last = states[c, 0]
+        cnt = 0
+        out[c, 0] = last
+        for i in range(1, n):
+            s = states[c, i]
+            if s != last:
+                cnt += 1
+                if cnt >= h[c]:
+                    last = s
+                    cnt = 0
+            else:
+                cnt = 0
+            out[c, i] = last
+    return out
+
 def build_macro_regime(bars_1m: pd.DataFrame, cfg: dict) -> pd.DataFrame:
     """Build 4h macro bars → trend state (bull/bear/range) + vol bucket, with hysteresis."""
-    macro = bars_1m.copy()
-    macro["ret"] = np.log(macro["close"]).diff()
-    # build macro bars
-    bar = cfg["macro_bar"]
-    agg = macro.resample(bar).agg({"open":"first","high":"max","low":"min","close":"last"})
-    agg = agg.dropna(subset=["close"])  # ensure finite close
+    agg = macro_bars(bars_1m, cfg["macro_bar"])
     # realized volatility proxy over macro bars; avoid implicit filling warnings
     close_ret = agg["close"].pct_change(fill_method=None)
-    agg["rv"] = close_ret.rolling(cfg["vol_bucket"]["lookback_bars"]).apply(
-        lambda s: np.sqrt(np.nansum((s.astype(float))**2)), raw=False
-    )
-    # trend via OLS slope on log-price
+    # (root of the rolling sum of squared returns; windows need lookback_bars finite returns)
+    agg["rv"] = np.sqrt((close_ret**2).rolling(cfg["vol_bucket"]["lookback_bars"]).sum())
+    # trend via OLS slope on log-price (over the lookback_bars bars before each bar)
     look = cfg["detector"]["lookback_bars"]
     r2_min = cfg["detector"]["r2_min"]
-    slopes, r2s = [], []
     logp = np.log(agg["close"]).replace([np.inf, -np.inf], np.nan)
-    for i in range(len(agg)):
-        if i < look:
-            slopes.append(np.nan); r2s.append(np.nan); continue
-        s, r2 = _ols_slope_r2(logp.iloc[i-look:i].values)
-        slopes.append(s); r2s.append(r2)
-    agg["slope"] = slopes
-    agg["r2"] = r2s
-    state = pd.Series("range", index=agg.index, dtype=object)
-    state[(agg["slope"]>0)&(agg["r2"]>=r2_min)] = "bull"
-    state[(agg["slope"]<0)&(agg["r2"]>=r2_min)] = "bear"
+    agg["slope"], agg["r2"] = rolling_ols_slope_r2(logp.to_numpy(), look)
     # hysteresis: require persistence to flip
     h = cfg["detector"]["hysteresis_bars"]
-    state_h = state.copy()
-    last = state.iloc[0]
-    cnt = 0
-    for i, s in enumerate(state):
-        if i==0: continue
-        if s!= last:
-            cnt += 1
-            if cnt >= h:
-                last = s
-                cnt = 0
-            else:
-                state_h.iloc[i] = last
-        else:
-            cnt = 0
-            state_h.iloc[i] = last
-    agg["trend_state"] = state_h.values
+    raw = _trend_codes(agg["slope"], agg["r2"], r2_min)
+    held = _hysteresis_kernel(raw[None, :], np.array([h], dtype=np.int64))[0]
+    agg["trend_state"] = _TREND_NAMES[held + 1]
     # vol buckets
     cuts = cfg["vol_bucket"]["cuts"]
     pct = agg["rv"].rank(pct=True)
@@ -66,21 +128,152 @@ def build_macro_regime(bars_1m: pd.DataFrame, cfg: dict) -> pd.DataFrame:
     agg["vol_state"] = vb.astype(str)
     return agg
 
+GRID_KEYS = ("macro_bar", "lookback_bars", "r2_min", "hysteresis_bars")
+
+def regime_grid(bars_1m: pd.DataFrame, cfg: dict, grid: dict):
+    """Trend flips for every detector config in the product of ``grid``'s lists.
+
+    ``grid`` maps keys of ``GRID_KEYS`` to candidate values; missing keys take the
+    value in the ``regime`` config ``cfg``. Macro bars are built once per macro_bar,
+    the rolling OLS once per lookback, and every (r2_min, hysteresis_bars) pair of a
+    lookback goes through one compiled hysteresis pass. Returns a summary frame (one
+    row per config, product order: the keys, ``n_bars``, ``n_flips``, ``flips_per_day``)
+    and the list of flip times per row, equal to ``find_flips(build_macro_regime(...))``.
+    """
+    axes = {"macro_bar": [cfg["macro_bar"]], "lookback_bars": [cfg["detector"]["lookback_bars"]],
+            "r2_min": [cfg["detector"]["r2_min"]], "hysteresis_bars": [cfg["detector"]["hysteresis_bars"]]}
+    for k, v in (grid or {}).items():
+        if k not in axes:
+            raise ValueError(f"Unknown regime grid key {k!r}; expected one of {GRID_KEYS}")
+        axes[k] = list(v) if isinstance(v, (list, tuple)) else [v]
+    pairs = list(itertools.product(axes["r2_min"], axes["hysteresis_bars"]))
+    h = np.array([hb for _, hb in pairs], dtype=np.int64)
+    rows, flips = [], []
+    for bar in axes["macro_bar"]:
+        agg = macro_bars(bars_1m, bar)
+        logp = np.log(agg["close"]).replace([np.inf, -np.inf], np.nan).to_numpy()
+        days = max((agg.index[-1] - agg.index[0]).total_seconds() / 86400, 1e-9) if len(agg) else np.nan
+        for look in axes["lookback_bars"]:
+            slope, r2 = rolling_ols_slope_r2(logp, look)
+            raw = {r: _trend_codes(slope, r2, r) for r in axes["r2_min"]}
+            states = _hysteresis_kernel(np.stack([raw[r] for r, _ in pairs]), h)
+            change = states[:, 1:] != states[:, :-1]
+            for j, (r, hb) in enumerate(pairs):
+                pos = np.flatnonzero(change[j]) + 1
+                flips.append(agg.index[pos])
+                rows.append({"macro_bar": bar, "lookback_bars": look, "r2_min": r, "hysteresis_bars": hb,
+                             "n_bars": len(agg), "n_flips": len(pos), "flips_per_day": len(pos) / days})
+    return pd.DataFrame(rows), flips
+
+class RegimeTracker:
+    """Live macro regime: feed closed macro bars one at a time, get the state and flips as they happen.
+
+    Keeps the last ``lookback_bars`` log-closes for the OLS fit, the hysteresis count,
+    the returns behind ``rv`` and the sorted ``rv`` history for the vol-bucket rank.
+    Trend states and flips match ``build_macro_regime``/``find_flips`` on the same
+    bars; ``vol_state`` ranks ``rv`` among the bars seen so far, i.e. the batch value
+    of the latest bar when the batch is run on the history up to it.
+    """
+    def __init__(self, cfg: dict):
+        self.look = int(cfg["detector"]["lookback_bars"])
+        self.r2_min = cfg["detector"]["r2_min"]
+        self.h = cfg["detector"]["hysteresis_bars"]
+        self.rv_look = int(cfg["vol_bucket"]["lookback_bars"])
+        self.cuts = cfg["vol_bucket"]["cuts"]
+        self.logp = deque(maxlen=self.look)
+        self.rets = deque(maxlen=self.rv_look)
+        self.rv_sorted = []
+        self.prev_close = None
+        self.state = None      # held trend code
+        self.cnt = 0
+        self.flips = []
+
+    def _fit(self):
+        # same closed form as the batch path: the window then one placeholder row
+        if len(self.logp) < self.look:
+            return np.nan, np.nan
+        slope, r2 = rolling_ols_slope_r2(np.append(np.asarray(self.logp, dtype=float), np.nan), self.look)
+        return slope[-1], r2[-1]
+
+    def _vol_state(self, rv) -> str:
+        if rv != rv:
+            return "nan"
+        lo, hi = bisect.bisect_left(self.rv_sorted, rv), bisect.bisect_right(self.rv_sorted, rv)
+        pct = (lo + (hi - lo + 1) / 2) / len(self.rv_sorted)    # average rank, as Series.rank(pct=True)
+        inner = self.cuts[1:-1]
+        return ["low", "mid", "high"][bisect.bisect_left(inner, pct)]
+
+    def update(self, ts, bar):
+        """Add the closed macro bar ``bar`` (needs "close") ending the period ``ts``; returns its row, or None.
+
+        Bars without a finite close are skipped, as ``macro_bars`` drops them. The row
+        holds slope, r2, rv, trend_state, vol_state and ``flip`` (trend state changed).
+        """
+        close = float(bar["close"])
+        if close != close:
+            return None
+        slope, r2 = self._fit()
+        with np.errstate(divide="ignore"):
+            lp = np.log(close)
+        self.logp.append(lp if np.isfinite(lp) else np.nan)
+        ret = close / self.prev_close - 1 if self.prev_close is not None else np.nan
+        self.prev_close = close
+        self.rets.append(ret)
+        r = np.asarray(self.rets, dtype=float)
+        rv = float(np.sqrt(np.sum(r * r))) if len(r) == self.rv_look and np.isfinite(r).all() else np.nan
+        if rv == rv:
+            bisect.insort(self.rv_sorted, rv)
+
+        code = int(_trend_codes(slope, r2, self.r2_min))
+        flip = False
+        if self.state is None:
+            self.state = code
+        elif code != self.state:
+            self.cnt += 1
+            if self.cnt >= self.h:
+                self.state, self.cnt, flip = code, 0, True
+        else:
+            self.cnt = 0
+        ts = pd.Timestamp(ts)
+        if flip:
+            self.flips.append(ts)
+        return {"ts": ts, "slope": slope, "r2": r2, "rv": rv, "trend_state": _TREND_NAMES[self.state + 1],
+                "vol_state": self._vol_state(rv), "flip": flip}
+
+    def run(self, macro: pd.DataFrame) -> pd.DataFrame:
+        """``update`` over the rows of a macro bar frame (e.g. ``macro_bars``); one output row per kept bar."""
+        rows = [self.update(ts, bar) for ts, bar in macro.iterrows()]
+        return pd.DataFrame([r for r in rows if r is not None]).set_index("ts")
+
 def find_flips(macro: pd.DataFrame) -> pd.DatetimeIndex:
     st = macro["trend_state"].astype(str)
     flips = st[st!=st.shift(1)].index[1:]
     return flips
 
+def flip_label_matrix(macro: pd.DataFrame, flips, horizons):
+    """Flip labels and lead times on the 1m grid of ``macro``'s span for several horizons at once.
+
+    Column ``h`` of ``labels`` (int8) is 1 where a flip occurs in [t - h, t), i.e.
+    within (flip, flip + h]; column ``h`` of ``lead`` is the minutes from t to the
+    latest flip in [t, t + h), NaN if none. Both come from binary searches of the
+    sorted flip times, O(n log flips) per horizon.
+    """
+    idx = pd.date_range(macro.index.min(), macro.index.max(), freq="1min")
+    t = idx.as_unit("ns").asi8
+    f = np.sort(pd.DatetimeIndex(flips).as_unit("ns").asi8)
+    horizons = list(horizons)
+    labels = np.zeros((len(t), len(horizons)), dtype=np.int8)
+    lead = np.full((len(t), len(horizons)), np.nan)
+    for j, h in enumerate(horizons):
+        H = int(pd.Timedelta(minutes=h).value)
+        labels[:, j] = np.searchsorted(f, t, "left") > np.searchsorted(f, t - H, "left")
+        k = np.searchsorted(f, t + H, "left") - 1
+        nxt = f[np.maximum(k, 0)] if len(f) else t
+        has = (k >= 0) & (nxt >= t)
+        lead[:, j] = np.where(has, (nxt - t) / 1e9 / 60.0, np.nan)
+    return pd.DataFrame(labels, index=idx, columns=horizons), pd.DataFrame(lead, index=idx, columns=horizons)
+
 def make_flip_labels(macro: pd.DataFrame, flips, horizon_min=180):
     """Binary label at 1m resolution: flip occurs within (t, t+H]."""
-    idx = pd.date_range(macro.index.min(), macro.index.max(), freq="1min")
-    y = pd.Series(0, index=idx, dtype=int)
-    for t in flips:
-        win = (y.index > t) & (y.index <= t + pd.Timedelta(minutes=horizon_min))
-        y.loc[win] = 1
-    # lead time (optional)
-    lead = pd.Series(np.nan, index=y.index)
-    for t in flips:
-        mask = (lead.index <= t) & (lead.index > t - pd.Timedelta(minutes=horizon_min))
-        lead.loc[mask] = (t - lead.index[mask]).total_seconds()/60.0
-    return y, lead
+    labels, lead = flip_label_matrix(macro, flips, [horizon_min])
+    return labels[horizon_min].astype(int).rename(None), lead[horizon_min].rename(None)
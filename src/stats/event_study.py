@@ -1,5 +1,6 @@
 import pandas as pd, numpy as np, sys
-from .permutation import permutation_test_series
+from ..utils import resolve_workers
+from .permutation import keyed_permutation_tests, perm_seed, EXACT_MAX_N
 
 
 def _print_progress_bar(current: int, total: int, prefix: str = "Event study", bar_len: int = 30):
@@ -13,6 +14,83 @@ def _print_progress_bar(current: int, total: int, prefix: str = "Event study", b
     sys.stdout.flush()
 
 
+def _test_chunk(cells, samples, n_perm, rng_seed, p_stop, exact_max_n):
+    return keyed_permutation_tests(samples, cells, n_perm=n_perm, rng_seed=rng_seed, p_stop=p_stop,
+                                   exact_max_n=exact_max_n)[1:]
+
+
+def _run_tests(cells, samples, n_perm, rng_seed, n_jobs, on_done, p_stop=None, exact_max_n=EXACT_MAX_N):
+    """p-values and permutations used of all (feature, lag) tests, ``n_jobs`` processes at a time.
+
+    Tests of the same (feature, lag) must be adjacent in ``cells``.
+
+    ``on_done(k)`` is called per finished chunk of k tests.
+    """
+    workers = resolve_workers(n_jobs, len(cells))
+    # a few chunks per worker so progress keeps moving and stragglers even out;
+    # runs of equal keys (one test per event subset) stay in one chunk to share draws
+    size = max(1, -(-len(cells) // (workers * 8)))
+    starts = [i for i in range(len(cells)) if i == 0 or cells[i] != cells[i - 1]] + [len(cells)]
+    cuts = sorted(set(starts[np.searchsorted(starts, i)] for i in range(0, len(cells), size)) | {len(cells)})
+    bounds = [(a, b) for a, b in zip(cuts[:-1], cuts[1:])]
+    p = np.ones(len(cells))
+    used = np.zeros(len(cells), dtype=np.int64)
+    if workers == 1:
+        for a, b in bounds:
+            p[a:b], used[a:b] = _test_chunk(cells[a:b], samples[a:b], n_perm, rng_seed, p_stop, exact_max_n)
+            on_done(b - a)
+        return p, used
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futs = {ex.submit(_test_chunk, cells[a:b], samples[a:b], n_perm, rng_seed, p_stop, exact_max_n): (a, b)
+                for a, b in bounds}
+        for f in as_completed(futs):
+            a, b = futs[f]
+            p[a:b], used[a:b] = f.result()
+            on_done(b - a)
+    return p, used
+
+
+def event_windows(flips_index, features_df: pd.DataFrame, lags):
+    """Feature values at ``flip + lag`` minutes as one (n_flips, n_lags, n_features) array.
+
+    Target times are located in the (sorted) feature index with a single
+    ``searchsorted``; ``found[i, l]`` says whether flip i's lag-l minute is a row of
+    ``features_df``, and the array is NaN where it is not.
+    """
+    X = features_df if features_df.index.is_monotonic_increasing else features_df.sort_index()
+    t_idx = X.index.as_unit("ns").asi8
+    flips = pd.DatetimeIndex(flips_index).as_unit("ns").asi8
+    lag_ns = np.array([pd.Timedelta(minutes=int(l)).value for l in lags], dtype=np.int64)
+    target = (flips[:, None] + lag_ns[None, :]).ravel()
+    pos = np.searchsorted(t_idx, target)
+    found = pos < len(t_idx)
+    found[found] = t_idx[pos[found]] == target[found]
+    vals = X.to_numpy(dtype=float)
+    out = np.full((len(target), vals.shape[1]), np.nan)
+    out[found] = vals[pos[found]]
+    shape = (len(flips), len(lag_ns))
+    return out.reshape(shape + (vals.shape[1],)), found.reshape(shape)
+
+
+def lag_grid(lags=None, pre_minutes=720) -> list:
+    """Pre-flip lags (negative minutes, far to near) the event study tests.
+
+    ``lags`` keeps its negative entries; without usable lags every minute from
+    ``-pre_minutes`` to -1 is tested.
+    """
+    lag_list = None
+    if lags is not None:
+        try:
+            lag_list = [int(x) for x in lags]
+        except Exception:
+            lag_list = None
+    if lag_list:
+        # Keep only negative (pre-event) lags; ensure unique & sorted from far to near
+        lag_list = sorted(set([l for l in lag_list if l < 0]))
+    return lag_list or [-(k) for k in range(int(pre_minutes), 0, -1)]  # negative minutes
+
+
 def run_event_study(
     flips_index,
     features_df,
@@ -22,6 +100,13 @@ def run_event_study(
     show_progress: bool = True,
     lags=None,
     min_events=None,
+    rng_seed=123,
+    n_jobs=None,
+    p_stop=None,
+    exact_max_n=EXACT_MAX_N,
+    n_placebo=0,
+    vol_state=None,
+    placebo_exclude=None,
 ):
     """Align windows around flips and test pre-flip feature deviations with permutation tests.
 
@@ -33,57 +118,130 @@ def run_event_study(
     - n_perm: int, permutations per test
     - show_progress: bool, render a simple console progress bar
     - lags: optional list of negative-minute lags to evaluate
-    - min_events: optional int, minimum valid samples required to test a lag
+    - min_events: optional int, minimum finite samples required to test a lag
+    - rng_seed: int, root seed; each (feature, lag) test draws from its own child stream
+    - n_jobs: worker processes for the tests (None/1 serial, -1 all cores)
+    - p_stop: optional float; stop a test's permutations early once its p-value is
+      clearly above p_stop (Besag–Clifford); ``n_perm_used`` records the count
+    - exact_max_n: int, samples of at most this many values get the exact
+      sign-flip p-value (``n_perm_used`` = 2^n); 0 = always Monte Carlo
+    - n_placebo: int, placebo event sets for a second null (``p_placebo`` column,
+      see ``placebo.placebo_pvalues``); 0 = sign-flip null only
+    - vol_state: optional Series of volatility states the placebo events are matched on
+      (with the hour of day)
+    - placebo_exclude: minutes around flips placebo events avoid (default pre + post)
+
+    The samples of every (feature, lag) are gathered first, then the tests are
+    split across workers; results do not depend on ``n_jobs``. Equivalent to
+    ``run_event_study_subsets`` with one subset.
+    """
+    res = run_event_study_subsets(
+        {"pooled": flips_index}, features_df, pre_minutes=pre_minutes, post_minutes=post_minutes, n_perm=n_perm,
+        show_progress=show_progress, lags=lags, min_events=min_events, rng_seed=rng_seed, n_jobs=n_jobs,
+        p_stop=p_stop, exact_max_n=exact_max_n, n_placebo=n_placebo, vol_state=vol_state,
+        placebo_exclude=placebo_exclude,
+    )
+    return res.drop(columns="subset", errors="ignore")
+
+
+def run_event_study_subsets(
+    subsets,
+    features_df,
+    pre_minutes=720,
+    post_minutes=360,
+    n_perm=500,
+    show_progress: bool = True,
+    lags=None,
+    min_events=None,
+    rng_seed=123,
+    n_jobs=None,
+    p_stop=None,
+    exact_max_n=EXACT_MAX_N,
+    n_placebo=0,
+    vol_state=None,
+    placebo_exclude=None,
+    only=None,
+):
+    """``run_event_study`` for several named flip subsets (e.g. pooled/up/down) in one pass.
+
+    ``subsets`` maps a name to a DatetimeIndex of flips. Windows are gathered once
+    for the union of all flips, and the tests of one (feature, lag) in every subset
+    run on the same permutation draws (its ``perm_seed`` stream), so each subset gets
+    exactly what a separate ``run_event_study`` call would. Other parameters as in
+    ``run_event_study``; ``min_events`` applies per subset, and placebo events avoid
+    the flips of every subset. ``only`` optionally restricts the tests to a set of
+    (subset, feature, lag) cells; a cell's result does not depend on which others run.
+
+    Returns one long table with a ``subset`` column, ordered by feature, lag and subset.
     """
     results = []
+    names = list(subsets)
 
-    # Determine which lags to evaluate
-    lag_list = None
-    if lags is not None:
-        try:
-            lag_list = [int(x) for x in lags]
-        except Exception:
-            lag_list = None
-    if lag_list:
-        # Keep only negative (pre-event) lags; ensure unique & sorted from far to near
-        lag_list = sorted(sorted(set([l for l in lag_list if l < 0])), reverse=False)
-    
-    total_inner = int(pre_minutes) if not lag_list else len(lag_list)
-    total_iters = max(len(features_df.columns) * total_inner, 1)
+    lag_iter = lag_grid(lags, pre_minutes)
+    total_iters = max(len(features_df.columns) * len(lag_iter) * len(names), 1)
     completed = 0
     if show_progress:
         _print_progress_bar(completed, total_iters)
 
-    for col in features_df.columns:
-        series = features_df[col]
-        if not lag_list:
-            lag_iter = [-(k) for k in range(int(pre_minutes), 0, -1)]  # negative minutes
-        else:
-            lag_iter = lag_list
-        for lag_min in lag_iter:
-            # pre-flip time t = flip_time - lag
-            values = []
-            for t in flips_index:
-                lag_abs = abs(int(lag_min))
-                tt = t - pd.Timedelta(minutes=lag_abs)
-                if tt in series.index:
-                    values.append(series.loc[tt])
-            min_req = int(min_events) if (min_events is not None) else 20
-            if len(values) >= min_req:  # need sample size
-                values = np.array(values, dtype=float)
-                stat, p = permutation_test_series(values, n_perm=n_perm)
-                results.append({
-                    "feature": col,
-                    "lag_min": int(lag_min),
-                    "stat": float(np.nanmean(values)),
-                    "p_value": p,
-                })
-
-            completed += 1
-            # Update roughly at 1% increments to reduce console spam
-            step = max(total_iters // 100, 1)
-            if show_progress and (completed % step == 0 or completed == total_iters):
-                _print_progress_bar(completed, total_iters)
+    step = max(total_iters // 100, 1)
+
+    def _advance(k):
+        nonlocal completed
+        before = completed
+        completed += k
+        # Update roughly at 1% increments to reduce console spam
+        if show_progress and (completed // step > before // step or completed == total_iters):
+            _print_progress_bar(completed, total_iters)
+
+    # pre-flip time t = flip_time - |lag|, for every flip of any subset, lag and feature at once
+    ns = {name: pd.DatetimeIndex(subsets[name]).as_unit("ns").asi8 for name in names}
+    union = np.unique(np.concatenate([np.empty(0, np.int64)] + list(ns.values())))
+    rows = {name: np.searchsorted(union, ns[name]) for name in names}    # subset flip -> union row
+    W, found = event_windows(pd.DatetimeIndex(union, tz="UTC"), features_df, [-abs(int(l)) for l in lag_iter])
+    sub_found = {name: found[rows[name]] for name in names}
+    min_req = int(min_events) if (min_events is not None) else 20
+    cells, tags, at, samples = [], [], [], []
+    for j, col in enumerate(features_df.columns):
+        for l, lag_min in enumerate(lag_iter):
+            for name in names:
+                if only is not None and (name, col, int(lag_min)) not in only:
+                    _advance(1)
+                    continue
+                values = W[rows[name][sub_found[name][:, l]], l, j]
+                values = values[np.isfinite(values)]
+                if len(values) < min_req:  # need sample size, in finite values (warm-up rows are NaN)
+                    _advance(1)
+                    continue
+                cells.append((col, int(lag_min)))
+                tags.append(name)
+                at.append((l, j))
+                samples.append(values)
+
+    p_values, n_used = _run_tests(cells, samples, n_perm, rng_seed, n_jobs, _advance, p_stop=p_stop,
+                                   exact_max_n=exact_max_n)
+    p_placebo = {}
+    if n_placebo:
+        from .placebo import placebo_pvalues
+        excl = int(placebo_exclude) if placebo_exclude is not None else int(pre_minutes) + int(post_minutes)
+        for name in dict.fromkeys(tags):
+            # placebo sets of a subset are shared by all its (feature, lag) cells
+            p_placebo[name] = placebo_pvalues(
+                subsets[name], features_df, [-abs(int(l)) for l in lag_iter], vol_state=vol_state,
+                n_placebo=int(n_placebo), exclude_minutes=excl, exclude_index=pd.DatetimeIndex(union, tz="UTC"),
+                rng=np.random.default_rng(perm_seed(rng_seed, f"placebo:{name}", 0)),
+            )[1]
+    for (col, lag_min), name, (l, j), values, p, k in zip(cells, tags, at, samples, p_values, n_used):
+        row = {
+            "subset": name,
+            "feature": col,
+            "lag_min": lag_min,
+            "stat": float(np.nanmean(values)),
+            "p_value": float(p),
+            "n_perm_used": int(k),
+        }
+        if n_placebo:
+            row["p_placebo"] = float(p_placebo[name][l, j])
+        results.append(row)
 
     if show_progress:
         sys.stdout.write("\n")
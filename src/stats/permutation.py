@@ -1,12 +1,51 @@
+import zlib
 import numpy as np
 
-def permutation_test_series(values: np.ndarray, n_perm=500, rng_seed=123):
-    """Two-sided permutation test vs zero-mean null by sign-flipping."""
+# sample sizes up to this get the exact sign-flip p-value (2^n sign vectors) instead of Monte Carlo
+EXACT_MAX_N = 20
+
+
+def _signed_sums(x) -> np.ndarray:
+    """Sorted sums of +-x over all 2^len(x) sign vectors."""
+    s = np.zeros(1)
+    for v in x:
+        s = np.concatenate([s + v, s - v])
+    return np.sort(s)
+
+
+def exact_sign_flip_pvalue(values) -> float:
+    """Exact two-sided sign-flip p-value: share of all 2^n sign vectors with |sum| >= |observed sum|.
+
+    Meet in the middle: the signed sums of each half are enumerated and sorted
+    (2^(n/2) each) and, for every sum a of one half, the sums b of the other with
+    |a + b| >= |obs| are counted by binary search. The identity is one of the sign
+    vectors, so p >= 2^-n, like the Monte Carlo (hits + 1) / (n_perm + 1).
+    """
+    v = np.asarray(values, dtype=float)
+    v = v[np.isfinite(v)]
+    n = len(v)
+    # same slack for summation order as the Monte Carlo paths
+    thr = abs(v.sum()) - 1e-12 * np.abs(v).sum()
+    if n == 0 or thr <= 0:
+        return 1.0
+    a, b = _signed_sums(v[:n // 2]), _signed_sums(v[n // 2:])
+    upper = len(b) - np.searchsorted(b, thr - a, side="left")       # a + b >= thr
+    lower = np.searchsorted(b, -thr - a, side="right")              # a + b <= -thr
+    return float((upper.sum() + lower.sum()) / 2.0 ** n)
+
+
+def permutation_test_series(values: np.ndarray, n_perm=500, rng_seed=123, exact_max_n=EXACT_MAX_N):
+    """Two-sided permutation test vs zero-mean null by sign-flipping.
+
+    Up to ``exact_max_n`` finite values the p-value is exact (``exact_sign_flip_pvalue``).
+    """
     rng = np.random.default_rng(rng_seed)
     values = values[np.isfinite(values)]
     obs = np.nanmean(values)
     if not np.isfinite(obs):
         return 0.0, 1.0
+    if len(values) <= exact_max_n:
+        return obs, exact_sign_flip_pvalue(values)
     sur = []
     for _ in range(n_perm):
         signs = rng.choice([-1,1], size=len(values))
@@ -14,3 +53,148 @@ def permutation_test_series(values: np.ndarray, n_perm=500, rng_seed=123):
     sur = np.array(sur)
     p = (np.sum(np.abs(sur) >= np.abs(obs)) + 1) / (len(sur) + 1)
     return obs, float(p)
+
+
+def random_signs(rng, n_perm: int, n: int) -> np.ndarray:
+    """(n_perm, n) matrix of ±1.0 unpacked from random bits, one uint64 draw per 64 signs.
+
+    Each row takes whole words in order, so drawing the rows in chunks gives the
+    same matrix as drawing them at once.
+    """
+    words = -(-n // 64)
+    packed = rng.integers(0, np.iinfo(np.uint64).max, size=(n_perm, words), dtype=np.uint64, endpoint=True)
+    bits = np.unpackbits(packed.view(np.uint8), axis=1, count=n, bitorder="little")
+    return 1.0 - 2.0 * bits
+
+
+# first step of sequential mode (permutations), before a hit rate is known
+_SEQ_BATCH = 256
+
+# bit i of byte pattern k, for the byte lookup tables of ``sign_flip_test``
+_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little").astype(float)
+
+
+def perm_seed(rng_seed: int, feature, lag: int) -> np.random.SeedSequence:
+    """Random stream of one (feature, lag) test: a child of ``rng_seed`` keyed by the test, not its position."""
+    return np.random.SeedSequence(int(rng_seed), spawn_key=(zlib.crc32(str(feature).encode()), int(lag) % (1 << 32)))
+
+
+def sign_flip_columns(V, n_perm=500, rng=None, rng_seed=123, max_bytes=64 << 20, stop_hits=None):
+    """Sign-flip p-values of the columns of ``V`` (n finite samples x k tests), all on the same draws.
+
+    Draws are packed random signs (the same as ``random_signs``). A surrogate sum is
+    ``sum(v) - 2 * sum(v[bit set])``; the second term is read from per-byte lookup
+    tables (each column's sum for the 256 bit patterns of every 8 samples), so a
+    permutation costs n/8 lookups instead of n products.
+
+    With ``stop_hits=h`` a column stops early (Besag & Clifford, 1991) at the L-th
+    permutation that brings its count of surrogates at least as extreme to h, with
+    p = h / L; columns that never get there keep the fixed-count p-value. Each
+    column gets exactly what it would get alone on the same stream. Returns
+    (p-values, permutations used).
+    """
+    V = np.asarray(V, dtype=float)
+    n, k = V.shape
+    rng = rng if rng is not None else np.random.default_rng(rng_seed)
+    nb = -(-n // 8)
+    tables, total, thr = [], np.empty(k), np.empty(k)
+    for i in range(k):
+        v = np.ascontiguousarray(V[:, i])
+        pad = np.zeros(nb * 8)
+        pad[:n] = v
+        tables.append((_BYTE_BITS @ pad.reshape(nb, 8).T).T)     # (nb, 256)
+        total[i] = v.sum()
+        thr[i] = abs(total[i]) - 1e-12 * np.abs(v).sum()
+    table = np.stack(tables, axis=2)                              # (nb, 256, k)
+    words = -(-n // 64)
+    hits = np.zeros(k, dtype=np.int64)
+    p = np.empty(k)
+    used = np.full(k, n_perm, dtype=np.int64)
+    active = np.ones(k, dtype=bool)
+    chunk = max(1, int(max_bytes // (8 * (words + nb + k))))
+    step = min(chunk, _SEQ_BATCH) if stop_hits else chunk
+    done = 0
+    while done < n_perm and active.any():
+        c = min(step, n_perm - done)
+        packed = rng.integers(0, np.iinfo(np.uint64).max, size=(c, words), dtype=np.uint64, endpoint=True)
+        byte = packed.view(np.uint8)
+        set_sum = np.zeros((c, k))
+        for j in range(nb):
+            set_sum += table[j].take(byte[:, j], axis=0)
+        extreme = np.abs(total - 2.0 * set_sum) >= thr
+        new_hits = extreme.sum(axis=0)
+        if stop_hits:
+            for i in np.flatnonzero(active & (hits + new_hits >= stop_hits)):
+                used[i] = done + int(np.argmax(np.cumsum(extreme[:, i]) >= stop_hits - hits[i])) + 1
+                p[i] = stop_hits / used[i]
+                active[i] = False
+        hits += new_hits
+        done += c
+        if stop_hits and active.any():
+            # size the next step to reach h at the hit rate so far (10% over), not in fixed increments
+            rate = np.maximum(hits[active], 1) / done
+            step = min(chunk, max(_SEQ_BATCH, int(1.1 * np.max((stop_hits - hits[active]) / rate))))
+    p[active] = (hits[active] + 1) / (n_perm + 1)
+    return p, used
+
+
+def sign_flip_test(values, n_perm=500, rng=None, rng_seed=123, max_bytes=64 << 20, stop_hits=None,
+                   exact_max_n=EXACT_MAX_N):
+    """``permutation_test_series`` for one vector via ``sign_flip_columns`` (packed signs, sequential stopping).
+
+    Up to ``exact_max_n`` values the p-value is exact and "permutations used" is the
+    2^n sign vectors enumerated. Returns (mean, p-value, permutations used);
+    (0.0, 1.0, 0) without finite values.
+    """
+    v = np.asarray(values, dtype=float)
+    v = v[np.isfinite(v)]
+    n = len(v)
+    if n == 0:
+        return 0.0, 1.0, 0
+    if n <= exact_max_n:
+        return v.sum() / n, exact_sign_flip_pvalue(v), 2 ** n
+    p, used = sign_flip_columns(v[:, None], n_perm=n_perm, rng=rng, rng_seed=rng_seed, max_bytes=max_bytes,
+                                stop_hits=stop_hits)
+    return v.sum() / n, float(p[0]), int(used[0])
+
+
+def stop_hits_for(p_stop, n_perm: int):
+    """Besag–Clifford h for ``p_stop``: tests stop early only if their fixed-count p would be >= ~p_stop.
+
+    Stopped tests then rank above all others in both modes, so Benjamini–Hochberg
+    q-values below ``p_stop`` (in any family) are the same as with the fixed count.
+    """
+    return None if p_stop is None else max(1, int(np.ceil(float(p_stop) * (n_perm + 1))))
+
+
+def keyed_permutation_tests(vectors, keys, n_perm=500, rng_seed=123, p_stop=None, exact_max_n=EXACT_MAX_N):
+    """Sign-flip test of each vector on its own stream ``perm_seed(rng_seed, *key)``.
+
+    ``keys`` are (feature, lag) pairs; a test's p-value depends only on its values,
+    key, seed and ``n_perm``, so any split of the tests across workers gives the
+    same results. Vectors sharing a key and sample size (e.g. one (feature, lag)
+    in several event subsets) are scored together on one set of draws.
+    ``p_stop`` turns on sequential stopping (see ``stop_hits_for``); samples of at
+    most ``exact_max_n`` values get exact p-values. Returns (means, p-values,
+    permutations used) arrays.
+    """
+    h = stop_hits_for(p_stop, n_perm)
+    clean = [np.asarray(v, dtype=float) for v in vectors]
+    clean = [v[np.isfinite(v)] for v in clean]
+    obs = np.zeros(len(clean))
+    p = np.ones(len(clean))
+    used = np.zeros(len(clean), dtype=np.int64)
+    groups = {}
+    for i, (v, key) in enumerate(zip(clean, keys)):
+        n = len(v)
+        if n == 0:
+            continue
+        obs[i] = v.sum() / n
+        if n <= exact_max_n:
+            p[i], used[i] = exact_sign_flip_pvalue(v), 2 ** n
+        else:
+            groups.setdefault((tuple(key), n), []).append(i)
+    for (key, _), idx in groups.items():
+        p[idx], used[idx] = sign_flip_columns(np.column_stack([clean[i] for i in idx]), n_perm=n_perm,
+                                              rng=np.random.default_rng(perm_seed(rng_seed, *key)), stop_hits=h)
+    return obs, p, used
@@ -0,0 +1,160 @@
+import pandas as pd, numpy as np
+
+_MINUTE_NS = 60_000_000_000
+
+
+def minute_array(features_df: pd.DataFrame, pad_before: int = 0, pad_after: int = 0):
+    """Features on a regular minute grid as one (minutes, features) array, NaN where a minute is missing.
+
+    The grid runs from the first to the last row of ``features_df`` with
+    ``pad_before``/``pad_after`` NaN minutes around it, so any lag within the pads
+    of a grid position is a valid index. Returns (array, ns of grid position 0).
+    """
+    X = features_df if features_df.index.is_monotonic_increasing else features_df.sort_index()
+    t = X.index.as_unit("ns").asi8
+    t0 = (t[0] if len(t) else 0) - pad_before * _MINUTE_NS
+    off = t - t0
+    on_grid = off % _MINUTE_NS == 0
+    n = (int((t[-1] - t0) // _MINUTE_NS) + 1 if len(t) else 0) + pad_after
+    A = np.full((n, X.shape[1]), np.nan)
+    A[off[on_grid] // _MINUTE_NS] = X.to_numpy(dtype=float)[on_grid]
+    return A, t0
+
+
+def _positions(times_ns, t0, n):
+    """Grid positions of ``times_ns`` (-1 where off the grid or outside it)."""
+    off = np.asarray(times_ns, dtype=np.int64) - t0
+    pos = off // _MINUTE_NS
+    ok = (off % _MINUTE_NS == 0) & (pos >= 0) & (pos < n)
+    return np.where(ok, pos, -1)
+
+
+def placebo_pools(flip_pos, cand_pos, flip_strata, cand_strata):
+    """Matched candidate pools, laid out for bulk draws.
+
+    Candidates are sorted by stratum; a flip draws from the block of its own
+    stratum (``start``, ``size`` into the returned ``pool``), from all candidates of
+    its hour when its (hour, vol) stratum is empty, and from all candidates when
+    that is empty too. Strata are (hour, vol code) pairs of int arrays.
+    """
+    pool_parts = []
+    start = np.zeros(len(flip_pos), dtype=np.int64)
+    size = np.zeros(len(flip_pos), dtype=np.int64)
+    levels = ((cand_strata[0] * 1024 + cand_strata[1], flip_strata[0] * 1024 + flip_strata[1]),
+              (cand_strata[0], flip_strata[0]),
+              (np.zeros(len(cand_pos), dtype=np.int64), np.zeros(len(flip_pos), dtype=np.int64)))
+    for base, (keys_c, keys_f) in zip(range(0, 3 * len(cand_pos), len(cand_pos) or 1), levels):
+        order = np.argsort(keys_c, kind="stable")
+        lo = np.searchsorted(keys_c[order], keys_f, side="left")
+        hi = np.searchsorted(keys_c[order], keys_f, side="right")
+        todo = (size == 0) & (hi > lo)
+        start[todo] = base + lo[todo]
+        size[todo] = (hi - lo)[todo]
+        pool_parts.append(cand_pos[order])
+    return np.concatenate(pool_parts), start, size
+
+
+def placebo_pvalues(
+    flips_index,
+    features_df: pd.DataFrame,
+    lags,
+    vol_state=None,
+    n_placebo: int = 2000,
+    exclude_minutes: int = 0,
+    exclude_index=None,
+    rng=None,
+    rng_seed: int = 123,
+    max_bytes: int = 64 << 20,
+):
+    """Placebo-event null of the pre-flip mean for every (lag, feature).
+
+    Each placebo set puts one pseudo-event per real flip at a random minute of the
+    same UTC hour of day and ``vol_state`` (a Series of states, matched as of the
+    minute; None = hour only), drawn from minutes of ``features_df`` farther than
+    ``exclude_minutes`` from every flip in ``exclude_index`` (default: the flips).
+    The feature value at ``event + lag`` is read from ``minute_array`` with the same
+    NaN handling as the event study's ``nanmean``; flips outside the span of
+    ``features_df`` are left out. The p-value is two-sided around
+    the null mean, (1 + #{|null - mu| >= |obs - mu|}) / (1 + #valid sets).
+
+    Returns (observed means, p-values), both (n_lags, n_features); NaN/1.0 where a
+    cell has no values.
+    """
+    lags = np.asarray([int(l) for l in lags], dtype=np.int64)
+    pad_b = int(max(-lags.min(), 0)) if len(lags) else 0
+    pad_a = int(max(lags.max(), 0)) if len(lags) else 0
+    A, t0 = minute_array(features_df, pad_b, pad_a)
+    n_min, n_feat = A.shape
+    finite = np.isfinite(A)
+    A0 = np.where(finite, A, 0.0)
+    finite = finite.astype(np.float64)
+
+    flips = pd.DatetimeIndex(flips_index).as_unit("ns").asi8
+    flip_pos = _positions(flips, t0, n_min)
+    inside = (flip_pos >= pad_b) & (flip_pos < n_min - pad_a)
+    flips, flip_pos = flips[inside], flip_pos[inside]
+    n_ev = len(flip_pos)
+    obs = np.full((len(lags), n_feat), np.nan)
+    p = np.ones((len(lags), n_feat))
+    if n_ev == 0 or n_feat == 0 or len(lags) == 0:
+        return obs, p
+
+    # candidate minutes: rows of features_df away from every flip
+    grid_ns = t0 + np.arange(n_min, dtype=np.int64) * _MINUTE_NS
+    X = features_df if features_df.index.is_monotonic_increasing else features_df.sort_index()
+    has_row = np.zeros(n_min, dtype=bool)
+    row_pos = _positions(X.index.as_unit("ns").asi8, t0, n_min)
+    has_row[row_pos[row_pos >= 0]] = True
+    excl = flips if exclude_index is None else pd.DatetimeIndex(exclude_index).as_unit("ns").asi8
+    excl = np.sort(excl)
+    w = int(exclude_minutes) * _MINUTE_NS
+    if len(excl):
+        k = np.searchsorted(excl, grid_ns)
+        near = np.zeros(n_min, dtype=bool)
+        for j in (k - 1, k):
+            ok = (j >= 0) & (j < len(excl))
+            near[ok] |= np.abs(grid_ns[ok] - excl[j[ok]]) <= w
+        has_row &= ~near
+    cand_pos = np.flatnonzero(has_row)
+    if len(cand_pos) == 0:
+        return obs, p
+
+    hour = (grid_ns // 3_600_000_000_000) % 24
+    if vol_state is not None and len(vol_state):
+        vs = pd.Series(vol_state).sort_index()
+        codes, _ = pd.factorize(vs.astype(str))
+        j = np.searchsorted(vs.index.as_unit("ns").asi8, grid_ns, side="right") - 1
+        vol = np.where(j >= 0, codes[j.clip(0)], -1).astype(np.int64)
+    else:
+        vol = np.zeros(n_min, dtype=np.int64)
+    pool, start, size = placebo_pools(flip_pos, cand_pos, (hour[flip_pos], vol[flip_pos]),
+                                      (hour[cand_pos], vol[cand_pos]))
+
+    # observed means on the same array as the placebo sets
+    idx = flip_pos[:, None] + lags[None, :]                                # (events, lags)
+    s, c = A0[idx].sum(axis=0), finite[idx].sum(axis=0)                    # (lags, features)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        obs = np.where(c > 0, s / np.maximum(c, 1), np.nan)
+
+    rng = rng if rng is not None else np.random.default_rng(rng_seed)
+    null = np.empty((n_placebo, len(lags), n_feat))
+    chunk = max(1, int(max_bytes // (8 * 2 * n_ev * len(lags) * n_feat)))
+    for a in range(0, n_placebo, chunk):
+        b = min(a + chunk, n_placebo)
+        # one uniform per (set, event) picks a position inside the event's stratum block
+        P = pool[start + (rng.random((b - a, n_ev)) * size).astype(np.int64)]
+        idx = P[:, :, None] + lags[None, None, :]                          # (sets, events, lags)
+        s, c = A0[idx].sum(axis=1), finite[idx].sum(axis=1)                # (sets, lags, features)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            null[a:b] = np.where(c > 0, s / np.maximum(c, 1), np.nan)
+
+    valid = np.isfinite(null)
+    n_valid = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mu = np.where(valid, null, 0.0).sum(axis=0) / n_valid
+        dev = np.abs(obs - mu)
+        # same slack for summation order as the sign-flip tests
+        hits = (valid & (np.abs(null - mu) >= dev - 1e-12 * (np.abs(obs) + np.abs(mu)))).sum(axis=0)
+    ok = np.isfinite(obs) & (n_valid > 0)
+    p = np.where(ok, (hits + 1) / (n_valid + 1), 1.0)
+    return obs, p
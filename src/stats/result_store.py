@@ -0,0 +1,162 @@
+import os, json, time, sqlite3, hashlib
+from contextlib import closing
+import pandas as pd, numpy as np
+from .event_study import run_event_study_subsets, lag_grid
+
+_COLUMNS = ("stat", "p_value", "n_perm_used", "p_placebo")
+
+
+def times_fingerprint(index) -> str:
+    """Hash of a set of timestamps (flip times, feature rows)."""
+    t = np.sort(pd.DatetimeIndex(index).as_unit("ns").asi8)
+    return hashlib.blake2b(t.tobytes(), digest_size=16).hexdigest()
+
+
+class ResultStore:
+    """sqlite store of event-study test results, one row per (context, subset, feature, lag).
+
+    The context key covers everything a test result depends on besides its own
+    cell (data, normalization, test settings); subsets and features are stored
+    under fingerprints of their flip set and feature definition, next to their
+    names. ``runs`` records which subsets and features each context last ran
+    with, so ``query`` can return the latest run without the CSVs. Cells skipped
+    for having fewer than ``min_events`` events are stored with a NaN p-value, so
+    they are not evaluated again, and are left out of every result.
+    """
+    def __init__(self, path: str, enabled: bool = True):
+        self.path = path
+        self.enabled = bool(enabled and path)
+        if self.enabled:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with closing(self._connect()) as con, con:
+                con.execute("CREATE TABLE IF NOT EXISTS tests (context TEXT, subset_key TEXT, feature_key TEXT, "
+                            "lag_min INTEGER, subset TEXT, feature TEXT, stat REAL, p_value REAL, "
+                            "n_perm_used INTEGER, p_placebo REAL, "
+                            "PRIMARY KEY (context, subset_key, feature_key, lag_min))")
+                con.execute("CREATE TABLE IF NOT EXISTS runs (context TEXT PRIMARY KEY, meta TEXT, updated REAL)")
+
+    @classmethod
+    def from_config(cls, cfg: dict):
+        path = (cfg.get("event_study", {}) or {}).get("result_store")
+        return cls(path, enabled=bool(path))
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def get(self, context: str, subset_keys: dict, feature_keys: dict) -> pd.DataFrame:
+        """Stored rows of ``context`` for the given {name: fingerprint} subsets and features, skipped cells included."""
+        if not self.enabled or not subset_keys or not feature_keys:
+            return pd.DataFrame(columns=["subset", "feature", "lag_min", *_COLUMNS])
+        with closing(self._connect()) as con:
+            df = pd.read_sql_query("SELECT * FROM tests WHERE context = ?", con, params=(context,))
+        by_sub = {v: k for k, v in subset_keys.items()}
+        by_feat = {v: k for k, v in feature_keys.items()}
+        df = df[df["subset_key"].isin(by_sub) & df["feature_key"].isin(by_feat)]
+        return pd.DataFrame({"subset": df["subset_key"].map(by_sub), "feature": df["feature_key"].map(by_feat),
+                             "lag_min": df["lag_min"].astype(int), **{c: df[c] for c in _COLUMNS}})
+
+    def put(self, context: str, res: pd.DataFrame, subset_keys: dict, feature_keys: dict):
+        if not self.enabled or res is None or len(res) == 0:
+            return
+        rows = [(context, subset_keys[r.subset], feature_keys[r.feature], int(r.lag_min), r.subset, r.feature,
+                 float(r.stat), float(r.p_value), int(r.n_perm_used),
+                 float(r.p_placebo) if "p_placebo" in res.columns else None)
+                for r in res.itertuples(index=False)]
+        with closing(self._connect()) as con, con:
+            con.executemany("INSERT OR REPLACE INTO tests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def record_run(self, context: str, meta: dict):
+        if not self.enabled:
+            return
+        with closing(self._connect()) as con, con:
+            con.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?)", (context, json.dumps(meta), time.time()))
+
+    def query(self, subsets=None, features=None, lags=None, context=None) -> pd.DataFrame:
+        """Results of ``context`` (default: the latest run) as a long table, optionally filtered.
+
+        Only the subsets and features (by fingerprint) and lags of that run are returned.
+        """
+        if not self.enabled or not os.path.exists(self.path):
+            return pd.DataFrame(columns=["subset", "feature", "lag_min", *_COLUMNS])
+        with closing(self._connect()) as con:
+            sql = "SELECT context, meta FROM runs " + ("WHERE context = ?" if context else
+                                                       "ORDER BY updated DESC LIMIT 1")
+            run = con.execute(sql, (context,) if context else ()).fetchone()
+        if run is None:
+            return pd.DataFrame(columns=["subset", "feature", "lag_min", *_COLUMNS])
+        meta = json.loads(run[1])
+        res = self.get(run[0], meta["subsets"], meta["features"])
+        res = res[res["lag_min"].isin(meta["lags"]) & res["p_value"].notna()]
+        if subsets is not None:
+            res = res[res["subset"].isin(list(subsets))]
+        if features is not None:
+            res = res[res["feature"].isin(list(features))]
+        if lags is not None:
+            res = res[res["lag_min"].isin([int(l) for l in lags])]
+        return res.reset_index(drop=True)
+
+
+def context_key(pipe, tests: dict, rows) -> str:
+    """Store context of an event study on the data of ``pipe`` (a ``FeaturePipeline``).
+
+    Covers the macro regime stage (data and regime config), the rows of the
+    normalized features (``rows``, their index: the minutes present decide the
+    event samples and placebo candidates), the normalization config and code, the
+    test settings ``tests`` and the test code; features and flip sets are keyed
+    per cell.
+    """
+    from ..cache import stable_hash, code_fingerprint
+    norm = {k: v for k, v in pipe.cfg["features"].get("normalize", {}).items() if k != "n_jobs"}
+    return stable_hash({
+        "macro": pipe.key("macro"),
+        "rows": times_fingerprint(rows),
+        "normalize": norm,
+        "normalize_code": code_fingerprint("features/normalization.py", "features/rolling.py"),
+        "tests": tests,
+        "test_code": code_fingerprint("stats/permutation.py", "stats/event_study.py", "stats/placebo.py"),
+    })
+
+
+def cached_event_study(store: ResultStore, context: str, subsets, features_df, feature_keys=None,
+                       pre_minutes=720, lags=None, n_placebo=0, **kwargs):
+    """``run_event_study_subsets`` that only computes (subset, feature, lag) cells missing from ``store``.
+
+    ``context`` must key everything but the cells (see ``ResultStore``), including
+    ``min_events``; ``feature_keys`` maps columns to definition fingerprints
+    (default: the column names). New results are stored, as are the cells found to
+    have too few events, and the output equals an uncached run: same rows, same order.
+    """
+    names = list(subsets)
+    cols = list(features_df.columns)
+    lag_iter = lag_grid(lags, pre_minutes)
+    # the name is part of the key: placebo draws are seeded by it
+    subset_keys = {name: f"{name}:{times_fingerprint(subsets[name])}" for name in names}
+    feature_keys = {c: str((feature_keys or {}).get(c, c)) for c in cols}
+    have = store.get(context, subset_keys, feature_keys)
+    have = have[have["lag_min"].isin(lag_iter)]
+    done = set(zip(have["subset"], have["feature"], have["lag_min"]))
+    missing = {(name, c, int(l)) for c in cols for l in lag_iter for name in names} - done
+    parts = [have]
+    if missing:
+        todo = [c for c in cols if any((name, c, int(l)) in missing for l in lag_iter for name in names)]
+        new = run_event_study_subsets(subsets, features_df[todo], pre_minutes=pre_minutes, lags=lag_iter,
+                                      n_placebo=n_placebo, only=missing, **kwargs)
+        parts.append(new)
+        # cells left out of the results had too few events: store them as skipped
+        tested = set(zip(new["subset"], new["feature"], new["lag_min"])) if len(new) else set()
+        skipped = pd.DataFrame(sorted(missing - tested), columns=["subset", "feature", "lag_min"])
+        skipped = skipped.assign(stat=np.nan, p_value=np.nan, n_perm_used=0, p_placebo=np.nan)
+        store.put(context, pd.concat([p for p in (new, skipped) if len(p)], ignore_index=True),
+                  subset_keys, feature_keys)
+    store.record_run(context, {"subsets": subset_keys, "features": feature_keys, "lags": [int(l) for l in lag_iter]})
+    parts = [p[p["p_value"].notna()] for p in parts]
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return pd.DataFrame()
+    res = pd.concat(parts, ignore_index=True)
+    order = {"feature": {c: i for i, c in enumerate(cols)}, "lag_min": {int(l): i for i, l in enumerate(lag_iter)},
+             "subset": {n: i for i, n in enumerate(names)}}
+    res = res.sort_values(["feature", "lag_min", "subset"], key=lambda s: s.map(order[s.name]), kind="stable")
+    res = res[["subset", "feature", "lag_min", "stat", "p_value", "n_perm_used"]
+              + (["p_placebo"] if n_placebo else [])].reset_index(drop=True)
+    return res.astype({"lag_min": int, "n_perm_used": int})
@@ -0,0 +1,192 @@
+import os, glob
+import pandas as pd
+from .utils import to_utc_timestamp
+
+# On-disk layout: <root>/symbol=<SYM>/date=<YYYY-MM-DD>/part-<source>.parquet
+# Columns: timestamp (int64 ns since epoch, UTC), price (float64), qty (float64),
+# is_buyer_maker (int8, optional). Days are written whole (a day that reappears later
+# in the same file is merged into its part), so re-ingesting a file overwrites its own
+# parts instead of duplicating rows.
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa, pyarrow.parquet as pq, pyarrow.dataset as ds
+    except ImportError as e:
+        raise ImportError("The tick store needs pyarrow (pip install pyarrow).") from e
+    return pa, pq, ds
+
+
+def _as_int8_flag(s: pd.Series) -> pd.Series:
+    if s.dtype == bool:
+        return s.astype("int8")
+    if s.dtype == object:
+        s = s.astype(str).str.strip().str.lower().map({"true": 1, "1": 1, "false": 0, "0": 0})
+    return (pd.to_numeric(s, errors="coerce").fillna(0) > 0).astype("int8")
+
+
+def ticks_to_columns(ticks: pd.DataFrame) -> pd.DataFrame:
+    """Typed, flat view of a tick frame (UTC DatetimeIndex) in the store schema."""
+    idx = pd.DatetimeIndex(ticks.index)
+    if idx.tz is None:
+        idx = idx.tz_localize("UTC")
+    out = pd.DataFrame({
+        "timestamp": idx.tz_convert("UTC").as_unit("ns").asi8,
+        "price": ticks["price"].to_numpy(dtype="float64"),
+        "qty": ticks["qty"].to_numpy(dtype="float64"),
+    })
+    if "is_buyer_maker" in ticks.columns:
+        out["is_buyer_maker"] = _as_int8_flag(ticks["is_buyer_maker"]).to_numpy()
+    return out
+
+
+def _write_day(root, symbol, day, cols: pd.DataFrame, source: str):
+    pa, pq, _ = _require_pyarrow()
+    part_dir = os.path.join(root, f"symbol={symbol}", f"date={day}")
+    os.makedirs(part_dir, exist_ok=True)
+    table = pa.Table.from_pandas(cols.reset_index(drop=True), preserve_index=False)
+    pq.write_table(table, os.path.join(part_dir, f"part-{source}.parquet"), compression="zstd")
+
+
+def ingest_csv(path: str, root: str, symbol: str, chunksize: int = 2_000_000) -> int:
+    """Convert one tick CSV into day partitions under ``root``. Returns rows written."""
+    from .io import _normalize_tick_frame
+    source = os.path.splitext(os.path.basename(path))[0]
+    n_rows = 0
+    pending = []  # columns of the day currently being accumulated
+    pending_day = None
+    written = set()  # days already written by this call
+
+    def _flush():
+        nonlocal pending, pending_day, n_rows
+        if pending:
+            n_rows += sum(len(c) for c in pending)
+            if pending_day in written:
+                # the day shows up again (file not in time order): merge with its part, don't overwrite it
+                _, pq, _ = _require_pyarrow()
+                fp = os.path.join(root, f"symbol={symbol}", f"date={pending_day}", f"part-{source}.parquet")
+                pending.insert(0, pq.ParquetFile(fp).read().to_pandas())
+            day_cols = pd.concat(pending, ignore_index=True)
+            _write_day(root, symbol, pending_day, day_cols, source)
+            written.add(pending_day)
+        pending, pending_day = [], None
+
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        df = _normalize_tick_frame(chunk)
+        if df is None or df.empty:
+            continue
+        cols = ticks_to_columns(df)
+        days = df.index.strftime("%Y-%m-%d")
+        for day in pd.unique(days):
+            part = cols[days == day]
+            if pending_day is not None and day != pending_day:
+                _flush()
+            pending_day = day
+            pending.append(part)
+    _flush()
+    return n_rows
+
+
+def ingest_ticks(globs, root: str, symbol: str, show_progress: bool = False, chunksize: int = 2_000_000,
+                 n_jobs=None) -> int:
+    """One-time ingest of tick CSVs (config globs) into the columnar store, ``n_jobs`` files at a time."""
+    from .io import _map_files
+    paths = []
+    for g in globs or []:
+        paths.extend(glob.glob(g))
+    paths = sorted(set(paths))
+    if not paths:
+        return 0
+    counts = _map_files(ingest_csv, paths, n_jobs=n_jobs, show_progress=show_progress, prefix="Ingest ticks",
+                        root=root, symbol=symbol, chunksize=chunksize)
+    return int(sum(counts))
+
+
+def has_symbol(root, symbol) -> bool:
+    return bool(root) and os.path.isdir(os.path.join(root, f"symbol={symbol}"))
+
+
+def read_ticks(root: str, symbol: str, start=None, end=None, columns=None):
+    """Read ticks for ``symbol`` in [start, end) with column projection.
+
+    Day partitions outside the range are pruned before any file is opened.
+    Returns a frame indexed by a UTC DatetimeIndex (like ``load_ticks``) or None.
+    """
+    pa, _, ds = _require_pyarrow()
+    base = os.path.join(root, f"symbol={symbol}")
+    if not os.path.isdir(base):
+        return None
+    part = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+    dset = ds.dataset(base, format="parquet", partitioning=part)
+    names = set(dset.schema.names)
+    want = list(columns) if columns else ["price", "qty", "is_buyer_maker"]
+    want = [c for c in want if c in names and c != "timestamp"]
+    t0, t1 = to_utc_timestamp(start), to_utc_timestamp(end)
+    flt = None
+    if t0 is not None:
+        flt = (ds.field("date") >= t0.strftime("%Y-%m-%d")) & (ds.field("timestamp") >= t0.value)
+    if t1 is not None:
+        # end is exclusive; the day of ``end`` is only needed if it is not midnight
+        last_day = (t1 - pd.Timedelta(1, "ns")).strftime("%Y-%m-%d")
+        f1 = (ds.field("date") <= last_day) & (ds.field("timestamp") < t1.value)
+        flt = f1 if flt is None else (flt & f1)
+    table = dset.to_table(columns=["timestamp"] + want, filter=flt)
+    if table.num_rows == 0:
+        return None
+    df = table.to_pandas()
+    idx = pd.to_datetime(df.pop("timestamp").to_numpy(dtype="int64"), unit="ns", utc=True)
+    df.index = pd.DatetimeIndex(idx, name="timestamp")
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind="stable")
+    return df
+
+
+def store_days(root, symbol, start=None, end=None):
+    base = os.path.join(root, f"symbol={symbol}")
+    days = sorted(d[len("date="):] for d in os.listdir(base) if d.startswith("date=")) if os.path.isdir(base) else []
+    t0, t1 = to_utc_timestamp(start), to_utc_timestamp(end)
+    if t0 is not None:
+        days = [d for d in days if d >= t0.strftime("%Y-%m-%d")]
+    if t1 is not None:
+        days = [d for d in days if d <= (t1 - pd.Timedelta(1, "ns")).strftime("%Y-%m-%d")]
+    return days
+
+
+def store_paths(root: str, symbol: str, start=None, end=None):
+    """Parquet part files holding ``symbol`` ticks for the days overlapping [start, end)."""
+    out = []
+    for d in store_days(root, symbol, start, end):
+        out.extend(sorted(glob.glob(os.path.join(root, f"symbol={symbol}", f"date={d}", "*.parquet"))))
+    return out
+
+
+def iter_tick_days(root: str, symbol: str, start=None, end=None, columns=None, show_progress: bool = False):
+    """Yield ``read_ticks`` frames one day partition at a time, in time order."""
+    days = store_days(root, symbol, start, end)
+    t0, t1 = to_utc_timestamp(start), to_utc_timestamp(end)
+    pb = None
+    if show_progress and days:
+        from .cli import ProgressBar
+        pb = ProgressBar(total=len(days), prefix="Stream ticks")
+    for i, d in enumerate(days, start=1):
+        lo = pd.Timestamp(d, tz="UTC")
+        hi = lo + pd.Timedelta(days=1)
+        df = read_ticks(root, symbol, start=max(lo, t0) if t0 is not None else lo,
+                        end=min(hi, t1) if t1 is not None else hi, columns=columns)
+        if pb:
+            pb.update(i)
+        if df is not None:
+            yield df
+    if pb:
+        pb.finish()
+
+
+def read_day_1s(day: str, root: str, symbol: str, start=None, end=None):
+    """Per-second aggregates of one day partition (clipped to [start, end)); None if empty."""
+    from .ticks_to_bars import ticks_to_1s
+    lo = pd.Timestamp(day, tz="UTC")
+    hi = lo + pd.Timedelta(days=1)
+    t0, t1 = to_utc_timestamp(start), to_utc_timestamp(end)
+    df = read_ticks(root, symbol, start=max(lo, t0) if t0 is not None else lo,
+                    end=min(hi, t1) if t1 is not None else hi)
+    return None if df is None else ticks_to_1s(df)
@@ -1,11 +1,41 @@
 import pandas as pd, numpy as np
 from .utils import ensure_datetime_index, resample_ohlcv
 
+def ticks_to_1s(ticks: pd.DataFrame) -> pd.DataFrame:
+    """Per-second aggregates of a tick frame, one row per second that traded.
+
+    Columns: price (last), qty (sum), signed_qty (sum of +qty for buyer-maker, -qty
+    otherwise) and n_buyer_maker (count) when ``is_buyer_maker`` is present, n_trades (count).
+    This is the one pass over the tick stream; bars and tick-derived features read it.
+    """
+    sec = ticks.index.floor("1s")
+    g = ticks.groupby(sec, sort=True)
+    out = pd.DataFrame({"price": g["price"].last(), "qty": g["qty"].sum()})
+    if "is_buyer_maker" in ticks.columns:
+        bm = ticks["is_buyer_maker"].to_numpy() > 0
+        sign = np.where(bm, 1, -1)
+        out["signed_qty"] = pd.Series(sign * ticks["qty"].to_numpy(), index=ticks.index).groupby(sec, sort=True).sum()
+        out["n_buyer_maker"] = pd.Series(bm.astype("int64"), index=ticks.index).groupby(sec, sort=True).sum()
+    out["n_trades"] = g.size()
+    out.index.name = ticks.index.name
+    return out
+
+_SECOND_AGG = {"price": "last", "qty": "sum", "signed_qty": "sum", "n_buyer_maker": "sum", "n_trades": "sum"}
+
+def is_second_bars(df) -> bool:
+    return df is not None and "n_trades" in df.columns
+
+def merge_second_bars(parts) -> pd.DataFrame:
+    """Combine per-second aggregates whose seconds may repeat across parts (later part wins ``price``)."""
+    df = pd.concat([p for p in parts if p is not None and len(p)])
+    agg = {c: f for c, f in _SECOND_AGG.items() if c in df.columns}
+    return df.groupby(level=0, sort=True).agg(agg)
+
+def seconds_to_1m(sec: pd.DataFrame) -> pd.DataFrame:
+    """1-minute OHLCV from per-second aggregates (same bars as ``ticks_to_1m``)."""
+    return resample_ohlcv(sec[["price", "qty"]].dropna(subset=["price"]), "1min")
+
 def ticks_to_1m(ticks: pd.DataFrame) -> pd.DataFrame:
     """Aggregate ticks to 1-minute OHLCV. Assumes tick index is seconds-level UTC."""
-    df = ticks.copy()
-    df = df.groupby(pd.Grouper(freq="1s")).agg({"price":"last","qty":"sum","is_buyer_maker":"last"})
-    df = df.dropna(subset=["price"])
-    bars = resample_ohlcv(df, "1min")
-    # add realized spread proxy if possible
-    return bars
+    # OHLC come from the last trade of each second, as before
+    return seconds_to_1m(ticks_to_1s(ticks))
@@ -1,4 +1,26 @@
+import os
 import pandas as pd, numpy as np
+try:
+    from numba import njit as _numba_njit
+except ImportError:  # kernels then run as plain Python (same results, slower)
+    _numba_njit = None
+
+def njit(*args, **kwargs):
+    """``numba.njit`` when numba is installed, otherwise a no-op decorator."""
+    if _numba_njit is not None:
+        return _numba_njit(*args, **kwargs)
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda fn: fn
+
+def resolve_workers(n_jobs, n_tasks: int) -> int:
+    """Worker count from an sklearn-style ``n_jobs`` (None/1 serial, -1 all cores), capped at ``n_tasks``."""
+    if n_jobs is None or n_tasks <= 1:
+        return 1
+    n = int(n_jobs)
+    if n < 0:
+        n = max((os.cpu_count() or 1) + 1 + n, 1)
+    return max(min(n, n_tasks), 1)
 
 def ensure_datetime_index(df: pd.DataFrame) -> pd.DataFrame:
     out = df.copy()
@@ -34,6 +56,13 @@ def ensure_datetime_index(df: pd.DataFrame) -> pd.DataFrame:
             return out.sort_index()
     raise ValueError("No datetime index or timestamp column found.")
 
+def to_utc_timestamp(t):
+    """Timestamp-like -> tz-aware UTC Timestamp (naive values are taken as UTC); None passes through."""
+    if t is None:
+        return None
+    t = pd.Timestamp(t)
+    return t.tz_localize("UTC") if t.tz is None else t.tz_convert("UTC")
+
 def resample_ohlcv(ticks_1s: pd.DataFrame, freq="1min"):
     # Expect second-level tick stream; aggregate
     price = ticks_1s["price"]
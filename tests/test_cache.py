@@ -0,0 +1,24 @@
+import pandas as pd
+from src.cache import StageCache, stable_hash
+
+
+def test_stage_cache_hits_and_lru_eviction(tmp_path):
+    df = pd.DataFrame({"x": range(1000)})
+    probe = StageCache(str(tmp_path / "probe"))
+    probe.put("s", "k", df)
+    one = probe.stats()["store_bytes"]
+
+    cache = StageCache(str(tmp_path / "c"), max_bytes=int(2.5 * one))
+    calls = []
+    compute = lambda: calls.append(1) or df
+    k = [stable_hash({"cfg": i}) for i in range(3)]
+    cache.fetch("features", k[0], compute)
+    cache.fetch("features", k[0], compute)
+    assert len(calls) == 1
+    cache.fetch("features", k[1], compute)
+    cache.get("features", k[0])  # k[0] is now more recent than k[1]
+    cache.fetch("features", k[2], compute)  # over budget: evict least recently used
+    assert cache.get("features", k[1]) is None
+    pd.testing.assert_frame_equal(cache.get("features", k[0]), df)
+    st = cache.flush_stats()
+    assert st["evictions"] == 1 and st["entries"] == 2 and st["hits"] == 3
@@ -0,0 +1,72 @@
+import numpy as np, pandas as pd
+from src.stats.event_study import event_windows
+
+
+def test_event_windows_match_index_lookups():
+    rng = np.random.default_rng(2)
+    idx = pd.date_range("2025-01-01", periods=5_000, freq="1min", tz="UTC")
+    idx = idx[rng.random(len(idx)) > 0.1]                     # missing minutes
+    X = pd.DataFrame(rng.normal(size=(len(idx), 3)), index=idx, columns=["a", "b", "c"])
+    X.iloc[rng.random(len(X)) < 0.05, 2] = np.nan
+    flips = pd.DatetimeIndex([idx[0] + pd.Timedelta(minutes=3), idx[2_000], idx[4_000], idx[-1]]).floor("min")
+    lags = [-1, -30, -240, -720]
+    W, found = event_windows(flips, X, lags)
+    assert W.shape == (len(flips), len(lags), 3)
+    for i, t in enumerate(flips):
+        for l, lag in enumerate(lags):
+            tt = t + pd.Timedelta(minutes=lag)
+            assert found[i, l] == (tt in X.index)
+            ref = X.loc[tt].to_numpy() if tt in X.index else np.full(3, np.nan)
+            np.testing.assert_array_equal(W[i, l], ref)
+
+
+def test_run_event_study_does_not_depend_on_workers():
+    from src.stats.event_study import run_event_study
+    rng = np.random.default_rng(4)
+    idx = pd.date_range("2025-01-01", periods=20_000, freq="1min", tz="UTC")
+    X = pd.DataFrame(rng.normal(size=(len(idx), 2)), index=idx, columns=["a", "b"])
+    flips = idx[1_000::1_500]
+    kw = dict(pre_minutes=20, n_perm=500, show_progress=False, min_events=8)
+    pd.testing.assert_frame_equal(run_event_study(flips, X, n_jobs=2, **kw), run_event_study(flips, X, **kw))
+
+
+def test_subsets_match_separate_runs():
+    from src.stats.event_study import run_event_study, run_event_study_subsets
+    rng = np.random.default_rng(8)
+    idx = pd.date_range("2025-01-01", periods=30_000, freq="1min", tz="UTC")
+    X = pd.DataFrame(rng.normal(size=(len(idx), 2)), index=idx, columns=["a", "b"])
+    X.iloc[rng.random(len(X)) < 0.05, 0] = np.nan
+    flips = idx[1_000::600]
+    subsets = {"pooled": flips, "up": flips[::2], "down": flips[1::2]}
+    kw = dict(pre_minutes=10, n_perm=500, show_progress=False, min_events=8, p_stop=0.2, exact_max_n=0)
+    res = run_event_study_subsets(subsets, X, **kw)
+    assert list(res["subset"].unique()) == ["pooled", "up", "down"]
+    for name, f in subsets.items():
+        got = res[res["subset"] == name].drop(columns="subset").reset_index(drop=True)
+        pd.testing.assert_frame_equal(got, run_event_study(f, X, **kw))
+    pd.testing.assert_frame_equal(run_event_study_subsets(subsets, X, n_jobs=2, **kw), res)
+
+
+def test_min_events_counts_finite_values(tmp_path):
+    from src.stats.event_study import run_event_study
+    from src.stats.result_store import ResultStore, cached_event_study, times_fingerprint
+    rng = np.random.default_rng(4)
+    idx = pd.date_range("2025-01-01", periods=3_000, freq="1min", tz="UTC")
+    X = pd.DataFrame({"warm": rng.normal(0.5, 1, len(idx)), "full": rng.normal(0.5, 1, len(idx))}, index=idx)
+    # leading warm-up rows stay in the frame as NaN
+    X.iloc[:1_600, 0] = np.nan
+    flips = idx[100::200][:13]
+    assert np.isfinite(X.loc[flips - pd.Timedelta(minutes=5), "warm"]).sum() == 5
+    kw = dict(lags=[-5], n_perm=200, show_progress=False)
+    res = run_event_study(flips, X, min_events=8, **kw)
+    assert res["feature"].tolist() == ["full"]
+    # the exact path sees the 5 finite values, not 13 rows
+    few = run_event_study(flips, X, min_events=5, **kw).set_index("feature")
+    assert few.loc["warm", "n_perm_used"] == 2 ** 5
+
+    # the store records the gated cell as skipped, not as a result
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    cached = cached_event_study(store, "ctx", {"pooled": flips}, X, min_events=8, **kw)
+    pd.testing.assert_frame_equal(cached.drop(columns="subset"), res)
+    stored = store.get("ctx", {"pooled": f"pooled:{times_fingerprint(flips)}"}, {"warm": "warm", "full": "full"})
+    assert stored.set_index("feature")["p_value"].isna().to_dict() == {"warm": True, "full": False}
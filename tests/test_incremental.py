@@ -0,0 +1,51 @@
+import numpy as np, pandas as pd, pytest
+from src.ticks_to_bars import ticks_to_1s
+from src.incremental import AppendState
+
+CFG = {
+    "regime": {"macro_bar": "1h",
+               "detector": {"type": "ols_slope_r2", "lookback_bars": 12, "r2_min": 0.25, "hysteresis_bars": 2},
+               "vol_bucket": {"type": "realized_vol_pct", "lookback_bars": 6, "cuts": [0.0, 0.4, 0.7, 1.0]}},
+    "features": {"normalize": {"method": "rolling_robust_z", "window_days": 1, "per_hour_of_day": False,
+                               "winsor_pct": 0.01},
+                 "params": {"bb_win": 64, "donchian_win": 128, "ofi_win": 60, "skew_win": 128, "kurt_win": 128}},
+}
+
+
+def _ticks(days=3, seed=3):
+    rng = np.random.default_rng(seed)
+    n = days * 86_400 // 4
+    ts = pd.Timestamp("2025-06-01", tz="UTC") + pd.to_timedelta(np.cumsum(rng.integers(1, 8_000, n)), unit="ms")
+    drift = np.repeat(rng.normal(0, 2e-4, n // 2_000 + 1), 2_000)[:n]
+    return pd.DataFrame({"price": 100 * np.exp(np.cumsum(drift + rng.normal(0, 5e-4, n))),
+                         "qty": rng.uniform(0.01, 2.0, n),
+                         "is_buyer_maker": rng.integers(0, 2, n).astype("int8")}, index=ts)
+
+
+@pytest.mark.parametrize("per_hod", [False, True])
+def test_append_matches_full_recompute(tmp_path, per_hod):
+    cfg = {**CFG, "features": {**CFG["features"], "normalize": {**CFG["features"]["normalize"],
+                                                                 "per_hour_of_day": per_hod}}}
+    sec = ticks_to_1s(_ticks())
+    # first "month" ends mid-minute, so the last stored bar is re-aggregated on append
+    cut = pd.Timestamp("2025-06-02 17:03:29", tz="UTC")
+    full = AppendState.build(sec, cfg)
+
+    AppendState.build(sec[sec.index < cut], cfg).save(str(tmp_path))
+    inc = AppendState.load(str(tmp_path), cfg).append(sec[sec.index >= cut])
+
+    pd.testing.assert_frame_equal(inc.bars, full.bars)
+    pd.testing.assert_frame_equal(inc.macro, full.macro)
+    pd.testing.assert_frame_equal(inc.feats, full.feats, rtol=1e-9)
+    pd.testing.assert_frame_equal(inc.features_z(), full.features_z(), rtol=1e-9, atol=1e-9)
+
+    with pytest.raises(ValueError):
+        inc.append(sec[sec.index >= cut])
+
+
+def test_state_fingerprint_ignores_n_jobs():
+    from src.incremental import state_fingerprint
+    par = {**CFG, "features": {**CFG["features"], "normalize": {**CFG["features"]["normalize"], "n_jobs": 4}}}
+    assert state_fingerprint(par) == state_fingerprint(CFG)
+    win = {**CFG, "features": {**CFG["features"], "normalize": {**CFG["features"]["normalize"], "window_days": 2}}}
+    assert state_fingerprint(win) != state_fingerprint(CFG)
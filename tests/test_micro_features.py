@@ -0,0 +1,81 @@
+import numpy as np, pandas as pd
+from src.features.micro_features import _rolling_autocorr
+
+
+def test_rolling_autocorr_matches_series_autocorr():
+    rng = np.random.default_rng(11)
+    idx = pd.date_range("2025-06-01", periods=3_000, freq="1min", tz="UTC")
+    # AR(1) returns so the autocorrelations are not all near zero; leading NaN like log-price diffs
+    e = rng.normal(0, 1e-3, len(idx))
+    r = np.zeros(len(idx))
+    for i in range(1, len(r)):
+        r[i] = 0.3 * r[i - 1] + e[i]
+    ret = pd.Series(r, index=idx)
+    ret.iloc[0] = np.nan
+    for lag in (1, 2, 5, 10, 37):
+        ref = ret.rolling(128, min_periods=128).apply(lambda s: s.autocorr(lag), raw=False)
+        got = _rolling_autocorr(ret, lag, 128)
+        pd.testing.assert_series_equal(got, ref, rtol=1e-8, atol=1e-10, check_names=False)
+
+
+def _bars_and_seconds(minutes=1_500, seed=5):
+    from src.ticks_to_bars import ticks_to_1s, seconds_to_1m
+    rng = np.random.default_rng(seed)
+    n = minutes * 20
+    ts = pd.Timestamp("2025-06-01", tz="UTC") + pd.to_timedelta(np.cumsum(rng.integers(1, 6_000, n)), unit="ms")
+    ticks = pd.DataFrame({"price": 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n))),
+                          "qty": rng.uniform(0.01, 2.0, n),
+                          "is_buyer_maker": rng.integers(0, 2, n).astype("int8")}, index=ts)
+    sec = ticks_to_1s(ticks)
+    return seconds_to_1m(sec), sec
+
+
+def test_registry_computes_only_requested_features():
+    from src.features.micro_features import build_micro_features
+    from src.features.registry import required_inputs
+    cfg = {"params": {"bb_win": 64, "donchian_win": 128, "ofi_win": 60, "skew_win": 128, "kurt_win": 128,
+                      "acf_lags": [1, 5], "acf_win": 64}}
+    bars, sec = _bars_and_seconds()
+    macro = pd.DataFrame({"trend_state": ["range", "bull", "bear", "bull"]},
+                         index=pd.date_range(bars.index[0].floor("4h"), periods=4, freq="4h"))
+    full = build_micro_features(bars, sec, cfg, macro=macro)
+    assert "imbalance_1s_against_regime" in full.columns and "acf5" in full.columns
+
+    # bar-only features never touch the ticks
+    assert required_inputs(["skew", "acf5"], cfg["params"]) == {"bars"}
+    sub = build_micro_features(bars, None, cfg, features=["skew", "acf5"])
+    assert list(sub.columns) == ["skew", "acf1", "acf5"]
+    # the rows do not depend on what is requested
+    pd.testing.assert_frame_equal(sub, full[sub.columns])
+
+    # derived features pull in their dependencies
+    assert required_inputs(["imbalance_1s_against_regime"], cfg["params"]) == {"sec", "macro"}
+    der = build_micro_features(bars, sec, cfg, features=["imbalance_1s_against_regime"], macro=macro)
+    assert list(der.columns) == ["imbalance_1s", "imbalance_1s_against_regime"]
+    pd.testing.assert_frame_equal(der, full[der.columns])
+
+
+def test_window_grid_matches_pandas_rolling():
+    from src.features.micro_features import build_micro_features
+    bars, sec = _bars_and_seconds(minutes=3_000)
+    wins = [16, 32, 64, 100]
+    cfg = {"params": {"bb_win": wins, "donchian_win": wins, "vov_win": wins, "skew_win": wins, "kurt_win": wins,
+                      "ofi_win": 60}}
+    names = ["bb_width_pct", "don_width_pct", "vov", "skew", "kurt"]
+    grid = build_micro_features(bars, None, cfg, features=names)
+    assert len(grid.columns) == len(names) * len(wins) and "skew_w64" in grid.columns
+
+    c, ret = bars["close"], np.log(bars["close"]).diff()
+    for w in wins:
+        ref = pd.DataFrame({
+            f"bb_width_pct_w{w}": 4 * c.rolling(w).std() / c,
+            f"don_width_pct_w{w}": (bars["high"].rolling(w).max() - bars["low"].rolling(w).min()) / c,
+            f"vov_w{w}": ret.rolling(w).std().rolling(w // 2).std(),
+            f"skew_w{w}": ret.rolling(w).skew(),
+            f"kurt_w{w}": ret.rolling(w).kurt(),
+        }).shift(1).reindex(grid.index)
+        pd.testing.assert_frame_equal(grid[ref.columns], ref, rtol=1e-7, atol=1e-12)
+
+    # a scalar window keeps the plain column name
+    one = build_micro_features(bars, None, {"params": {**cfg["params"], "skew_win": 64}}, features=["skew"])
+    assert list(one.columns) == ["skew"]
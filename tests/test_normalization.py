@@ -0,0 +1,74 @@
+import numpy as np, pandas as pd, pytest
+from src.features.rolling import rolling_median_mad, rolling_quantiles
+from src.features.normalization import RollingRobustZ
+
+
+def _irregular_frame(n=4_000, seed=2):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range("2025-01-01", periods=n, freq="1min", tz="UTC")
+    idx = idx[np.sort(rng.choice(n, n * 3 // 4, replace=False))]   # gaps in the minute grid
+    # rounded values give ties and even-sized windows give averaged middles
+    df = pd.DataFrame(np.round(rng.normal(size=(len(idx), 3)), 2), index=idx, columns=["a", "b", "c"])
+    df.iloc[rng.random(len(df)) < 0.05, 1] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("closed", ["left", "right"])
+def test_rolling_median_mad_matches_pandas(closed):
+    x = _irregular_frame()["b"]
+    r = x.rolling("6h", closed=closed)
+    med_ref = r.median()
+    mad_ref = r.apply(lambda s: np.nanmedian(np.abs(s - np.nanmedian(s))), raw=False)
+    med, mad = rolling_median_mad(x.to_numpy(), x.index.as_unit("ns").asi8, pd.Timedelta("6h").value, closed)
+    np.testing.assert_array_equal(med, med_ref.to_numpy())
+    np.testing.assert_array_equal(mad, mad_ref.to_numpy())
+
+
+@pytest.mark.parametrize("per_hod", [False, True])
+def test_robust_z_matches_pandas_rolling(per_hod):
+    df = _irregular_frame()
+    norm = RollingRobustZ(window_days=1, per_hour_of_day=per_hod, winsor_pct=0.01)
+
+    def _ref(g):
+        med = g.rolling("1D", closed="left").median()
+        mad = g.rolling("1D", closed="left").apply(lambda s: np.nanmedian(np.abs(s - np.nanmedian(s)))+1e-9, raw=False)
+        return (g - med) / mad
+    ref = pd.concat([_ref(g) for _, g in df.groupby(df.index.hour)]).sort_index() if per_hod else _ref(df)
+    pd.testing.assert_frame_equal(norm.zscore(df), ref, check_exact=True, check_freq=False)
+
+
+def test_rolling_quantiles_match_pandas():
+    x = _irregular_frame()["b"]
+    q = rolling_quantiles(x.to_numpy(), x.index.as_unit("ns").asi8, pd.Timedelta("6h").value, [0.01, 0.5, 0.99], "left")
+    for j, p in enumerate([0.01, 0.5, 0.99]):
+        ref = x.rolling("6h", closed="left").quantile(p).to_numpy()
+        np.testing.assert_allclose(q[:, j], ref, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("per_hod", [False, True])
+def test_update_matches_causal_transform(per_hod):
+    df = _irregular_frame(n=6_000)
+    norm = RollingRobustZ(window_days=1, per_hour_of_day=per_hod, winsor_pct=0.05, winsor_mode="causal")
+    ref = norm.winsorize(norm.zscore(df))
+    cut = len(df) - 300
+    norm.fit(df.iloc[:cut])
+    live = pd.DataFrame([norm.update(ts, row) for ts, row in df.iloc[cut:].iterrows()])
+    pd.testing.assert_frame_equal(live, ref.iloc[cut:], rtol=1e-12, check_freq=False, check_names=False)
+
+
+def test_state_round_trip(tmp_path):
+    df = _irregular_frame()
+    norm = RollingRobustZ(window_days=1, per_hour_of_day=True, winsor_mode="causal").fit(df.iloc[:-50])
+    norm.save(tmp_path / "norm_state.joblib")
+    loaded = RollingRobustZ.load(tmp_path / "norm_state.joblib")
+    assert loaded.config() == norm.config()
+    for ts, row in df.iloc[-50:].iterrows():
+        pd.testing.assert_series_equal(loaded.update(ts, row), norm.update(ts, row))
+
+
+@pytest.mark.parametrize("winsor_mode", ["full_sample", "causal"])
+def test_parallel_matches_serial(winsor_mode):
+    df = _irregular_frame()
+    kw = dict(window_days=1, per_hour_of_day=True, winsor_pct=0.01, winsor_mode=winsor_mode)
+    pd.testing.assert_frame_equal(RollingRobustZ(n_jobs=3, **kw).transform(df), RollingRobustZ(**kw).transform(df),
+                                  check_exact=True)
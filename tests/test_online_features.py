@@ -0,0 +1,38 @@
+import pickle
+import numpy as np, pandas as pd
+from src.ticks_to_bars import ticks_to_1s, seconds_to_1m
+from src.features.micro_features import build_micro_features
+from src.features.online import OnlineMicroFeatures
+
+CFG = {"params": {"bb_win": 64, "donchian_win": [32, 128], "vov_win": 32, "skew_win": 128, "kurt_win": 128,
+                  "ofi_win": 60, "acf_lags": [1, 5, 10], "acf_win": 128}}
+
+
+def _month_of_seconds(seed=17):
+    rng = np.random.default_rng(seed)
+    n = 30 * 86_400 // 12
+    # a trade every ~12s on average, with occasional idle minutes
+    gaps = rng.choice([1_000, 6_000, 20_000, 150_000], size=n, p=[0.3, 0.4, 0.29, 0.01])
+    ts = pd.Timestamp("2025-06-01", tz="UTC") + pd.to_timedelta(np.cumsum(gaps), unit="ms")
+    ticks = pd.DataFrame({"price": 100 * np.exp(np.cumsum(rng.normal(0, 8e-4, n))),
+                          "qty": rng.uniform(0.01, 2.0, n),
+                          "is_buyer_maker": rng.integers(0, 2, n).astype("int8")}, index=ts)
+    return ticks_to_1s(ticks)
+
+
+def test_online_engine_matches_batch_over_a_month():
+    sec = _month_of_seconds()
+    batch = build_micro_features(seconds_to_1m(sec), sec, CFG)
+
+    half = len(sec) // 2
+    eng = OnlineMicroFeatures(CFG)
+    first = eng.run(sec.iloc[:half])
+    # resume from a pickled snapshot, as after a restart
+    state = pickle.loads(pickle.dumps(eng.snapshot()))
+    second = OnlineMicroFeatures(CFG).restore(state).run(sec.iloc[half:])
+    online = pd.concat([first, second])
+
+    assert set(batch.columns) == set(online.columns)
+    pd.testing.assert_index_equal(online.index, batch.index, check_names=False)
+    pd.testing.assert_frame_equal(online[batch.columns], batch, rtol=1e-7, atol=1e-12, check_freq=False,
+                                  check_index_type=False)
@@ -0,0 +1,95 @@
+import numpy as np
+from src.stats.permutation import permutation_test_series, keyed_permutation_tests, random_signs
+
+
+def test_random_signs_do_not_depend_on_chunking():
+    whole = random_signs(np.random.default_rng(1), 100, 130)
+    rng = np.random.default_rng(1)
+    parts = np.vstack([random_signs(rng, 7, 130), random_signs(rng, 93, 130)])
+    np.testing.assert_array_equal(whole, parts)
+    assert set(np.unique(whole)) == {-1.0, 1.0}
+
+
+def test_keyed_tests_match_reference_within_monte_carlo_error():
+    rng = np.random.default_rng(0)
+    vecs = [rng.normal(0.4 * (i % 3 == 0), 1, 25 + i % 4) for i in range(12)]
+    vecs[5][[1, 3]] = np.nan
+    n_perm = 4000
+    obs, p, _ = keyed_permutation_tests(vecs, [("f", i) for i in range(12)], n_perm=n_perm, exact_max_n=0)
+    for v, o, pb in zip(vecs, obs, p):
+        o_ref, p_ref = permutation_test_series(v, n_perm=n_perm, exact_max_n=0)
+        assert np.isclose(o, o_ref)
+        assert abs(pb - p_ref) <= 4 * np.sqrt(2 * p_ref * (1 - p_ref) / n_perm) + 2 / n_perm
+
+
+def test_keyed_tests_are_reproducible_and_independent_of_grouping():
+    rng = np.random.default_rng(3)
+    vecs = [rng.normal(0.2, 1, 30) for _ in range(40)] + [rng.normal(0, 1, 12)]
+    # one key for all: same-size vectors share draws
+    keys = [("f", -30)] * len(vecs)
+    _, p, _ = keyed_permutation_tests(vecs, keys, n_perm=2000, rng_seed=7)
+    _, p_again, _ = keyed_permutation_tests(vecs, keys, n_perm=2000, rng_seed=7)
+    _, p_alone, _ = keyed_permutation_tests(vecs[3:4], keys[3:4], n_perm=2000, rng_seed=7)
+    np.testing.assert_array_equal(p, p_again)
+    assert p_alone[0] == p[3]
+    assert keyed_permutation_tests([np.full(9, np.nan)], [("f", 0)])[1][0] == 1.0
+
+
+def test_keyed_tests_use_per_test_streams():
+    from src.stats.permutation import perm_seed, sign_flip_test
+    rng = np.random.default_rng(5)
+    v = rng.normal(0.3, 1, 37)
+    # the byte-table path sees the signs of ``random_signs`` on the same stream
+    _, p_one, _ = sign_flip_test(v, 3000, rng=np.random.default_rng(1))
+    sur = random_signs(np.random.default_rng(1), 3000, len(v)) @ v
+    hits = (np.abs(sur) >= abs(v.sum()) - 1e-12 * np.abs(v).sum()).sum()
+    assert p_one == (hits + 1) / 3001
+    vecs = [rng.normal(0.1, 1, 20 + i) for i in range(6)]
+    keys = [("imbalance_1s", -30 - i) for i in range(6)]
+    _, p, _ = keyed_permutation_tests(vecs, keys, n_perm=2000, rng_seed=9)
+    _, p_rev, _ = keyed_permutation_tests(vecs[::-1], keys[::-1], n_perm=2000, rng_seed=9)
+    np.testing.assert_array_equal(p, p_rev[::-1])
+    assert perm_seed(9, "a", -30).generate_state(2).tolist() != perm_seed(9, "a", -31).generate_state(2).tolist()
+
+
+def test_sequential_stopping_keeps_small_q_values():
+    from src.stats.fdr import bh_fdr
+    rng = np.random.default_rng(6)
+    vecs = [rng.normal(0.5 if i < 8 else 0.0, 1, 30) for i in range(200)]
+    keys = [("f", -i) for i in range(200)]
+    _, p_fix, used_fix = keyed_permutation_tests(vecs, keys, n_perm=3000)
+    _, p_seq, used_seq = keyed_permutation_tests(vecs, keys, n_perm=3000, p_stop=0.2)
+    assert (used_fix == 3000).all() and used_seq.mean() < 3000
+    full = used_seq == 3000
+    np.testing.assert_array_equal(p_seq[full], p_fix[full])
+    assert (p_seq[~full] >= 0.2).all() and (p_fix[~full] >= 0.2).all()
+    q_fix, q_seq = bh_fdr(p_fix), bh_fdr(p_seq)
+    small = q_fix < 0.2
+    assert small.any()
+    np.testing.assert_array_equal(q_seq[small], q_fix[small])
+
+
+def test_exact_pvalue_matches_enumeration():
+    import itertools
+    from src.stats.permutation import exact_sign_flip_pvalue, sign_flip_test
+    rng = np.random.default_rng(12)
+    for n in (1, 4, 9, 13):
+        v = np.round(rng.normal(0.4, 1, n), 1)       # ties between surrogate sums
+        sums = np.array(list(itertools.product([-1.0, 1.0], repeat=n))) @ v
+        ref = np.mean(np.abs(sums) >= abs(v.sum()) - 1e-9)
+        assert exact_sign_flip_pvalue(v) == ref
+        assert permutation_test_series(v)[1] == ref
+        assert sign_flip_test(v, 500)[1:] == (ref, 2 ** n)
+    v = rng.normal(0.3, 1, 20)
+    p_mc = sign_flip_test(v, 100_000, exact_max_n=0)[1]
+    assert abs(exact_sign_flip_pvalue(v) - p_mc) < 4 * np.sqrt(p_mc / 100_000) + 1e-4
+
+
+def test_sign_flip_columns_match_single_vectors():
+    from src.stats.permutation import sign_flip_columns, sign_flip_test
+    rng = np.random.default_rng(13)
+    V = rng.normal(0.15, 1, (45, 6))
+    p, used = sign_flip_columns(V, 4000, rng=np.random.default_rng(2), stop_hits=20)
+    for i in range(V.shape[1]):
+        _, p_one, used_one = sign_flip_test(V[:, i], 4000, rng=np.random.default_rng(2), stop_hits=20)
+        assert (p[i], used[i]) == (p_one, used_one)
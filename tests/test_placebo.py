@@ -0,0 +1,37 @@
+import numpy as np, pandas as pd
+from src.stats.placebo import placebo_pools, placebo_pvalues
+
+
+def test_pools_match_strata_with_fallback():
+    cand = np.arange(12)
+    c_hour, c_vol = cand % 3, (cand // 6).astype(np.int64)
+    f_hour, f_vol = np.array([0, 1, 2, 2]), np.array([1, 0, 0, 5])
+    pool, start, size = placebo_pools(np.zeros(4), cand, (f_hour, f_vol), (c_hour, c_vol))
+    for k in range(3):
+        block = pool[start[k]:start[k] + size[k]]
+        assert set(block) == set(cand[(c_hour == f_hour[k]) & (c_vol == f_vol[k])])
+    # no candidate has vol code 5: fall back to the hour alone
+    assert set(pool[start[3]:start[3] + size[3]]) == set(cand[c_hour == 2])
+
+
+def test_placebo_null_absorbs_hour_of_day_effect():
+    from src.stats.event_study import run_event_study
+    rng = np.random.default_rng(3)
+    idx = pd.date_range("2025-01-01", periods=60 * 24 * 60, freq="1min", tz="UTC")
+    hour = idx.hour.to_numpy()
+    # feature is shifted from 03:00 to 04:59 every day; flips all happen at 04:00
+    shift = 0.8 * ((hour == 3) | (hour == 4))
+    X = pd.DataFrame({"a": rng.normal(size=len(idx)) + shift, "b": rng.normal(size=len(idx))}, index=idx)
+    flips = pd.date_range("2025-01-03 04:00", periods=50, freq="1D", tz="UTC")
+    vol = pd.Series("low", index=pd.date_range("2025-01-01", periods=360, freq="4h", tz="UTC"))
+    res = run_event_study(flips, X, lags=[-30, -90], n_perm=500, show_progress=False, min_events=8,
+                          n_placebo=500, vol_state=vol, placebo_exclude=60)
+    for lag in (-30, -90):
+        t = flips + pd.Timedelta(minutes=lag)
+        assert np.isclose(res.set_index(["feature", "lag_min"]).loc[("a", lag), "stat"], X.loc[t, "a"].mean())
+    a30 = res[(res.feature == "a") & (res.lag_min == -30)].iloc[0]
+    assert a30.p_value < 0.01 and a30.p_placebo > 0.05
+    assert res["p_placebo"].between(0, 1).all()
+    obs, p = placebo_pvalues(flips, X, [-30], n_placebo=200, exclude_minutes=60, rng_seed=1)
+    _, p2 = placebo_pvalues(flips, X, [-30], n_placebo=200, exclude_minutes=60, rng_seed=1)
+    np.testing.assert_array_equal(p, p2)
@@ -0,0 +1,82 @@
+import numpy as np, pandas as pd
+from src.regimes import _ols_slope_r2, rolling_ols_slope_r2
+
+
+def test_rolling_ols_matches_per_window_fit():
+    rng = np.random.default_rng(4)
+    y = np.log(100) + np.cumsum(rng.normal(0, 0.01, 600))
+    y[rng.random(len(y)) < 0.05] = np.nan
+    y[100:130] = np.nan          # windows with fewer than two finite values
+    y[300:320] = 4.5             # a constant window
+    look = 12
+    slope, r2 = rolling_ols_slope_r2(y, look)
+    ref = np.array([_ols_slope_r2(y[i - look:i]) if i >= look else (np.nan, np.nan) for i in range(len(y))])
+    np.testing.assert_allclose(slope, ref[:, 0], rtol=1e-8, atol=1e-12)
+    np.testing.assert_allclose(r2, ref[:, 1], rtol=1e-8, atol=1e-10)
+
+
+def test_regime_grid_matches_build_macro_regime():
+    import copy
+    from src.regimes import build_macro_regime, find_flips, regime_grid
+    rng = np.random.default_rng(8)
+    idx = pd.date_range("2025-01-01", periods=60 * 24 * 40, freq="1min", tz="UTC")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, len(idx))))
+    bars = pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": 1.0}, index=idx)
+    cfg = {"macro_bar": "4h", "detector": {"lookback_bars": 20, "r2_min": 0.25, "hysteresis_bars": 3},
+           "vol_bucket": {"lookback_bars": 10, "cuts": [0.0, 0.4, 0.7, 1.0]}}
+    grid = {"macro_bar": ["1h", "4h"], "lookback_bars": [8, 20], "r2_min": [0.1, 0.4], "hysteresis_bars": [1, 4]}
+    table, flips = regime_grid(bars, cfg, grid)
+    assert len(table) == len(flips) == 16
+    for i, row in table.iterrows():
+        c = copy.deepcopy(cfg)
+        c["macro_bar"] = row["macro_bar"]
+        c["detector"].update(lookback_bars=row["lookback_bars"], r2_min=row["r2_min"],
+                             hysteresis_bars=row["hysteresis_bars"])
+        ref = find_flips(build_macro_regime(bars, c))
+        pd.testing.assert_index_equal(flips[i], ref)
+        assert row["n_flips"] == len(ref)
+
+
+def test_regime_tracker_matches_batch():
+    import pickle
+    from src.regimes import build_macro_regime, find_flips, macro_bars, RegimeTracker
+    rng = np.random.default_rng(9)
+    idx = pd.date_range("2025-01-01", periods=60 * 24 * 60, freq="1min", tz="UTC")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, len(idx))))
+    bars = pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": 1.0}, index=idx)
+    cfg = {"macro_bar": "4h", "detector": {"lookback_bars": 20, "r2_min": 0.25, "hysteresis_bars": 3},
+           "vol_bucket": {"lookback_bars": 10, "cuts": [0.0, 0.4, 0.7, 1.0]}}
+    batch = build_macro_regime(bars, cfg)
+    agg = macro_bars(bars, cfg["macro_bar"])
+    tracker = RegimeTracker(cfg)
+    first = tracker.run(agg.iloc[:150])
+    tracker = pickle.loads(pickle.dumps(tracker))   # state survives a restart
+    live = pd.concat([first, tracker.run(agg.iloc[150:])])
+    np.testing.assert_array_equal(live["trend_state"].to_numpy(), batch["trend_state"].to_numpy())
+    np.testing.assert_allclose(live["r2"], batch["r2"], rtol=1e-8)
+    np.testing.assert_allclose(live["rv"], batch["rv"], rtol=1e-12)
+    pd.testing.assert_index_equal(pd.DatetimeIndex(tracker.flips), find_flips(batch))
+    # the vol bucket ranks against the bars seen so far
+    for k in (40, 200, len(agg) - 1):
+        assert live["vol_state"].iloc[k] == build_macro_regime(bars[:agg.index[k] + pd.Timedelta("4h")].iloc[:-1],
+                                                               cfg)["vol_state"].iloc[-1]
+
+
+def test_flip_label_matrix_matches_masks():
+    from src.regimes import flip_label_matrix
+    idx = pd.date_range("2025-01-01", periods=6 * 30, freq="4h", tz="UTC")
+    macro = pd.DataFrame({"close": 1.0}, index=idx)
+    flips = idx[[3, 4, 20, 21, 22, 90, 179]]     # close flips give overlapping windows
+    horizons = [60, 180, 600]
+    labels, lead = flip_label_matrix(macro, flips, horizons)
+    assert labels.dtypes.eq(np.int8).all()
+    grid = labels.index
+    for h in horizons:
+        y = pd.Series(0, index=grid)
+        ref_lead = pd.Series(np.nan, index=grid)
+        for t in flips:
+            y[(grid > t) & (grid <= t + pd.Timedelta(minutes=h))] = 1
+            m = (grid <= t) & (grid > t - pd.Timedelta(minutes=h))
+            ref_lead[m] = (t - grid[m]).total_seconds() / 60.0
+        np.testing.assert_array_equal(labels[h].to_numpy(), y.to_numpy())
+        np.testing.assert_array_equal(lead[h].to_numpy(), ref_lead.to_numpy())
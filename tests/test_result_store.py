@@ -0,0 +1,75 @@
+import numpy as np, pandas as pd
+from src.stats.event_study import run_event_study_subsets
+from src.stats.result_store import ResultStore, cached_event_study, context_key
+
+
+def test_cached_runs_compute_missing_cells_and_match_full_run(tmp_path, monkeypatch):
+    import src.stats.result_store as rs
+    rng = np.random.default_rng(8)
+    idx = pd.date_range("2025-01-01", periods=30_000, freq="1min", tz="UTC")
+    X = pd.DataFrame(rng.normal(size=(len(idx), 3)), index=idx, columns=["a", "b", "c"])
+    flips = idx[1_000::600]
+    subsets = {"pooled": flips, "up": flips[::2], "down": flips[1::2]}
+    kw = dict(n_perm=500, show_progress=False, min_events=8, p_stop=0.2, n_placebo=100, placebo_exclude=60)
+    full = run_event_study_subsets(subsets, X, lags=[-5, -10, -30], **kw)
+
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    cached_event_study(store, "ctx", subsets, X[["a", "b"]], lags=[-5, -30], **kw)
+    calls = []
+
+    def _spy(subsets, features_df, only=None, **k):
+        calls.append(set(only))
+        return run_event_study_subsets(subsets, features_df, only=only, **k)
+    monkeypatch.setattr(rs, "run_event_study_subsets", _spy)
+    res = cached_event_study(store, "ctx", subsets, X, lags=[-5, -10, -30], **kw)
+    pd.testing.assert_frame_equal(res, full)
+    # only the new feature and the new lag were tested
+    assert calls == [{(s, f, l) for s in subsets for f in "abc" for l in (-5, -10, -30)
+                      if f == "c" or l == -10}]
+    pd.testing.assert_frame_equal(cached_event_study(store, "ctx", subsets, X, lags=[-5, -10, -30], **kw), full)
+    assert len(calls) == 1
+
+    q = store.query(subsets=["up"], features=["a"], lags=[-30])
+    ref = full[(full.subset == "up") & (full.feature == "a") & (full.lag_min == -30)]
+    assert q[["stat", "p_value", "p_placebo"]].to_numpy().tolist() == ref[["stat", "p_value", "p_placebo"]].to_numpy().tolist()
+    assert cached_event_study(store, "other", subsets, X[["a"]], lags=[-5], **kw) is not None
+    assert len(store.query()) == 3 and len(store.query(context="ctx")) == len(full)
+
+
+def test_added_feature_with_longer_warmup_matches_uncached_run(tmp_path, monkeypatch):
+    import src.stats.result_store as rs
+    from src.pipeline import FeaturePipeline
+    from src.features.micro_features import build_micro_features
+    rng = np.random.default_rng(9)
+    idx = pd.date_range("2025-01-01", periods=20_000, freq="1min", tz="UTC")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, len(idx))))
+    bars = pd.DataFrame({"open": close, "high": close * 1.0005, "low": close * 0.9995, "close": close,
+                         "volume": rng.uniform(1, 5, len(idx))}, index=idx)
+    cfg = {"params": {"bb_win": 64, "donchian_win": 128, "ofi_win": 60, "skew_win": 128, "kurt_win": 2048}}
+    # early flips fall inside the kurt warm-up; "few" has too few events to be tested
+    flips = idx[300::400]
+    subsets = {"pooled": flips, "up": flips[::2], "few": flips[:5]}
+    kw = dict(n_perm=300, show_progress=False, min_events=8, lags=[-5, -60])
+    pipe = FeaturePipeline({"data": {}, "regime": {}, "features": {"normalize": {}}})
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+
+    short = build_micro_features(bars, None, cfg, features=["ret_1m", "bb_width_pct"])
+    cached_event_study(store, context_key(pipe, {}, short.index), subsets, short, **kw)
+    longer = build_micro_features(bars, None, cfg, features=["ret_1m", "bb_width_pct", "kurt"])
+    ctx = context_key(pipe, {}, longer.index)
+    assert ctx == context_key(pipe, {}, short.index) != context_key(pipe, {}, longer.index[1:])
+
+    calls = []
+
+    def _spy(subsets, features_df, only=None, **k):
+        calls.append(set(only))
+        return run_event_study_subsets(subsets, features_df, only=only, **k)
+    monkeypatch.setattr(rs, "run_event_study_subsets", _spy)
+    res = cached_event_study(store, ctx, subsets, longer, **kw)
+    pd.testing.assert_frame_equal(res, run_event_study_subsets(subsets, longer, **kw))
+    assert "few" not in set(res["subset"])
+    # the skipped cells of the first run were stored, not retried
+    assert calls == [{(s, "kurt", l) for s in subsets for l in (-5, -60)}]
+    pd.testing.assert_frame_equal(cached_event_study(store, ctx, subsets, longer, **kw), res)
+    assert len(calls) == 1
+    assert len(store.query()) == len(res)
@@ -0,0 +1,62 @@
+import numpy as np, pandas as pd
+from src.io import load_ticks
+from src.tick_store import ingest_ticks, read_ticks
+
+
+def _write_month_csvs(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    # the May file ends at midnight and June starts there: one partition per day, no overlap
+    for month, start in [("2025-05", "2025-05-31 18:00"), ("2025-06", "2025-06-01 00:00")]:
+        ts = pd.date_range(start, periods=6 * 3600, freq="1s", tz="UTC")
+        df = pd.DataFrame({
+            "Timestamp": ts.asi8 // 10**6,  # ms epoch, mixed-case header like the raw dumps
+            "Price": 100 + np.cumsum(rng.normal(0, 0.01, len(ts))),
+            "Qty": rng.uniform(0.001, 2.0, len(ts)),
+            "is_buyer_maker": rng.integers(0, 2, len(ts)).astype(bool),
+        })
+        p = tmp_path / f"BTCUSDT-ticks-{month}.csv"
+        df.to_csv(p, index=False)
+        paths.append(str(p))
+    return paths
+
+
+def test_store_roundtrip_and_range(tmp_path):
+    paths = _write_month_csvs(tmp_path)
+    store = str(tmp_path / "store")
+    n = ingest_ticks(paths, store, "BTCUSDT", chunksize=5000)
+    ref = load_ticks(paths)
+    assert n == len(ref)
+    # re-ingest is idempotent (day parts are overwritten, not appended)
+    ingest_ticks(paths, store, "BTCUSDT", chunksize=7000)
+
+    got = load_ticks(paths, store=store, symbol="BTCUSDT")
+    assert got["is_buyer_maker"].dtype == np.int8
+    pd.testing.assert_index_equal(got.index, ref.index)
+    np.testing.assert_array_equal(got["price"].values, ref["price"].values)
+    np.testing.assert_array_equal(got["qty"].values, ref["qty"].values)
+    np.testing.assert_array_equal(got["is_buyer_maker"].values, ref["is_buyer_maker"].astype(int).values)
+
+    june = read_ticks(store, "BTCUSDT", start="2025-06-01", end="2025-07-01", columns=["price"])
+    assert list(june.columns) == ["price"]
+    assert june.index.min() >= pd.Timestamp("2025-06-01", tz="UTC")
+    assert len(june) == (ref.index >= pd.Timestamp("2025-06-01", tz="UTC")).sum()
+
+
+def test_out_of_order_file_keeps_every_day(tmp_path):
+    paths = _write_month_csvs(tmp_path)
+    df = pd.concat([pd.read_csv(q) for q in paths], ignore_index=True)
+    # half of June 1st, then May 31st, then the rest of June 1st
+    june = df[pd.to_datetime(df["Timestamp"], unit="ms", utc=True).dt.day == 1]
+    may = df.drop(june.index)
+    assert len(june) and len(may)
+    shuffled = pd.concat([june.iloc[: len(june) // 2], may, june.iloc[len(june) // 2:]])
+    p = tmp_path / "shuffled.csv"
+    shuffled.to_csv(p, index=False)
+    store = str(tmp_path / "store")
+    for _ in range(2):
+        assert ingest_ticks([str(p)], store, "BTCUSDT", chunksize=5000) == len(shuffled)
+    ref = load_ticks(paths)
+    got = read_ticks(store, "BTCUSDT")
+    pd.testing.assert_index_equal(got.index, ref.index)
+    np.testing.assert_array_equal(got["price"].values, ref["price"].values)
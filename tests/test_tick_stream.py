@@ -0,0 +1,59 @@
+import numpy as np, pandas as pd
+from src.io import load_ticks, load_ticks_1s
+from src.ticks_to_bars import ticks_to_1m, ticks_to_1s, seconds_to_1m
+
+
+def _write_tick_csvs(tmp_path, n=20_000):
+    rng = np.random.default_rng(7)
+    # several trades per second at strictly increasing ms stamps, with idle gaps
+    gaps_ms = rng.choice([1, 50, 200, 900, 45_000], size=n, p=[0.3, 0.3, 0.25, 0.149, 0.001])
+    ts = pd.Timestamp("2025-06-01", tz="UTC").value // 10**6 + np.cumsum(gaps_ms)
+    df = pd.DataFrame({
+        "timestamp": ts,
+        "price": 100 + np.cumsum(rng.normal(0, 0.01, n)),
+        "qty": rng.uniform(0.001, 2.0, n),
+        "is_buyer_maker": rng.integers(0, 2, n).astype(bool),
+    })
+    # split mid-second so one second straddles the two files
+    cut = n // 2
+    while ts[cut] // 1000 != ts[cut - 1] // 1000:
+        cut += 1
+    paths = [str(tmp_path / "ticks-a.csv"), str(tmp_path / "ticks-b.csv")]
+    df.iloc[:cut].to_csv(paths[0], index=False)
+    df.iloc[cut:].to_csv(paths[1], index=False)
+    return paths
+
+
+def test_streaming_1s_matches_in_memory_path(tmp_path):
+    paths = _write_tick_csvs(tmp_path)
+    ticks = load_ticks(paths)
+    sec = load_ticks_1s(paths, chunksize=97)  # chunk edges land inside seconds
+
+    ref = ticks_to_1s(ticks)
+    pd.testing.assert_index_equal(sec.index, ref.index)
+    np.testing.assert_array_equal(sec["n_trades"].values, ref["n_trades"].values)
+    np.testing.assert_array_equal(sec["price"].values, ref["price"].values)
+    np.testing.assert_allclose(sec[["qty", "signed_qty"]].values, ref[["qty", "signed_qty"]].values, rtol=1e-12)
+
+    bars_ref = ticks_to_1m(ticks)
+    bars = seconds_to_1m(sec)
+    pd.testing.assert_index_equal(bars.index, bars_ref.index)
+    np.testing.assert_array_equal(bars[["open", "high", "low", "close"]].values,
+                                  bars_ref[["open", "high", "low", "close"]].values)
+    np.testing.assert_allclose(bars["volume"].values, bars_ref["volume"].values, rtol=1e-12)
+
+
+def test_second_bar_cache_is_memory_mapped(tmp_path):
+    paths = _write_tick_csvs(tmp_path, n=5_000)
+    cache = str(tmp_path / "cache")
+    first = load_ticks_1s(paths, chunksize=500, cache_dir=cache)
+    again = load_ticks_1s(paths, cache_dir=cache)
+    pd.testing.assert_frame_equal(first, again)
+    assert isinstance(again["price"].values, np.memmap)
+    assert "n_buyer_maker" in again.columns
+
+
+def test_parallel_ingest_matches_serial(tmp_path):
+    paths = _write_tick_csvs(tmp_path, n=5_000)
+    pd.testing.assert_frame_equal(load_ticks(paths, n_jobs=2), load_ticks(paths))
+    pd.testing.assert_frame_equal(load_ticks_1s(paths, chunksize=300, n_jobs=2), load_ticks_1s(paths, chunksize=300))